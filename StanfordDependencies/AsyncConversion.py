@@ -0,0 +1,100 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Coroutines behind the aconvert_trees() and aconvert_tree() methods.
+This module uses async/await syntax so it requires Python 3.5 or later
+and is only imported when those methods are called."""
+
+import asyncio
+import functools
+import locale
+import os
+from .CoNLL import Corpus
+from .StanfordDependencies import ConversionTimeoutError
+
+async def run_in_executor(function, *args, executor=None, **kwargs):
+    """Call function(*args, **kwargs) in executor (the event loop's
+    default executor if None) and return its result. If the coroutine
+    is cancelled, the call is left to finish in the background and its
+    result is discarded."""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor,
+                                      functools.partial(function, *args,
+                                                        **kwargs))
+
+async def first_sentence(sentences):
+    """Await a coroutine which returns a Corpus and return its first
+    Sentence."""
+    return (await sentences)[0]
+
+async def subprocess_convert_trees(backend, ptb_trees, representation,
+                                   include_punct, include_erased, universal,
+                                   debug, workers, timeout):
+    """Asynchronous version of SubprocessBackend.convert_trees() which
+    runs each shard with an asyncio subprocess."""
+    backend._raise_on_bad_representation(representation)
+    ptb_trees = list(backend._checked_trees(ptb_trees))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(ptb_trees)))
+    shards = backend._split_into_shards(ptb_trees, workers)
+    tasks = []
+    for shard in shards:
+        batch = subprocess_convert_batch(backend, shard, representation,
+                                         include_punct, include_erased,
+                                         universal, debug, timeout)
+        tasks.append(asyncio.ensure_future(batch))
+    try:
+        converted_shards = await asyncio.gather(*tasks)
+    except Exception:
+        # no point in finishing the other shards
+        for task in tasks:
+            task.cancel()
+        raise
+    sentences = Corpus()
+    for converted_shard in converted_shards:
+        sentences.extend(converted_shard)
+    return sentences
+
+async def subprocess_convert_batch(backend, ptb_trees, representation,
+                                   include_punct, include_erased, universal,
+                                   debug, timeout):
+    """Asynchronous version of SubprocessBackend._convert_batch(). If
+    the coroutine is cancelled or times out, the Java process is
+    killed."""
+    tree_filename = backend._write_tree_file(ptb_trees)
+    try:
+        command = backend._get_batch_command(tree_filename, representation,
+                                             include_punct, include_erased,
+                                             universal, debug)
+        sd_process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE)
+        try:
+            # communicate() reads stdout and stderr concurrently
+            stdout, stderr = await asyncio.wait_for(sd_process.communicate(),
+                                                    timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as error:
+            if sd_process.returncode is None:
+                sd_process.kill()
+            await sd_process.wait()
+            if isinstance(error, asyncio.TimeoutError):
+                raise ConversionTimeoutError(timeout)
+            raise
+    finally:
+        os.remove(tree_filename)
+    # same decoding as universal_newlines=True in _convert_batch()
+    encoding = locale.getpreferredencoding(False)
+    return backend._read_batch_output(stdout.decode(encoding),
+                                      stderr.decode(encoding),
+                                      sd_process.returncode, ptb_trees,
+                                      include_punct, include_erased, debug)
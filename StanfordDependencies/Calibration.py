@@ -0,0 +1,220 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Picks the fastest backend for get_instance(backend='auto'). Each
+candidate backend is timed in a separate process (so a JVM started for
+JPype doesn't stay in this one and crashes are contained) and the
+measurements are stored with downloaded jars, keyed by the jar file and
+Java runtime, so calibration only happens once per setup."""
+
+from __future__ import print_function
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which # Python 2
+from .FileHelper import replace_file
+from .JavaHelper import get_jar_identity, get_jvm_process_context
+
+# (backend, constructor arguments) pairs which are timed. The
+# subprocess variants differ in how batches are run: a new Java process
+# per call, one long-lived Java process, or new processes which start
+# faster thanks to class data sharing.
+CANDIDATES = (('jpype', {}),
+              ('subprocess', {}),
+              ('subprocess', dict(persistent=True)),
+              ('subprocess', dict(class_data_sharing=True)))
+
+# the number of trees in a batch if the caller doesn't say
+DEFAULT_BATCH_SIZE = 100
+
+# trees converted while timing a backend
+CALIBRATION_TREES = (
+    '(ROOT (S (NP (DT Some) (JJ blue) (NN moose)) (VP (VBZ sleeps)) (. .)))',
+    '(ROOT (S (NP (NNP Ms.) (NNP Smith)) (VP (VBD gave) (NP (PRP him)) '
+    '(NP (DT a) (NN book)) (PP (IN about) (NP (NNS geese)))) (. .)))',
+    '(ROOT (S (S (NP (PRP It)) (VP (VBD rained))) (, ,) (CC but) '
+    '(S (NP (DT the) (NNS children)) (VP (VBD played) (ADVP (RB outside)))) '
+    '(. .)))')
+
+# number of trees in the larger batch used to measure per-tree costs
+CALIBRATION_BATCH_SIZE = 60
+
+# seconds to wait for a backend to be timed before giving up on it
+CALIBRATION_TIMEOUT = 300
+
+# where measurements are stored (in INSTALL_DIR)
+CALIBRATION_FILENAME = 'calibration.json'
+
+def get_java_identity(java_command='java'):
+    """Returns a string which changes whenever the Java runtime
+    (java_command or JAVA_HOME, which JPype uses) changes."""
+    java_path = which(java_command)
+    if java_path is None:
+        java_identity = java_command
+    else:
+        java_path = os.path.realpath(java_path)
+        java_identity = '%s:%d' % (java_path,
+                                   int(os.stat(java_path).st_mtime))
+    return '%s:%s' % (java_identity, os.environ.get('JAVA_HOME', ''))
+
+def choose_backend(jar_filename, expected_batch_size=DEFAULT_BATCH_SIZE,
+                   recalibrate=False, debug=False, java_command='java'):
+    """Returns (backend, constructor arguments) for the backend which
+    converts batches of expected_batch_size trees fastest with
+    jar_filename (see get_instance()) or None if no backend works.
+    Measurements are reused unless recalibrate is True. java_command is
+    passed on to SubprocessBackend."""
+    measurements = get_measurements(jar_filename, recalibrate, debug,
+                                    java_command)
+    return pick_fastest(measurements, expected_batch_size)
+
+def get_measurements(jar_filename, recalibrate=False, debug=False,
+                     java_command='java'):
+    """Returns a list of measurements (see measure_candidate()) for each
+    item in CANDIDATES, loading them from disk if they've already been
+    made for this jar file and Java runtime."""
+    from .StanfordDependencies import INSTALL_DIR
+    install_dir = os.path.expanduser(INSTALL_DIR)
+    filename = os.path.join(install_dir, CALIBRATION_FILENAME)
+    setup_key = '%s|%s' % (get_jar_identity(jar_filename),
+                           get_java_identity(java_command))
+    calibrations = {}
+    if os.path.exists(filename):
+        try:
+            with io.open(filename, encoding='utf-8') as calibration_file:
+                calibrations = json.load(calibration_file)
+        except ValueError:
+            pass # corrupt so we'll overwrite it
+    if setup_key in calibrations and not recalibrate:
+        return calibrations[setup_key]
+
+    measurements = [run_candidate(jar_filename, backend, backend_args, debug,
+                                  java_command)
+                    for backend, backend_args in CANDIDATES]
+    calibrations[setup_key] = measurements
+    if not os.path.exists(install_dir):
+        os.makedirs(install_dir)
+    # written to a scratch file first so other processes never see a
+    # partially written file
+    handle, scratch_filename = tempfile.mkstemp(suffix='.json',
+                                                dir=install_dir)
+    os.close(handle)
+    try:
+        with io.open(scratch_filename, 'w',
+                     encoding='utf-8') as calibration_file:
+            calibration_file.write(json.dumps(calibrations, indent=1,
+                                              sort_keys=True))
+        replace_file(scratch_filename, filename)
+    finally:
+        if os.path.exists(scratch_filename):
+            os.remove(scratch_filename)
+    return measurements
+
+def pick_fastest(measurements, expected_batch_size):
+    """Returns (backend, constructor arguments) for the measurement
+    with the lowest estimated time to convert expected_batch_size trees
+    in a single call or None if there are no successful measurements.
+    Startup costs are paid once per backend rather than once per call so
+    they only break ties."""
+    best = None
+    for measurement in measurements:
+        if measurement.get('error'):
+            continue
+        batch_time = measurement['per_tree'] * expected_batch_size
+        estimate = (measurement['overhead'] + batch_time,
+                    measurement['startup'])
+        if best is None or estimate < best[0]:
+            best = (estimate, measurement)
+    if best is None:
+        return None
+    return best[1]['backend'], best[1]['backend_args']
+
+def run_candidate(jar_filename, backend, backend_args, debug=False,
+                  java_command='java'):
+    """Runs measure_candidate() in a new process and returns its
+    measurement. The process is spawned rather than forked where
+    possible (see get_jvm_process_context())."""
+    measurement = dict(backend=backend, backend_args=backend_args)
+    try:
+        context = get_jvm_process_context()
+    except EnvironmentError as ee:
+        if backend == 'jpype':
+            measurement.update(error=str(ee))
+            if debug:
+                print('Calibration:', measurement)
+            return measurement
+        context = multiprocessing # forking is fine without JPype
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=measure_candidate,
+                              args=(sender, jar_filename, backend,
+                                    backend_args, java_command))
+    process.daemon = True
+    process.start()
+    sender.close()
+    if receiver.poll(CALIBRATION_TIMEOUT):
+        try:
+            measurement.update(receiver.recv())
+        except EOFError:
+            measurement.update(error='backend process died')
+    else:
+        measurement.update(error='timed out')
+    process.terminate()
+    process.join()
+    receiver.close()
+    if debug:
+        print('Calibration:', measurement)
+    return measurement
+
+def measure_candidate(connection, jar_filename, backend, backend_args,
+                      java_command='java'):
+    """Times a backend and sends a dictionary with its startup time
+    (creating it and converting a first tree), overhead (time per call
+    to convert_trees()), and per_tree time (all in seconds) through
+    connection. If the backend doesn't work, the dictionary only
+    contains an error message."""
+    try:
+        constructor_args = dict(backend_args, jar_filename=jar_filename)
+        if backend == 'jpype':
+            from .JPypeBackend import JPypeBackend as backend_class
+        else:
+            from .SubprocessBackend import SubprocessBackend as backend_class
+            constructor_args.update(java_command=java_command)
+        start = time.time()
+        sd = backend_class(**constructor_args)
+        sd.convert_tree(CALIBRATION_TREES[0])
+        startup = time.time() - start
+
+        start = time.time()
+        sd.convert_trees(CALIBRATION_TREES[:1])
+        single_time = time.time() - start
+        trees = CALIBRATION_TREES * CALIBRATION_BATCH_SIZE
+        trees = trees[:CALIBRATION_BATCH_SIZE]
+        start = time.time()
+        sd.convert_trees(trees)
+        batch_time = time.time() - start
+        sd.close()
+        for name, value in backend_args.items():
+            # e.g., class data sharing is disabled if Java is too old
+            if getattr(sd, name) != value:
+                raise EnvironmentError('%s was disabled' % name)
+    except Exception as exc:
+        connection.send(dict(error='%s: %s' % (exc.__class__.__name__, exc)))
+        return
+    per_tree = max(batch_time - single_time, 0) / (len(trees) - 1)
+    connection.send(dict(startup=startup, per_tree=per_tree,
+                         overhead=max(single_time - per_tree, 0)))
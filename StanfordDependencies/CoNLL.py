@@ -11,8 +11,14 @@
 # limitations under the License.
 
 from collections import namedtuple
+import io
 import re
 
+try:
+    string_type = basestring # Python 2.6/7
+except NameError:
+    string_type = str # Python 3
+
 # picks out (tag, word) from Penn Treebank-style trees
 ptb_tags_and_words_re = re.compile(r'\(\s*([^\s()]+)\s+([^\s()]+)\s*\)')
 
@@ -45,7 +51,9 @@ class Token(namedtuple('Token', FIELD_NAMES_PLUS)):
     for a complete description."""
     def __lt__(self, other):
         """Provides an ordering over Tokens. Tokens are compared by each
-        field in order."""
+        field in order (CompactTokens are compared as Tokens)."""
+        if isinstance(other, CompactToken):
+            other = other.as_token()
         if not isinstance(other, Token):
             raise TypeError("unorderable types: %s < %s" %
                             (self.__class__.__name__,
@@ -84,14 +92,195 @@ class Token(namedtuple('Token', FIELD_NAMES_PLUS)):
     @classmethod
     def from_conll(this_class, text):
         """Construct a Token from a line in CoNLL-X format."""
-        fields = text.split('\t')
-        fields[0] = int(fields[0]) # index
-        fields[6] = int(fields[6]) # head index
-        if fields[5] != '_': # feats
-            fields[5] = tuple(fields[5].split('|'))
-        fields = [value if value != '_' else None for value in fields]
-        fields.append(None) # for extra
-        return this_class(**dict(zip(FIELD_NAMES_PLUS, fields)))
+        values = parse_conll_line(text)
+        if values is None:
+            raise ValueError('Empty CoNLL-X line')
+        return this_class(*values)
+    def compact(self):
+        """Returns a CompactToken with the same fields."""
+        return CompactToken(*self)
+
+def parse_conll_line(line):
+    """Returns the values of the fields of a Token (with None for extra)
+    from a line in CoNLL-X format or None if the line is blank. Raises
+    ValueError if the line doesn't have ten fields (after removing
+    whitespace around it, e.g. a trailing tab)."""
+    fields = line.split('\t')
+    if len(fields) != 10:
+        line = line.strip()
+        if not line:
+            return None
+        fields = line.split('\t')
+        if len(fields) != 10:
+            raise ValueError('Expected 10 fields in CoNLL-X line: %r' % line)
+    (index, form, lemma, cpos, pos, feats, head, deprel, phead,
+     pdeprel) = fields
+    # only the last field can have the line ending (int() ignores
+    # whitespace around the index)
+    pdeprel = pdeprel.rstrip()
+    return (int(index),
+            None if form == '_' else form,
+            None if lemma == '_' else lemma,
+            None if cpos == '_' else cpos,
+            None if pos == '_' else pos,
+            None if feats == '_' else tuple(feats.split('|')),
+            None if head == '_' else int(head),
+            None if deprel == '_' else deprel,
+            None if phead == '_' else phead,
+            None if pdeprel == '_' else pdeprel,
+            None) # extra
+
+# strings (and feats tuples) shared by all CompactTokens
+interned_values = {}
+
+def intern_value(value):
+    """Returns a single shared copy of value (a string or tuple of
+    strings). Unlike intern(), this works for unicode in Python 2."""
+    if value is None:
+        return None
+    return interned_values.setdefault(value, value)
+
+class CompactToken(object):
+    """A Token which takes less memory, for keeping many sentences
+    around. Strings are shared between all CompactTokens, pos is only
+    stored once when it's the same as cpos, the rarely used fields
+    (feats, phead, pdeprel, and extra keys other than gov_is_copy and
+    dep_is_copy) are kept together, and copy flags are packed into an
+    integer rather than an extra dictionary. CompactTokens are created
+    like Tokens and provide the same fields (extra is rebuilt when
+    needed), _replace(), as_conll(), ordering, and equality (including
+    with equivalent Tokens). They are immutable."""
+    __slots__ = ('index', 'form', 'lemma', 'pos', 'head', 'deprel',
+                 'copy_flags', 'rare')
+    _fields = FIELD_NAMES_PLUS
+    def __init__(self, index, form, lemma, cpos, pos, feats, head, deprel,
+                 phead, pdeprel, extra):
+        set_field = object.__setattr__
+        set_field(self, 'index', index)
+        set_field(self, 'form', intern_value(form))
+        set_field(self, 'lemma', intern_value(lemma))
+        set_field(self, 'pos', intern_value(pos))
+        set_field(self, 'head', head)
+        set_field(self, 'deprel', intern_value(deprel))
+        copy_flags = 0
+        other_extra = None
+        if extra:
+            other_extra = dict(extra)
+            copy_flags = other_extra.pop('gov_is_copy', 0) | \
+                other_extra.pop('dep_is_copy', 0) << 16
+            other_extra = tuple(sorted(other_extra.items())) or None
+        set_field(self, 'copy_flags', copy_flags)
+        if cpos == pos and feats is None and phead is None and \
+           pdeprel is None and other_extra is None:
+            rare = None
+        else:
+            rare = (intern_value(cpos), intern_value(feats), phead,
+                    intern_value(pdeprel), other_extra)
+        set_field(self, 'rare', rare)
+    @property
+    def cpos(self):
+        if self.rare is None:
+            return self.pos
+        return self.rare[0]
+    @property
+    def feats(self):
+        if self.rare is None:
+            return None
+        return self.rare[1]
+    @property
+    def phead(self):
+        if self.rare is None:
+            return None
+        return self.rare[2]
+    @property
+    def pdeprel(self):
+        if self.rare is None:
+            return None
+        return self.rare[3]
+    @property
+    def extra(self):
+        """A new dictionary with the copy flags and any other extra
+        values or None if there aren't any."""
+        if self.rare is None:
+            other_extra = None
+        else:
+            other_extra = self.rare[4]
+        if not self.copy_flags and other_extra is None:
+            return None
+        extra = dict(other_extra or ())
+        gov_is_copy = self.copy_flags & 0xffff
+        dep_is_copy = self.copy_flags >> 16
+        if gov_is_copy:
+            extra['gov_is_copy'] = gov_is_copy
+        if dep_is_copy:
+            extra['dep_is_copy'] = dep_is_copy
+        return extra
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute")
+    def __iter__(self):
+        return iter(self.as_token())
+    def __len__(self):
+        return len(FIELD_NAMES_PLUS)
+    def __getitem__(self, index):
+        return self.as_token()[index]
+    def __eq__(self, other):
+        if isinstance(other, CompactToken):
+            return (self.index, self.form, self.lemma, self.pos, self.head,
+                    self.deprel, self.copy_flags, self.rare) == \
+                (other.index, other.form, other.lemma, other.pos,
+                 other.head, other.deprel, other.copy_flags, other.rare)
+        if isinstance(other, Token):
+            return self.as_token() == other
+        return NotImplemented
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+    def __hash__(self):
+        token = self.as_token()
+        if token.extra is None:
+            # same as an equivalent Token
+            return hash(token)
+        # Tokens with extra can't be hashed since it's a dictionary
+        return hash(token[:-1] + (tuple(sorted(token.extra.items())),))
+    def __lt__(self, other):
+        """Ordered like the equivalent Token (see Token.__lt__())."""
+        if not isinstance(other, (CompactToken, Token)):
+            raise TypeError("unorderable types: %s < %s" %
+                            (self.__class__.__name__,
+                             other.__class__.__name__))
+        return self.as_token() < other
+    def __reduce__(self):
+        return (self.__class__, tuple(self.as_token()))
+    def __repr__(self):
+        """Represent this CompactToken as Python code, skipping fields
+        with empty values (see Token.__repr__())."""
+        token_repr = repr(self.as_token())
+        return self.__class__.__name__ + token_repr[len('Token'):]
+    def _replace(self, **fields):
+        """Returns a new CompactToken with some fields replaced."""
+        return CompactToken(*self.as_token()._replace(**fields))
+    def _asdict(self):
+        return self.as_token()._asdict()
+    def as_token(self):
+        """Returns a regular Token with the same fields."""
+        return Token(self.index, self.form, self.lemma, self.cpos, self.pos,
+                     self.feats, self.head, self.deprel, self.phead,
+                     self.pdeprel, self.extra)
+    def as_conll(self):
+        """Represent this CompactToken as a line as a string in CoNLL-X
+        format."""
+        return self.as_token().as_conll()
+    def compact(self):
+        return self
+    @classmethod
+    def from_conll(this_class, text):
+        """Construct a CompactToken from a line in CoNLL-X format."""
+        values = parse_conll_line(text)
+        if values is None:
+            raise ValueError('Empty CoNLL-X line')
+        return this_class(*values)
 
 class Sentence(list):
     """Sequence of Token objects."""
@@ -112,6 +301,10 @@ class Sentence(list):
             self[:] = [token._replace(index=mapping[token.index],
                                       head=mapping[token.head])
                        for token in self]
+    def compact(self):
+        """Returns a copy of this Sentence with CompactTokens, which
+        take less memory than Tokens."""
+        return self.__class__(token.compact() for token in self)
     def as_conll(self):
         """Represent this Sentence as a string in CoNLL-X format.  Note
         that this doesn't end in a newline. Also see Corpus.as_conll()
@@ -191,16 +384,21 @@ class Sentence(list):
         return graph
 
     @classmethod
-    def from_conll(this_class, stream):
+    def from_conll(this_class, stream, compact=False):
         """Construct a Sentence. stream is an iterable over strings where
         each string is a line in CoNLL-X format. If there are multiple
-        sentences in this stream, we only return the first one."""
+        sentences in this stream, we only return the first one. If
+        compact is True, the Sentence holds CompactTokens."""
+        if compact:
+            token_class = CompactToken
+        else:
+            token_class = Token
         stream = iter(stream)
         sentence = this_class()
         for line in stream:
-            line = line.strip()
-            if line:
-                sentence.append(Token.from_conll(line))
+            values = parse_conll_line(line)
+            if values is not None:
+                sentence.append(token_class(*values))
             elif sentence:
                 return sentence
         return sentence
@@ -273,20 +471,22 @@ class Corpus(list):
         if not self:
             return ''
         return '\n\n'.join(sentence.as_conll() for sentence in self) + '\n'
+    def compact(self):
+        """Returns a copy of this Corpus with CompactTokens, which take
+        less memory than Tokens."""
+        return self.__class__(sentence.compact() for sentence in self)
+    def as_columnar(self):
+        """Returns a ColumnarCorpus with the same sentences, stored as
+        NumPy arrays. Requires the numpy package."""
+        from .ColumnarCorpus import ColumnarCorpus
+        return ColumnarCorpus.from_corpus(self)
     @classmethod
-    def from_conll(this_class, stream):
+    def from_conll(this_class, stream, compact=False):
         """Construct a Corpus. stream is an iterable over strings where
-        each string is a line in CoNLL-X format."""
-        stream = iter(stream)
-        corpus = this_class()
-        while 1:
-            # read until we get an empty sentence
-            sentence = Sentence.from_conll(stream)
-            if sentence:
-                corpus.append(sentence)
-            else:
-                break
-        return corpus
+        each string is a line in CoNLL-X format (or a filename, see
+        iter_conll() to read sentences one at a time). If compact is
+        True, sentences hold CompactTokens."""
+        return this_class(iter_conll(stream, compact))
     @classmethod
     def from_stanford_dependencies(this_class, stream, trees,
                                    include_erased=False, include_punct=True):
@@ -307,3 +507,30 @@ class Corpus(list):
                                                            include_punct)
             corpus.append(sentence)
         return corpus
+
+def iter_conll(path_or_stream, compact=False):
+    """Yields each Sentence in a CoNLL-X file as soon as it has been
+    read so files of any size can be processed in constant memory.
+    path_or_stream is a filename (read as UTF-8) or an iterable over
+    strings where each string is a line in CoNLL-X format. If compact is
+    True, sentences hold CompactTokens. Raises ValueError on malformed
+    lines."""
+    if isinstance(path_or_stream, string_type):
+        with io.open(path_or_stream, encoding='utf-8') as stream:
+            for sentence in iter_conll(stream, compact):
+                yield sentence
+        return
+    if compact:
+        token_class = CompactToken
+    else:
+        token_class = Token
+    sentence = Sentence()
+    for line in path_or_stream:
+        values = parse_conll_line(line)
+        if values is not None:
+            sentence.append(token_class(*values))
+        elif sentence:
+            yield sentence
+            sentence = Sentence()
+    if sentence:
+        yield sentence
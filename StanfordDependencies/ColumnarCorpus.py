@@ -0,0 +1,268 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Stores a corpus as NumPy arrays so corpus-wide computations can be
+vectorized. Requires numpy ('pip install PyStanfordDependencies[numpy]').
+Example:
+
+    >>> columnar = corpus.as_columnar()
+    >>> index = columnar.columns['index']
+    >>> head = columnar.columns['head']
+    >>> distances = (head - index)[head > 0]
+    >>> columnar.counts('deprel')
+    {'det': 2, 'root': 2, ...}
+    >>> short = columnar.filter(columnar.sentence_lengths() <= 40)
+    >>> short.to_corpus()"""
+
+import numpy
+from .CoNLL import FIELD_NAMES_PLUS, Corpus, Sentence, Token
+
+# fields stored as ids into a vocabulary (the values are vocabulary
+# names) -- all other fields are integers. phead is a string in Tokens
+# read from CoNLL-X files (and needn't be a number) so it's kept as is.
+VOCABULARY_NAMES = dict(form='form', lemma='lemma', cpos='tag', pos='tag',
+                        feats='feats', phead='phead', deprel='deprel',
+                        pdeprel='deprel', extra='extra')
+
+# stands for None in every column
+NONE_ID = -1
+
+class ColumnarCorpus(object):
+    """A corpus stored as one NumPy array (column) per Token field with
+    a value for each token in the corpus. columns maps field names to
+    int32 arrays. index and head hold the actual numbers while other
+    fields hold ids into vocabularies, which maps vocabulary names
+    (see VOCABULARY_NAMES) to lists of values. NONE_ID (-1) stands for
+    None in every column. The tokens of sentence i are at positions
+    offsets[i] to offsets[i + 1] in each column (offsets[0] is always
+    0).
+
+    Indexing gives a SentenceView and slicing gives another
+    ColumnarCorpus, both sharing this corpus's arrays. Use
+    Corpus.as_columnar() or from_corpus() to make one and to_corpus()
+    to convert back (with the same Tokens)."""
+    def __init__(self, columns, offsets, vocabularies):
+        self.columns = columns
+        self.offsets = offsets
+        self.vocabularies = vocabularies
+        self.vocabulary_ids = None # value -> id tables, built when needed
+    def __len__(self):
+        """Number of sentences."""
+        return len(self.offsets) - 1
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return self.filter(numpy.arange(len(self))[index])
+            stop = max(start, stop)
+            first = self.offsets[start]
+            last = self.offsets[stop]
+            columns = dict((field, column[first:last])
+                           for field, column in self.columns.items())
+            return self.__class__(columns,
+                                  self.offsets[start:stop + 1] - first,
+                                  self.vocabularies)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('sentence index out of range')
+        return SentenceView(self, int(self.offsets[index]),
+                            int(self.offsets[index + 1]))
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+    def __eq__(self, other):
+        if not isinstance(other, (ColumnarCorpus, Corpus)):
+            return NotImplemented
+        return len(self) == len(other) and \
+            all(mine == theirs for mine, theirs in zip(self, other))
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+    __hash__ = None
+    def __repr__(self):
+        return '<%s with %d sentences, %d tokens>' % \
+            (self.__class__.__name__, len(self), self.token_count())
+    def token_count(self):
+        return int(self.offsets[-1])
+    def sentence_lengths(self):
+        """Returns an array with the number of tokens in each sentence."""
+        return numpy.diff(self.offsets)
+    def sentence_ids(self):
+        """Returns an array with the sentence number of each token."""
+        return numpy.repeat(numpy.arange(len(self)), self.sentence_lengths())
+    def get_id(self, field, value):
+        """Returns the id of value in the vocabulary for field (e.g.,
+        to compare with columns[field]) or NONE_ID if value is None or
+        not in the vocabulary."""
+        if value is None:
+            return NONE_ID
+        if self.vocabulary_ids is None:
+            self.vocabulary_ids = dict(
+                (name, dict((value, value_id) for value_id, value
+                            in enumerate(vocabulary)))
+                for name, vocabulary in self.vocabularies.items())
+        if field == 'extra':
+            value = tuple(sorted(value.items()))
+        ids = self.vocabulary_ids[VOCABULARY_NAMES[field]]
+        return ids.get(value, NONE_ID)
+    def counts(self, field):
+        """Returns a dictionary from values of field to the number of
+        tokens with that value (None is not counted). Values of extra
+        are given as sorted tuples of (key, value) pairs."""
+        column = self.columns[field]
+        column = column[column != NONE_ID]
+        if field not in VOCABULARY_NAMES:
+            values, counts = numpy.unique(column, return_counts=True)
+            return dict(zip(values.tolist(), counts.tolist()))
+        vocabulary = self.vocabularies[VOCABULARY_NAMES[field]]
+        counts = numpy.bincount(column, minlength=len(vocabulary))
+        return dict((vocabulary[value_id], count)
+                    for value_id, count in enumerate(counts.tolist())
+                    if count)
+    def filter(self, sentences):
+        """Returns a new ColumnarCorpus with some of the sentences (and
+        copies of their columns). sentences is either an array of
+        booleans with an entry for each sentence (e.g.,
+        corpus.sentence_lengths() < 10) or an array of sentence
+        numbers."""
+        sentences = numpy.asarray(sentences)
+        if sentences.dtype != bool:
+            sentences = numpy.asarray(sentences, dtype=numpy.intp)
+        lengths = self.sentence_lengths()[sentences]
+        if sentences.dtype == bool:
+            token_positions = numpy.repeat(sentences, self.sentence_lengths())
+        elif len(sentences):
+            starts = self.offsets[sentences]
+            ends = starts + lengths
+            token_positions = numpy.concatenate(
+                [numpy.arange(start, end) for start, end in zip(starts, ends)])
+        else:
+            token_positions = numpy.zeros(0, dtype=numpy.intp)
+        columns = dict((field, column[token_positions])
+                       for field, column in self.columns.items())
+        offsets = numpy.zeros(len(lengths) + 1, dtype=numpy.int64)
+        numpy.cumsum(lengths, out=offsets[1:])
+        return self.__class__(columns, offsets, self.vocabularies)
+    def to_corpus(self):
+        """Returns a regular Corpus of Sentences of Tokens."""
+        corpus = Corpus()
+        tokens = self.decode_tokens(0, self.token_count())
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            corpus.append(Sentence(tokens[start:end]))
+        return corpus
+    def decode_tokens(self, start, end):
+        """Returns a list of Tokens for positions start to end of the
+        columns."""
+        values = []
+        for field in FIELD_NAMES_PLUS:
+            column = self.columns[field][start:end].tolist()
+            if field in VOCABULARY_NAMES:
+                vocabulary = self.vocabularies[VOCABULARY_NAMES[field]]
+                column = [None if value_id == NONE_ID else
+                          decode_value(field, vocabulary[value_id])
+                          for value_id in column]
+            else:
+                column = [None if value == NONE_ID else value
+                          for value in column]
+            values.append(column)
+        return [Token(*fields) for fields in zip(*values)]
+    @classmethod
+    def from_corpus(this_class, corpus):
+        """Construct a ColumnarCorpus from a Corpus (or any iterable of
+        sentences of Tokens or CompactTokens)."""
+        vocabularies = dict((name, []) for name in VOCABULARY_NAMES.values())
+        vocabulary_ids = dict((name, {}) for name in vocabularies)
+        fields = []
+        for field in FIELD_NAMES_PLUS:
+            name = VOCABULARY_NAMES.get(field)
+            if name is None:
+                fields.append((field, None, None, []))
+            else:
+                fields.append((field, vocabularies[name],
+                               vocabulary_ids[name], []))
+        offsets = [0]
+        for sentence in corpus:
+            for token in sentence:
+                for field, vocabulary, ids, values in fields:
+                    value = getattr(token, field)
+                    if value is None:
+                        values.append(NONE_ID)
+                    elif ids is None:
+                        values.append(value)
+                    else:
+                        if field == 'extra':
+                            value = tuple(sorted(value.items()))
+                        value_id = ids.get(value)
+                        if value_id is None:
+                            value_id = len(vocabulary)
+                            vocabulary.append(value)
+                            ids[value] = value_id
+                        values.append(value_id)
+            offsets.append(offsets[-1] + len(sentence))
+        columns = dict((field, numpy.array(values, dtype=numpy.int32))
+                       for field, _, _, values in fields)
+        return this_class(columns, numpy.array(offsets, dtype=numpy.int64),
+                          vocabularies)
+
+class SentenceView(object):
+    """A sentence in a ColumnarCorpus. Tokens are created when they're
+    accessed. columns holds this sentence's part of the corpus's columns
+    without copying them."""
+    def __init__(self, corpus, start, end):
+        self.corpus = corpus
+        self.start = start
+        self.end = end
+    @property
+    def columns(self):
+        return dict((field, column[self.start:self.end])
+                    for field, column in self.corpus.columns.items())
+    def __len__(self):
+        return self.end - self.start
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_sentence()[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('token index out of range')
+        position = self.start + index
+        return self.corpus.decode_tokens(position, position + 1)[0]
+    def __iter__(self):
+        return iter(self.to_sentence())
+    def __eq__(self, other):
+        if not isinstance(other, (SentenceView, list)):
+            return NotImplemented
+        return self.to_sentence() == list(other)
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+    __hash__ = None
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.to_sentence())
+    def to_sentence(self):
+        """Returns a regular Sentence of Tokens."""
+        return Sentence(self.corpus.decode_tokens(self.start, self.end))
+    def as_conll(self):
+        """Represent this sentence as a string in CoNLL-X format (see
+        Sentence.as_conll())."""
+        return self.to_sentence().as_conll()
+
+def decode_value(field, value):
+    if field == 'extra':
+        return dict(value)
+    return value
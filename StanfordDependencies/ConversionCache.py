@@ -0,0 +1,175 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from .CoNLL import Sentence, Token
+
+try:
+    text_type = unicode # Python 2
+except NameError:
+    text_type = str # Python 3
+
+# default maximum number of converted sentences kept in memory
+DEFAULT_MAX_SIZE = 10000
+
+# default name of the on-disk cache (stored in INSTALL_DIR)
+DEFAULT_FILENAME = 'conversions.sqlite'
+
+# maximum number of keys looked up in a single SQL query (older
+# versions of SQLite allow at most 999 parameters)
+QUERY_SIZE = 500
+
+class ConversionCache:
+    """Cache of converted Sentences for the conversion_cache argument
+    of StanfordDependencies backends. Sentences are keyed by a hash of
+    the Penn Treebank tree, the conversion options, and the jar file
+    (see make_key()) so that changing any of them results in a fresh
+    conversion.
+
+    There are two tiers: up to max_size recently used Sentences are
+    kept in memory (None means no limit) and all Sentences are also
+    stored in an SQLite database so they're available to later runs
+    and other processes. By default, the database is stored with
+    downloaded jar files. Set persistent=False to only cache in memory.
+    hits and misses count lookups in either tier."""
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, filename=None,
+                 persistent=True):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # backends may convert from several threads at once
+        self.lock = threading.Lock()
+        self.database = None
+        if persistent:
+            if filename is None:
+                from .StanfordDependencies import INSTALL_DIR
+                install_dir = os.path.expanduser(INSTALL_DIR)
+                if not os.path.exists(install_dir):
+                    os.makedirs(install_dir)
+                filename = os.path.join(install_dir, DEFAULT_FILENAME)
+            self.database = sqlite3.connect(filename, timeout=60,
+                                            check_same_thread=False)
+            self.database.execute('CREATE TABLE IF NOT EXISTS conversions '
+                                  '(key TEXT PRIMARY KEY, sentence TEXT)')
+            self.database.commit()
+        self.filename = filename
+    def get_many(self, keys):
+        """Returns a dictionary mapping each key in keys which is in the
+        cache to its Sentence."""
+        found = {}
+        with self.lock:
+            unseen = []
+            for key in keys:
+                if key in found:
+                    continue
+                if key in self.entries:
+                    # mark as most recently used
+                    sentence = self.entries.pop(key)
+                    self.entries[key] = sentence
+                    found[key] = Sentence(sentence)
+                else:
+                    unseen.append(key)
+            if self.database is not None:
+                for start in range(0, len(unseen), QUERY_SIZE):
+                    query_keys = unseen[start:start + QUERY_SIZE]
+                    rows = self.database.execute(
+                        'SELECT key, sentence FROM conversions WHERE key IN '
+                        '(%s)' % ', '.join('?' * len(query_keys)), query_keys)
+                    for key, serialized in rows:
+                        sentence = self._deserialize(serialized)
+                        self._remember(key, sentence)
+                        found[key] = Sentence(sentence)
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+    def set_many(self, items):
+        """Add (key, Sentence) pairs to the cache."""
+        items = list(items)
+        with self.lock:
+            for key, sentence in items:
+                self._remember(key, Sentence(sentence))
+            if self.database is not None:
+                rows = [(key, self._serialize(sentence))
+                        for key, sentence in items]
+                self.database.executemany('INSERT OR REPLACE INTO '
+                                          'conversions VALUES (?, ?)', rows)
+                self.database.commit()
+    def get(self, key, default=None):
+        """Returns the Sentence for key or default if it's not in the
+        cache."""
+        return self.get_many([key]).get(key, default)
+    def __setitem__(self, key, sentence):
+        self.set_many([(key, sentence)])
+    def __len__(self):
+        """Number of Sentences in the cache (including those which are
+        only stored on disk)."""
+        with self.lock:
+            if self.database is None:
+                return len(self.entries)
+            return self.database.execute('SELECT COUNT(*) FROM '
+                                         'conversions').fetchone()[0]
+    def clear(self):
+        """Remove all Sentences (from both tiers) and reset the
+        statistics."""
+        with self.lock:
+            self.entries.clear()
+            if self.database is not None:
+                self.database.execute('DELETE FROM conversions')
+                self.database.commit()
+            self.hits = 0
+            self.misses = 0
+    def stats(self):
+        """Returns a dictionary of statistics about the cache: hits,
+        misses, hit_rate (None if there haven't been any lookups), and
+        size (Sentences in memory)."""
+        lookups = self.hits + self.misses
+        return dict(hits=self.hits, misses=self.misses,
+                    hit_rate=float(self.hits) / lookups if lookups else None,
+                    size=len(self.entries))
+    def close(self):
+        """Close the database. The cache only uses memory afterwards."""
+        with self.lock:
+            if self.database is not None:
+                self.database.close()
+                self.database = None
+
+    def _remember(self, key, sentence):
+        """Store a Sentence in memory, evicting the least recently used
+        one if we're over max_size."""
+        self.entries.pop(key, None)
+        self.entries[key] = sentence
+        if self.max_size is not None:
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    @staticmethod
+    def make_key(ptb_tree, options, jar_identity):
+        """Returns the cache key for converting ptb_tree with a
+        dictionary of conversion options using the jar file described
+        by jar_identity (see JavaHelper.get_jar_identity())."""
+        serialized = json.dumps([ptb_tree, sorted(options.items()),
+                                 jar_identity])
+        return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+    @staticmethod
+    def _serialize(sentence):
+        # default=text_type handles Java strings from JPypeBackend
+        return json.dumps([list(token) for token in sentence],
+                          default=text_type)
+    @staticmethod
+    def _deserialize(serialized):
+        return Sentence(Token(*fields) for fields in json.loads(serialized))
@@ -11,21 +11,49 @@
 # limitations under the License.
 
 from __future__ import print_function
+import multiprocessing
+import os
+import threading
+import warnings
+from multiprocessing.pool import ThreadPool
 import jpype
 from .StanfordDependencies import (StanfordDependencies,
-                                   JavaRuntimeVersionError)
-from .CoNLL import Token, Sentence
+                                   JavaRuntimeVersionError, ConversionError,
+                                   ConversionTimeoutError,
+                                   bypassing_conversion_cache,
+                                   uses_conversion_cache)
+from .CoNLL import Corpus, Token, Sentence
+from .JavaHelper import HELPER_CLASS_NAME, get_helper_classpath
+from .LemmaCache import LemmaCache
+
+# maximum number of trees sent to Java at once by convert_trees()
+BATCH_SIZE = 1000
 
 class JPypeBackend(StanfordDependencies):
     """Faster backend than SubprocessBackend but requires you to install
-    jpype ('pip install JPype1', not 'JPype'). May be less stable. There's
-    no speed benefit of using convert_trees() over convert_tree() for this
-    backend. In terms of output, should be identical to SubprocessBackend
-    except that all string fields will be unicode. Additionally, has
-    the option to run the lemmatizer (see convert_tree())."""
+    jpype ('pip install JPype1', not 'JPype'). May be less stable. If
+    you have javac (from a JDK), convert_trees() converts each batch of
+    trees with a single call into Java which is considerably faster than
+    calling convert_tree() on each tree. In terms of output, should be
+    identical to SubprocessBackend except that all string fields will be
+    unicode. Additionally, has the option to run the lemmatizer (see
+    convert_tree()).
+
+    JPypeBackend objects can be used from several threads at once (each
+    thread is attached to the JVM when it first converts something).
+    Since JPype releases the GIL while Java is running, this lets
+    conversions use several cores -- see the threads option of
+    convert_trees().
+
+    Java code running in the JVM can't be stopped safely so conversions
+    which exceed their timeout are abandoned rather than interrupted.
+    When this happens, needs_recycling is set to True: the abandoned
+    conversion may still be using a CPU (or holding locks) so you may
+    want to replace the process using this backend."""
     def __init__(self, jar_filename=None, download_if_missing=False,
                  version=None, extra_jvm_args=None, start_jpype=True,
-                 jvm_path=None):
+                 jvm_path=None, lemma_cache=None, lazy=False, warmup=False,
+                 conversion_cache=None):
         """extra_jvm_args can be set to a list of strings which will
         be passed to your JVM.  If start_jpype is True, we will start
         a JVM via JPype if one hasn't been started already. The user is
@@ -33,15 +61,221 @@ class JPypeBackend(StanfordDependencies):
         are done converting. Once the JVM has been shutdown, you'll need
         to create a new JPypeBackend in order to convert after that.
         jvm_path is the path to libjvm.so (if None, will use JPype's
-        default JRE path)."""
+        default JRE path). lemma_cache is where lemmas are cached (see
+        stem()). It defaults to a new LemmaCache.LemmaCache which keeps
+        at most LemmaCache.DEFAULT_MAX_SIZE lemmas. This used to be an
+        unbounded dict: pass lemma_cache={} (or
+        LemmaCache(max_size=None)) to keep every lemma.
+
+        If lazy is True, the JVM isn't started (and Java classes aren't
+        looked up) until they're first needed so creating the backend
+        is nearly free. With warmup=True, this happens in a background
+        thread instead. Call ready() to wait for it. In both cases,
+        errors starting Java are raised by the first call which needs
+        Java rather than by the constructor."""
         StanfordDependencies.__init__(self, jar_filename, download_if_missing,
-                                      version)
-        if start_jpype and not jpype.isJVMStarted():
-            jpype.startJVM(jvm_path or jpype.getDefaultJVMPath(),
+                                      version, conversion_cache)
+        self.extra_jvm_args = extra_jvm_args
+        self.start_jpype = start_jpype
+        self.jvm_path = jvm_path
+        if lemma_cache is None:
+            lemma_cache = LemmaCache()
+        self.lemma_cache = lemma_cache
+        self.stemmer_lock = threading.Lock()
+        self.needs_recycling = False
+        self.initialized = False
+        self.initialization_lock = threading.Lock()
+        self.initialization_error = None
+        if warmup:
+            warmup_thread = threading.Thread(target=self._warm_up)
+            warmup_thread.daemon = True
+            warmup_thread.start()
+        elif not lazy:
+            self._initialize()
+    @uses_conversion_cache
+    def convert_trees(self, ptb_trees, representation='basic', universal=True,
+                      include_punct=True, include_erased=False,
+                      on_error='raise', add_lemmas=False, timeout=None,
+                      threads=1):
+        """Arguments are as in StanfordDependencies.convert_trees() and
+        convert_tree(). timeout applies to the whole batch.
+
+        Trees are sent to Java in batches of up to BATCH_SIZE trees.
+        Java returns the words and dependencies for each batch as flat
+        arrays of strings and ints which are then turned into Sentences
+        in Python. If the Java helper isn't available, this falls back
+        to calling convert_tree() for each tree.
+
+        threads is the number of threads to convert with in parallel
+        (one per CPU if None). The trees are split into that many
+        contiguous shards and the results are returned in the original
+        order."""
+        return self._call_with_timeout(timeout, self._convert_trees_threaded,
+                                       ptb_trees, representation, universal,
+                                       include_punct, include_erased,
+                                       on_error, add_lemmas, threads)
+    def convert_tree(self, ptb_tree, representation='basic',
+                     include_punct=True, include_erased=False,
+                     add_lemmas=False, universal=True, timeout=None):
+        """Arguments are as in StanfordDependencies.convert_trees but with
+        the addition of add_lemmas. If add_lemmas=True, we will run the
+        Stanford CoreNLP lemmatizer and fill in the lemma field."""
+        if self._should_use_conversion_cache():
+            return self.convert_trees([ptb_tree], representation,
+                                      universal, include_punct,
+                                      include_erased, add_lemmas=add_lemmas,
+                                      timeout=timeout)[0]
+        if timeout is not None:
+            return self._call_with_timeout(timeout, self.convert_tree,
+                                           ptb_tree, representation,
+                                           include_punct, include_erased,
+                                           add_lemmas, universal)
+        self._prepare_thread()
+        if self.convert_batch is not None:
+            # a batch of one still only needs a single call into Java
+            # instead of several for each word and dependency
+            return self._convert_trees([ptb_tree], representation,
+                                       universal, include_punct,
+                                       include_erased, 'raise',
+                                       add_lemmas)[0]
+        self._raise_on_bad_input(ptb_tree)
+        self._raise_on_bad_representation(representation)
+        tree = self._read_tree(ptb_tree)
+        deps = self._get_deps(tree, include_punct, representation,
+                              universal=universal)
+        sentence = self._make_sentence(self._get_words(tree), deps,
+                                       representation, include_punct,
+                                       include_erased)
+        if add_lemmas:
+            self._add_lemmas([sentence])
+        return sentence
+    def convert_trees_multi(self, ptb_trees, representations,
+                            universals=(True,), include_punct=True,
+                            include_erased=False, add_lemmas=False):
+        """Convert a list of trees into several representations at once
+        (see StanfordDependencies.convert_trees_multi()). Each tree is
+        read once and one GrammaticalStructure is built for each value
+        in universals. add_lemmas is as in convert_tree()."""
+        self._prepare_thread()
+        for representation in representations:
+            self._raise_on_bad_representation(representation)
+        results = dict(((representation, universal), Corpus())
+                       for universal in universals
+                       for representation in representations)
+        for ptb_tree in ptb_trees:
+            self._raise_on_bad_input(ptb_tree)
+            tree = self._read_tree(ptb_tree)
+            words = self._get_words(tree)
+            for universal in universals:
+                # structures may modify their tree so each one gets its
+                # own copy if there's more than one
+                if len(universals) > 1:
+                    structure_tree = tree.deepCopy()
+                else:
+                    structure_tree = tree
+                egs = self._get_structure(structure_tree, include_punct,
+                                          universal)
+                for representation in representations:
+                    deps = self._get_structure_deps(egs, representation)
+                    sentence = self._make_sentence(words, deps,
+                                                   representation,
+                                                   include_punct,
+                                                   include_erased)
+                    results[representation, universal].append(sentence)
+        if add_lemmas:
+            self._add_lemmas([sentence for sentences in results.values()
+                              for sentence in sentences])
+        return results
+    def stem(self, form, tag):
+        """Returns the stem of word with specific form and part-of-speech
+        tag according to the Stanford lemmatizer. Lemmas are cached in
+        lemma_cache."""
+        self._prepare_thread()
+        key = (form, tag)
+        lemma = self.lemma_cache.get(key)
+        if lemma is None:
+            # not all CoreNLP versions have a thread-safe stemmer
+            with self.stemmer_lock:
+                lemma = self.stemmer(*key).word()
+            self.lemma_cache[key] = lemma
+        return lemma
+    def lemmatize_many(self, pairs):
+        """Returns a list with the lemma for each (form, tag) pair in
+        pairs (see stem()). Each unique pair is only looked up once and
+        if the Java helper is available, all pairs missing from
+        lemma_cache are lemmatized with a single call into Java."""
+        self._prepare_thread()
+        pairs = list(pairs)
+        lemmas = {}
+        missing = []
+        for pair in set(pairs):
+            lemma = self.lemma_cache.get(pair)
+            if lemma is None:
+                missing.append(pair)
+            else:
+                lemmas[pair] = lemma
+
+        if missing and self.lemmatize_batch is not None:
+            forms, tags = zip(*missing)
+            with self.stemmer_lock:
+                new_lemmas = self.lemmatize_batch(self.string_array(forms),
+                                                  self.string_array(tags))
+            new_lemmas = new_lemmas[:]
+        elif missing:
+            with self.stemmer_lock:
+                new_lemmas = [self.stemmer(*pair).word() for pair in missing]
+        else:
+            new_lemmas = []
+        for pair, lemma in zip(missing, new_lemmas):
+            lemmas[pair] = lemma
+            self.lemma_cache[pair] = lemma
+        return [lemmas[pair] for pair in pairs]
+    def ready(self):
+        """Blocks until the JVM has been started and the backend is ready
+        to convert (see lazy and warmup in the constructor), doing that
+        now if it hasn't been started yet. Raises any errors from
+        starting Java."""
+        if self.initialized:
+            return
+        with self.initialization_lock:
+            if self.initialization_error is not None:
+                raise self.initialization_error
+            if not self.initialized:
+                self._initialize()
+
+    def _initialize(self):
+        """Start the JVM (if needed) and look up the Java classes and
+        methods we use."""
+        if self.start_jpype and not jpype.isJVMStarted():
+            classpath = self.jar_filename
+            try:
+                classpath += os.pathsep + \
+                    get_helper_classpath(self.jar_filename)
+            except EnvironmentError:
+                # convert_trees() will convert one tree at a time
+                pass
+            jpype.startJVM(self.jvm_path or jpype.getDefaultJVMPath(),
                            '-ea',
-                           '-Djava.class.path=' + self.jar_filename,
-                           *(extra_jvm_args or []))
+                           '-Djava.class.path=' + classpath,
+                           *(self.extra_jvm_args or []))
+        # for warmup=True or if another thread started the JVM
+        self._attach_thread()
         self.corenlp = jpype.JPackage('edu').stanford.nlp
+        try:
+            self.helper = jpype.JClass(HELPER_CLASS_NAME)
+        except Exception:
+            # JPype reports missing classes with different exception
+            # types depending on its version
+            self.helper = None
+        # these are looked up once since resolving Java classes and
+        # methods through JPype is slow
+        self.string_array = jpype.JArray(jpype.JString)
+        if self.helper is not None:
+            self.convert_batch = self.helper.convertBatch
+            self.lemmatize_batch = self.helper.lemmatizeMany
+        else:
+            self.convert_batch = None
+            self.lemmatize_batch = None
         try:
             self.acceptFilter = self.corenlp.util.Filters.acceptFilter()
         except TypeError:
@@ -82,46 +316,197 @@ class JPypeBackend(StanfordDependencies):
             self.puncFilter = puncFilterInstance.test
         except AttributeError:
             self.puncFilter = puncFilterInstance.accept
-        self.lemma_cache = {}
-    def convert_tree(self, ptb_tree, representation='basic',
-                     include_punct=True, include_erased=False,
-                     add_lemmas=False, universal=True):
-        """Arguments are as in StanfordDependencies.convert_trees but with
-        the addition of add_lemmas. If add_lemmas=True, we will run the
-        Stanford CoreNLP lemmatizer and fill in the lemma field."""
-        self._raise_on_bad_input(ptb_tree)
+        self.initialized = True
+    def _warm_up(self):
+        """Initializes the backend in the background for warmup=True."""
+        try:
+            self.ready()
+        except Exception as exc:
+            # reraised by the next call to ready()
+            self.initialization_error = exc
+    def _call_with_timeout(self, timeout, function, *args, **kwargs):
+        """Returns function(*args, **kwargs), called in a separate thread
+        if timeout isn't None. If that takes longer than timeout seconds,
+        the call is abandoned, needs_recycling is set, and
+        ConversionTimeoutError is raised."""
+        if timeout is None:
+            return function(*args, **kwargs)
+
+        outcome = {}
+
+        def call():
+            try:
+                outcome['result'] = function(*args, **kwargs)
+            except Exception as exc:
+                outcome['error'] = exc
+        thread = threading.Thread(target=call)
+        # don't let an abandoned conversion keep Python from exiting
+        thread.daemon = True
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            self.needs_recycling = True
+            raise ConversionTimeoutError(timeout)
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+    def _convert_trees_threaded(self, ptb_trees, representation, universal,
+                                include_punct, include_erased, on_error,
+                                add_lemmas, threads):
+        """convert_trees() without the timeout."""
+        ptb_trees = list(ptb_trees)
+        if threads is None:
+            threads = multiprocessing.cpu_count()
+        threads = max(1, min(threads, len(ptb_trees)))
+        if threads == 1:
+            return self._convert_trees(ptb_trees, representation, universal,
+                                       include_punct, include_erased,
+                                       on_error, add_lemmas)
+
+        def convert_shard(shard):
+            return self._convert_trees(shard, representation, universal,
+                                       include_punct, include_erased,
+                                       on_error, add_lemmas)
+
+        pool = ThreadPool(threads)
+        try:
+            converted_shards = pool.map(convert_shard,
+                                        self._split_into_shards(ptb_trees,
+                                                                threads))
+        finally:
+            pool.terminate()
+        sentences = Corpus()
+        for converted_shard in converted_shards:
+            sentences.extend(converted_shard)
+        return sentences
+    def _convert_trees(self, ptb_trees, representation, universal,
+                       include_punct, include_erased, on_error, add_lemmas):
+        """Convert ptb_trees in the current thread."""
+        self._prepare_thread()
+        if self.convert_batch is None:
+            # convert_trees() has already looked these trees up in the
+            # conversion cache, possibly in another thread (with threads
+            # or a timeout), so convert_tree() mustn't do it again
+            with bypassing_conversion_cache():
+                return StanfordDependencies.convert_trees(
+                    self, ptb_trees, representation=representation,
+                    universal=universal, include_punct=include_punct,
+                    include_erased=include_erased, on_error=on_error,
+                    add_lemmas=add_lemmas)
+
         self._raise_on_bad_representation(representation)
+        self._raise_on_bad_on_error(on_error)
+        ptb_trees = list(ptb_trees)
+        for ptb_tree in ptb_trees:
+            self._raise_on_bad_input(ptb_tree)
+        # only called for the warning if universal isn't available
+        self._get_converter(universal)
+
+        sentences = Corpus()
+        for start in range(0, len(ptb_trees), BATCH_SIZE):
+            batch_trees = ptb_trees[start:start + BATCH_SIZE]
+            batch = self.convert_batch(self.string_array(batch_trees),
+                                       representation, bool(universal),
+                                       bool(include_punct))
+            batch_sentences = self._read_batch(batch, batch_trees,
+                                               representation, include_punct,
+                                               include_erased, on_error)
+            if add_lemmas:
+                self._add_lemmas(batch_sentences)
+            sentences.extend(batch_sentences)
+        return sentences
+    def _read_batch(self, batch, ptb_trees, representation, include_punct,
+                    include_erased, on_error):
+        """Build Sentences from the results of the Java helper's
+        convertBatch() on ptb_trees."""
+        # slicing copies each Java array into a Python list in bulk
+        sizes = batch.sizes[:]
+        errors = batch.errors[:]
+        forms = batch.forms[:]
+        tags = batch.tags[:]
+        dependencies = batch.dependencies[:]
+        relations = batch.relations[:]
+
+        sentences = Corpus()
+        word_start = dep_start = 0
+        for tree_index, ptb_tree in enumerate(ptb_trees):
+            if errors[tree_index] is not None:
+                if on_error == 'raise':
+                    raise ValueError("Error converting %r: %s" %
+                                     (ptb_tree, errors[tree_index]))
+                sentences.append(ConversionError(ptb_tree,
+                                                 errors[tree_index]))
+                continue
+
+            num_words = sizes[tree_index * 2]
+            num_deps = sizes[tree_index * 2 + 1]
+            word_end = word_start + num_words
+            words = list(zip(forms[word_start:word_end],
+                             tags[word_start:word_end]))
+            deps = []
+            for offset in range(dep_start, dep_start + num_deps * 5, 5):
+                index, head, relation_id, dep_copy, gov_copy = \
+                    dependencies[offset:offset + 5]
+                deps.append((index, head, relations[relation_id], dep_copy,
+                             gov_copy))
+            word_start = word_end
+            dep_start += num_deps * 5
+            sentences.append(self._make_sentence(words, deps, representation,
+                                                 include_punct,
+                                                 include_erased))
+        return sentences
+    def _add_lemmas(self, sentences):
+        """Fill in the lemma field of every token in sentences (Sentences
+        or ConversionErrors, which are skipped) with a single call to
+        lemmatize_many()."""
+        sentences = [sentence for sentence in sentences
+                     if isinstance(sentence, Sentence)]
+        pairs = [(token.form, token.pos) for sentence in sentences
+                 for token in sentence]
+        lemmas = iter(self.lemmatize_many(pairs))
+        for sentence in sentences:
+            for index, token in enumerate(sentence):
+                sentence[index] = token._replace(lemma=next(lemmas))
+    def _read_tree(self, ptb_tree):
+        """Read a Penn Treebank formatted string into a Stanford Tree."""
         tree = self.treeReader(ptb_tree)
         if tree is None:
             raise ValueError("Invalid Penn Treebank tree: %r" % ptb_tree)
-        deps = self._get_deps(tree, include_punct, representation,
-                              universal=universal)
-
-        tagged_yield = self._listify(tree.taggedYield())
-        indices_to_words = dict(enumerate(tagged_yield, 1))
+        return tree
+    def _get_words(self, tree):
+        """Returns a list of (form, tag) pairs for the words of a
+        Stanford Tree."""
+        return [(word.value(), word.tag())
+                for word in self._listify(tree.taggedYield())]
+    def _get_dep_tuples(self, deps):
+        """Converts a list of Stanford TypedDependency objects to the
+        tuples used by _make_sentence()."""
+        dep_tuples = []
+        for dep in deps:
+            dep_tuples.append((dep.dep().index(), dep.gov().index(),
+                               dep.reln().toString(), dep.dep().copyCount(),
+                               dep.gov().copyCount()))
+        return dep_tuples
+    def _make_sentence(self, words, deps, representation, include_punct,
+                       include_erased):
+        """Build a Sentence (without lemmas, see _add_lemmas()). words is
+        a list of (form, tag) pairs (see _get_words()) and deps is a list
+        of (dependent index, head index, relation, dependent copy count,
+        head copy count) tuples for each dependency (see
+        _get_dep_tuples())."""
         sentence = Sentence()
         covered_indices = set()
 
         def add_token(index, form, head, deprel, extra):
-            tag = indices_to_words[index].tag()
-            if add_lemmas:
-                lemma = self.stem(form, tag)
-            else:
-                lemma = None
-            token = Token(index=index, form=form, lemma=lemma, cpos=tag,
+            tag = words[index - 1][1]
+            token = Token(index=index, form=form, lemma=None, cpos=tag,
                           pos=tag, feats=None, head=head, deprel=deprel,
                           phead=None, pdeprel=None, extra=extra)
             sentence.append(token)
 
         # add token for each dependency
-        for dep in deps:
-            index = dep.dep().index()
-            head = dep.gov().index()
-            deprel = dep.reln().toString()
-            form = indices_to_words[index].value()
-
-            dep_is_copy = dep.dep().copyCount()
-            gov_is_copy = dep.gov().copyCount()
+        for index, head, deprel, dep_is_copy, gov_is_copy in deps:
+            form = words[index - 1][0]
             if dep_is_copy or gov_is_copy:
                 extra = {}
                 if dep_is_copy:
@@ -135,9 +520,9 @@ class JPypeBackend(StanfordDependencies):
         if include_erased:
             # see if there are any tokens that were erased
             # and add them as well
-            all_indices = set(indices_to_words.keys())
+            all_indices = set(range(1, len(words) + 1))
             for index in all_indices - covered_indices:
-                form = indices_to_words[index].value()
+                form = words[index - 1][0]
                 if not include_punct and not self.puncFilter(form):
                     continue
                 add_token(index, form, head=0, deprel='erased', extra=None)
@@ -147,35 +532,35 @@ class JPypeBackend(StanfordDependencies):
         if representation == 'basic':
             sentence.renumber()
         return sentence
-    def stem(self, form, tag):
-        """Returns the stem of word with specific form and part-of-speech
-        tag according to the Stanford lemmatizer. Lemmas are cached."""
-        key = (form, tag)
-        if key not in self.lemma_cache:
-            lemma = self.stemmer(*key).word()
-            self.lemma_cache[key] = lemma
-        return self.lemma_cache[key]
-
     def _get_deps(self, tree, include_punct, representation, universal):
-        """Get a list of dependencies from a Stanford Tree for a specific
-        Stanford Dependencies representation."""
-        if universal:
-            converter = self.universal_converter
-
-            if self.universal_converter == self.converter:
-                import warnings
-                warnings.warn("This jar doesn't support universal "
-                              "dependencies, falling back to Stanford "
-                              "Dependencies. To suppress this message, "
-                              "call with universal=False")
-        else:
-            converter = self.converter
-
+        """Get a list of dependencies (as tuples, see _make_sentence())
+        from a Stanford Tree for a specific Stanford Dependencies
+        representation."""
+        egs = self._get_structure(tree, include_punct, universal)
+        return self._get_structure_deps(egs, representation)
+    def _get_structure(self, tree, include_punct, universal):
+        """Build a Stanford GrammaticalStructure for a Stanford Tree."""
+        converter = self._get_converter(universal)
         if include_punct:
-            egs = converter(tree, self.acceptFilter)
+            return converter(tree, self.acceptFilter)
         else:
-            egs = converter(tree)
+            return converter(tree)
+    def _get_converter(self, universal):
+        """Returns the GrammaticalStructure class to convert with (warns
+        if universal is requested but this jar doesn't support it)."""
+        if not universal:
+            return self.converter
 
+        if self.universal_converter == self.converter:
+            warnings.warn("This jar doesn't support universal "
+                          "dependencies, falling back to Stanford "
+                          "Dependencies. To suppress this message, "
+                          "call with universal=False")
+        return self.universal_converter
+    def _get_structure_deps(self, egs, representation):
+        """Get a list of dependencies (as tuples, see _make_sentence())
+        from a Stanford GrammaticalStructure for a specific Stanford
+        Dependencies representation."""
         if representation == 'basic':
             deps = egs.typedDependencies()
         elif representation == 'collapsed':
@@ -187,16 +572,28 @@ class JPypeBackend(StanfordDependencies):
             # assertion doesn't fail
             assert representation == 'collapsedTree'
             deps = egs.typedDependenciesCollapsedTree()
-        return self._listify(deps)
+        return self._get_dep_tuples(self._listify(deps))
+
+    def _prepare_thread(self):
+        """Make sure the backend is ready (see ready()) and the current
+        thread can call Java."""
+        self.ready()
+        self._attach_thread()
 
     @staticmethod
+    def _attach_thread():
+        """Older versions of JPype require threads other than the one
+        which started the JVM to be attached to it before calling Java
+        (e.g., executor threads in aconvert_trees() or the threads option
+        of convert_trees())."""
+        if not jpype.isThreadAttachedToJVM():
+            jpype.attachThreadToJVM()
+    @staticmethod
     def _listify(collection):
         """This is a workaround where Collections are no longer iterable
-        when using JPype."""
-        new_list = []
-        for index in range(len(collection)):
-            new_list.append(collection[index])
-        return new_list
+        when using JPype. The elements are copied with a single call to
+        toArray() rather than one call per element."""
+        return collection.toArray()[:]
 
     @staticmethod
     def _report_version_error(version):
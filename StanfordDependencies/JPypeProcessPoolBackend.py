@@ -0,0 +1,264 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import pickle
+import threading
+try:
+    from queue import Empty, Queue
+except ImportError:
+    from Queue import Empty, Queue # Python 2
+from .StanfordDependencies import StanfordDependencies, uses_conversion_cache
+from .CoNLL import Corpus, Sentence
+from .JavaHelper import get_jvm_process_context
+
+try:
+    text_type = unicode # Python 2
+except NameError:
+    text_type = str # Python 3
+
+# Token fields which may hold Java strings
+STRING_FIELDS = ('form', 'lemma', 'cpos', 'pos', 'deprel')
+
+class WorkerDied(Exception):
+    """Raised by PoolWorker.call() if the worker process exits (or
+    crashes) before answering."""
+
+class PoolWorker:
+    """A worker process with its own JPypeBackend (see
+    worker_main())."""
+    def __init__(self, backend_args):
+        """backend_args are keyword arguments for JPypeBackend."""
+        self.backend_args = backend_args
+        self.process = None
+        self.connection = None
+        self.waiting_for_startup = False
+        self.lock = threading.Lock()
+    def start(self):
+        """Start (or restart) the worker process. This doesn't wait for
+        its JVM to start."""
+        self.close()
+        context = get_jvm_process_context()
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=worker_main,
+                                       args=(child_connection,
+                                             self.backend_args))
+        self.process.daemon = True
+        self.process.start()
+        child_connection.close()
+        self.waiting_for_startup = True
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+    def call(self, method_name, *args, **kwargs):
+        """Returns the result of calling a method on the worker's
+        JPypeBackend. Exceptions raised by the method are reraised here.
+        Raises WorkerDied if the process exits first. Starts the process
+        if it isn't running."""
+        with self.lock:
+            if not self.is_alive():
+                self.start()
+            try:
+                if self.waiting_for_startup:
+                    # a backend which can't be created raises an error
+                    # here instead of dying
+                    self._receive()
+                    self.waiting_for_startup = False
+                self.connection.send((method_name, args, kwargs))
+                return self._receive()
+            except (EOFError, EnvironmentError):
+                self.close()
+                raise WorkerDied()
+    def close(self):
+        """Stop the worker process if it's running."""
+        if self.process is None:
+            return
+        try:
+            self.connection.send(None)
+        except (EOFError, EnvironmentError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def _receive(self):
+        status, value = self.connection.recv()
+        if status == 'error':
+            raise value
+        return value
+
+class JPypeProcessPoolBackend(StanfordDependencies):
+    """Runs a JPypeBackend in each of several worker processes so that
+    conversions can use several cores (JPype only supports one JVM per
+    process). convert_trees() splits its trees into batches which are
+    sent to the workers in parallel and the results are returned in the
+    original order.
+
+    If a worker process crashes, it's restarted and its batch is tried
+    once more. A worker whose backend needs recycling after a timeout
+    (see JPypeBackend) is replaced after it finishes its batch. Call
+    close() to stop the worker processes.
+
+    Worker processes are spawned rather than forked so the pool can be
+    used alongside a JPypeBackend in this process (scripts which create
+    one need the usual if __name__ == '__main__' guard, see the
+    multiprocessing documentation). On Python 2, they can only be forked
+    so the pool must be created before any JVM is started here
+    (EnvironmentError is raised otherwise)."""
+    def __init__(self, jar_filename=None, download_if_missing=False,
+                 version=None, processes=None, batch_size=100,
+                 conversion_cache=None, **backend_args):
+        """processes is the number of worker processes (one per CPU if
+        None) and batch_size is the number of trees sent to a worker at
+        a time. conversion_cache is used by the pool itself rather than
+        the workers (see StanfordDependencies). All other keyword
+        arguments are passed on to each worker's JPypeBackend. Worker
+        processes start their JVMs in the background right away (the
+        jar file is downloaded first, if requested)."""
+        StanfordDependencies.__init__(self, jar_filename, download_if_missing,
+                                      version, conversion_cache)
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.batch_size = batch_size
+        backend_args.update(jar_filename=self.jar_filename)
+        self.workers = [PoolWorker(backend_args) for _ in range(processes)]
+        for worker in self.workers:
+            worker.start()
+    @uses_conversion_cache
+    def convert_trees(self, ptb_trees, representation='basic', **kwargs):
+        """Arguments are as in JPypeBackend.convert_trees() (except for
+        threads)."""
+        self._raise_on_bad_representation(representation)
+        ptb_trees = list(ptb_trees)
+        for ptb_tree in ptb_trees:
+            self._raise_on_bad_input(ptb_tree)
+        kwargs.update(representation=representation)
+
+        batches = [ptb_trees[start:start + self.batch_size]
+                   for start in range(0, len(ptb_trees), self.batch_size)]
+        pending = Queue()
+        for batch_index in range(len(batches)):
+            pending.put(batch_index)
+        results = [None] * len(batches)
+        errors = []
+
+        def dispatch(worker):
+            # each worker's thread keeps taking batches until there are
+            # none left or some batch has failed
+            while not errors:
+                try:
+                    batch_index = pending.get_nowait()
+                except Empty:
+                    return
+                try:
+                    results[batch_index] = self._convert_batch(
+                        worker, batches[batch_index], kwargs)
+                except Exception as exc:
+                    errors.append(exc)
+
+        threads = [threading.Thread(target=dispatch, args=(worker,))
+                   for worker in self.workers[:len(batches)]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+        sentences = Corpus()
+        for converted_batch in results:
+            sentences.extend(converted_batch)
+        return sentences
+    def convert_tree(self, ptb_tree, **kwargs):
+        """Converts a single Penn Treebank formatted tree (a string)
+        to Stanford Dependencies. See convert_trees for more details."""
+        return self.convert_trees([ptb_tree], **kwargs)[0]
+    def close(self):
+        """Stops the worker processes. They will be restarted if you
+        convert more trees afterwards."""
+        for worker in self.workers:
+            with worker.lock:
+                worker.close()
+
+    def _convert_batch(self, worker, ptb_trees, kwargs):
+        """Convert ptb_trees with worker, restarting it and trying again
+        once if it dies."""
+        try:
+            return worker.call('convert_trees', ptb_trees, **kwargs)
+        except WorkerDied:
+            pass
+        try:
+            return worker.call('convert_trees', ptb_trees, **kwargs)
+        except WorkerDied:
+            raise RuntimeError("JPype worker process died twice while "
+                               "converting a batch of trees")
+
+def worker_main(connection, backend_args):
+    """Main loop of a PoolWorker process. Creates a JPypeBackend and
+    answers (method name, args, kwargs) requests from connection with
+    ('ok', result) or ('error', exception) until it receives None."""
+    from .JPypeBackend import JPypeBackend
+    try:
+        backend = JPypeBackend(**backend_args)
+    except Exception as exc:
+        send_error(connection, exc)
+        return
+    connection.send(('ok', None))
+
+    while 1:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        method_name, args, kwargs = request
+        try:
+            result = getattr(backend, method_name)(*args, **kwargs)
+            connection.send(('ok', to_python_strings(result)))
+        except Exception as exc:
+            send_error(connection, exc)
+        if backend.needs_recycling:
+            # an abandoned conversion may still be running so we exit
+            # and let PoolWorker start a fresh process
+            return
+
+def send_error(connection, exc):
+    """Send an exception to the parent process, replacing it with a
+    RuntimeError if it can't be pickled (e.g., Java exceptions)."""
+    try:
+        pickle.dumps(exc)
+    except Exception:
+        exc = RuntimeError('%s: %s' % (exc.__class__.__name__, exc))
+    connection.send(('error', exc))
+
+def to_python_strings(sentences):
+    """Newer versions of JPype leave Java strings as Java objects which
+    can't be pickled so we convert the string fields of every Token to
+    Python strings before sending them to the parent process."""
+    converted = Corpus()
+    for sentence in sentences:
+        if isinstance(sentence, Sentence):
+            sentence = Sentence(convert_token(token) for token in sentence)
+        converted.append(sentence)
+    return converted
+
+def convert_token(token):
+    strings = {}
+    for field in STRING_FIELDS:
+        value = getattr(token, field)
+        if value is not None:
+            strings[field] = text_type(value)
+    return token._replace(**strings)
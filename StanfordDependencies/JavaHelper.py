@@ -0,0 +1,133 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Support for the small Java helper class shipped with
+PyStanfordDependencies. CoreNLP's API changes between versions, so the
+helper is compiled against the jar file in use the first time it's
+needed and the resulting classes are stored (as a jar) next to
+downloaded jars."""
+
+from __future__ import print_function
+import hashlib
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from .FileHelper import replace_file
+
+HELPER_CLASS_NAME = 'PyStanfordDependenciesHelper'
+HELPER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'java', HELPER_CLASS_NAME + '.java')
+
+def get_jvm_process_context():
+    """Returns the multiprocessing context (or module) to create
+    processes which start their own JVM (via JPype) with. A forked
+    process believes that its parent's JVM is running but doesn't have
+    any of its threads so Java calls can hang or crash. Processes are
+    spawned instead where possible (Python 3.4+). Otherwise, this raises
+    EnvironmentError if this process has already started a JVM."""
+    try:
+        return multiprocessing.get_context('spawn')
+    except AttributeError:
+        pass # Python 2, where processes are always forked
+    try:
+        import jpype
+    except ImportError:
+        return multiprocessing
+    if jpype.isJVMStarted():
+        raise EnvironmentError("Can't start JPype worker processes after "
+                               "starting a JVM on this version of Python "
+                               "(they're forked, which JPype doesn't "
+                               "support)")
+    return multiprocessing
+
+def get_javac_command(java_command='java'):
+    """Guess the path to javac from the path to a java binary."""
+    java_dir = os.path.dirname(java_command)
+    if java_dir:
+        return os.path.join(java_dir, 'javac')
+    return 'javac'
+
+def get_jar_identity(jar_filename):
+    """Returns a string which changes whenever jar_filename is moved or
+    modified. Used to key things we cache for a specific jar file."""
+    jar_stat = os.stat(jar_filename)
+    return '%s:%d:%d' % (os.path.abspath(jar_filename), jar_stat.st_size,
+                         int(jar_stat.st_mtime))
+
+def get_helper_classpath(jar_filename, javac_command='javac', debug=False):
+    """Returns the path of a jar file containing the helper classes
+    compiled against jar_filename, compiling them with javac_command
+    if it isn't there yet. Raises EnvironmentError if the helper can't
+    be compiled (e.g., if you only have a JRE). The classes are packaged
+    as a jar since Java won't create class data sharing archives (see
+    SubprocessBackend) for classpaths with non-empty directories."""
+    from .StanfordDependencies import INSTALL_DIR
+    with open(HELPER_SOURCE, 'rb') as source_file:
+        source = source_file.read()
+    digest = hashlib.sha1(source)
+    digest.update(get_jar_identity(jar_filename).encode('utf-8'))
+
+    install_dir = os.path.expanduser(INSTALL_DIR)
+    classpath = os.path.join(install_dir,
+                             'helper-%s.jar' % digest.hexdigest())
+    if os.path.exists(classpath):
+        return classpath
+
+    if not os.path.exists(install_dir):
+        os.makedirs(install_dir)
+    # compile and package into scratch files first so that concurrent
+    # processes never see a partially built helper
+    build_dir = tempfile.mkdtemp(prefix='helper-', dir=install_dir)
+    try:
+        command = [javac_command, '-nowarn', '-encoding', 'UTF-8',
+                   '-cp', jar_filename, '-d', build_dir, HELPER_SOURCE]
+        if debug:
+            print('Command:', ' '.join(command))
+        try:
+            javac_process = subprocess.Popen(command,
+                                             stdout=subprocess.PIPE,
+                                             stderr=subprocess.STDOUT,
+                                             universal_newlines=True)
+            output = javac_process.communicate()[0]
+        except OSError as ose:
+            raise EnvironmentError("Couldn't run %r to compile the Java "
+                                   "helper (a JDK is required): %s" %
+                                   (javac_command, ose))
+        if javac_process.returncode:
+            raise EnvironmentError("Couldn't compile the Java helper "
+                                   "against %r:\n%s" %
+                                   (jar_filename, output))
+
+        handle, scratch_jar = tempfile.mkstemp(suffix='.jar',
+                                               dir=install_dir)
+        os.close(handle)
+        try:
+            with zipfile.ZipFile(scratch_jar, 'w') as jar:
+                for directory, _, filenames in os.walk(build_dir):
+                    for filename in filenames:
+                        path = os.path.join(directory, filename)
+                        jar.write(path, os.path.relpath(path, build_dir))
+            replace_file(scratch_jar, classpath)
+        except OSError:
+            # someone else finished building it first (Python 2 on
+            # Windows can't replace it)
+            if not os.path.exists(classpath):
+                raise
+        finally:
+            if os.path.exists(scratch_jar):
+                os.remove(scratch_jar)
+    finally:
+        shutil.rmtree(build_dir)
+    return classpath
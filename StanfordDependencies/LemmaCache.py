@@ -0,0 +1,134 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import threading
+from collections import OrderedDict
+
+# default maximum number of lemmas kept in memory (not counting
+# preloaded ones)
+DEFAULT_MAX_SIZE = 100000
+
+class LemmaCache:
+    """Cache of lemmas keyed by (form, tag) pairs for
+    JPypeBackend.stem(). It acts like a dictionary (JPypeBackend's
+    lemma_cache used to be a plain dict), so any object with get() and
+    __setitem__() (e.g., a dict for an unbounded cache) can be used in
+    its place.
+
+    At most max_size lemmas are kept (None means no limit). When the
+    cache is full, the least recently used lemma is evicted. hits and
+    misses count lookups with get().
+
+    Lemmas can be saved to a file with save() and loaded again with
+    load() (or the filename argument to the constructor). Loaded lemmas
+    form a read-only layer which is never evicted and doesn't count
+    towards max_size. A common setup is to save a warm cache once and
+    have each worker process load it at startup."""
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, filename=None):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.preloaded = {}
+        self.hits = 0
+        self.misses = 0
+        # JPypeBackend may stem from several threads at once
+        self.lock = threading.Lock()
+        if filename is not None:
+            self.load(filename)
+    def get(self, key, default=None):
+        """Returns the lemma for a (form, tag) pair or default if it's
+        not in the cache."""
+        with self.lock:
+            if key in self.entries:
+                # mark as most recently used
+                lemma = self.entries.pop(key)
+                self.entries[key] = lemma
+            elif key in self.preloaded:
+                lemma = self.preloaded[key]
+            else:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return lemma
+    def __setitem__(self, key, lemma):
+        with self.lock:
+            if key in self.preloaded:
+                return
+            self.entries.pop(key, None)
+            self.entries[key] = lemma
+            if self.max_size is not None:
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+    def __getitem__(self, key):
+        lemma = self.get(key, self)
+        if lemma is self:
+            raise KeyError(key)
+        return lemma
+    def __contains__(self, key):
+        return key in self.entries or key in self.preloaded
+    def __iter__(self):
+        return iter(self.keys())
+    def keys(self):
+        return [key for key, lemma in self.items()]
+    def items(self):
+        """Returns a list of ((form, tag), lemma) pairs, including
+        preloaded ones."""
+        with self.lock:
+            return list(self.preloaded.items()) + list(self.entries.items())
+    def __len__(self):
+        return len(self.entries) + len(self.preloaded)
+    def __getstate__(self):
+        # locks can't be pickled (e.g., when sending a LemmaCache to a
+        # JPypeProcessPoolBackend worker process)
+        with self.lock:
+            state = dict(self.__dict__)
+        del state['lock']
+        return state
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+    def clear(self):
+        """Remove all lemmas (including preloaded ones) and reset the
+        statistics."""
+        with self.lock:
+            self.entries.clear()
+            self.preloaded = {}
+            self.hits = 0
+            self.misses = 0
+    def stats(self):
+        """Returns a dictionary of statistics about the cache: hits,
+        misses, hit_rate (None if there haven't been any lookups),
+        size (lemmas in memory besides preloaded ones), and
+        preloaded."""
+        lookups = self.hits + self.misses
+        return dict(hits=self.hits, misses=self.misses,
+                    hit_rate=float(self.hits) / lookups if lookups else None,
+                    size=len(self.entries), preloaded=len(self.preloaded))
+    def load(self, filename):
+        """Add lemmas from a file written by save() to the read-only
+        preloaded layer."""
+        preloaded = dict(self.preloaded)
+        with io.open(filename, encoding='utf-8') as lemma_file:
+            for line in lemma_file:
+                line = line.rstrip('\r\n')
+                if not line:
+                    continue
+                form, tag, lemma = line.split('\t')
+                preloaded[form, tag] = lemma
+        with self.lock:
+            self.preloaded = preloaded
+    def save(self, filename):
+        """Write all lemmas in the cache (including preloaded ones) to
+        a file as tab separated form, tag, and lemma columns."""
+        with io.open(filename, 'w', encoding='utf-8') as lemma_file:
+            for (form, tag), lemma in self.items():
+                lemma_file.write(u'%s\t%s\t%s\n' % (form, tag, lemma))
@@ -0,0 +1,160 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mmap
+import os
+import re
+from array import array
+from .CoNLL import Corpus, Sentence
+from .FileHelper import replace_file
+
+try:
+    array('q')
+    INDEX_TYPECODE = 'q'
+except ValueError:
+    INDEX_TYPECODE = 'l' # Python 2 has no 'q'
+
+# bump this when the index file format changes
+INDEX_FORMAT_VERSION = 1
+
+# appended to the CoNLL-X filename to get the default index filename
+INDEX_SUFFIX = '.index'
+
+# blank lines at the start of a file
+leading_blank_lines_re = re.compile(br'(?:[ \t\r\f\v]*\n)*')
+
+# blank lines between sentences (and the line ending before them)
+blank_lines_re = re.compile(br'\n(?:[ \t\r\f\v]*\n)+')
+
+class MappedCorpus(object):
+    """A read-only Corpus backed by a memory-mapped CoNLL-X file.
+    Sentences are only parsed when they're accessed so getting sentence
+    i is fast however large the file is. The byte offset of each
+    sentence is found once and saved to an index file next to the
+    CoNLL-X file (the filename plus INDEX_SUFFIX), which is rebuilt if
+    the CoNLL-X file's size or modification time change. len() only
+    needs the index.
+
+    Indexing gives a Sentence and slicing gives a Corpus with just the
+    sentences in the slice. Sentences are parsed again each time they're
+    accessed. Call close() (or use a with statement) when done."""
+    def __init__(self, filename, compact=False, index_filename=None,
+                 encoding='utf-8'):
+        """compact is as in Corpus.from_conll(). If index_filename is
+        None, the index is saved next to filename. The index is kept in
+        memory if it can't be saved. Sentences are found by searching
+        the raw bytes for blank lines so encoding must be ASCII
+        compatible (e.g., UTF-8 or Latin-1 but not UTF-16)."""
+        self.filename = filename
+        self.compact = compact
+        if index_filename is None:
+            index_filename = filename + INDEX_SUFFIX
+        self.index_filename = index_filename
+        self.encoding = encoding
+        self.conll_file = open(filename, 'rb')
+        file_stat = os.fstat(self.conll_file.fileno())
+        if file_stat.st_size:
+            self.mmap = mmap.mmap(self.conll_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            self.mmap = b'' # empty files can't be mapped
+        # identifies this version of the file in the index file
+        self.index_header = array(INDEX_TYPECODE,
+                                  [INDEX_FORMAT_VERSION, file_stat.st_size,
+                                   int(file_stat.st_mtime * 1000000)])
+        self.offsets = self.load_index()
+        if self.offsets is None:
+            self.offsets = find_sentence_offsets(self.mmap)
+            self.save_index()
+    def __len__(self):
+        """Number of sentences."""
+        return len(self.offsets) - 1
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = range(*index.indices(len(self)))
+            return Corpus(self.get_sentence(sentence_index)
+                          for sentence_index in indices)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('sentence index out of range')
+        return self.get_sentence(index)
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get_sentence(index)
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    def __repr__(self):
+        return '<%s for %r with %d sentences>' % \
+            (self.__class__.__name__, self.filename, len(self))
+    def get_sentence(self, index):
+        """Parses and returns sentence number index (which must be in
+        range)."""
+        text = self.mmap[self.offsets[index]:self.offsets[index + 1]]
+        lines = text.decode(self.encoding).splitlines()
+        return Sentence.from_conll(lines, self.compact)
+    def close(self):
+        """Unmaps and closes the CoNLL-X file. The MappedCorpus can't be
+        used afterwards."""
+        if isinstance(self.mmap, mmap.mmap):
+            self.mmap.close()
+        self.conll_file.close()
+    def load_index(self):
+        """Returns the sentence offsets from the index file or None if
+        it's missing or out of date."""
+        header_size = len(self.index_header)
+        try:
+            with open(self.index_filename, 'rb') as index_file:
+                header = array(INDEX_TYPECODE)
+                header.fromfile(index_file, header_size)
+                if header != self.index_header:
+                    return None
+                index_size = os.fstat(index_file.fileno()).st_size
+                offsets = array(INDEX_TYPECODE)
+                offsets.fromfile(index_file,
+                                 index_size // offsets.itemsize - header_size)
+        except (EnvironmentError, EOFError):
+            return None
+        if not offsets or offsets[-1] != self.index_header[1]:
+            return None # truncated
+        return offsets
+    def save_index(self):
+        """Writes the sentence offsets to the index file. Failures are
+        ignored since the index can always be rebuilt."""
+        temporary_filename = '%s.%d.tmp' % (self.index_filename, os.getpid())
+        try:
+            with open(temporary_filename, 'wb') as index_file:
+                self.index_header.tofile(index_file)
+                self.offsets.tofile(index_file)
+            replace_file(temporary_filename, self.index_filename)
+        except EnvironmentError:
+            try:
+                os.remove(temporary_filename)
+            except EnvironmentError:
+                pass
+
+def find_sentence_offsets(data):
+    """Returns an array with the byte offset where each sentence in data
+    (a bytes-like CoNLL-X file) starts followed by the length of data,
+    so sentence i is data[offsets[i]:offsets[i + 1]] (possibly with
+    blank lines after it)."""
+    start = leading_blank_lines_re.match(data).end()
+    offsets = array(INDEX_TYPECODE, [start])
+    for match in blank_lines_re.finditer(data, start):
+        offsets.append(match.end())
+    if not data[offsets[-1]:].strip():
+        # nothing but whitespace after the last separator
+        offsets.pop()
+    offsets.append(len(data))
+    return offsets
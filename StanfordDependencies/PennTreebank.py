@@ -0,0 +1,283 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Reads Penn Treebank trees into a compact Tree structure without
+Java. Example:
+
+    >>> from StanfordDependencies.PennTreebank import read_tree
+    >>> tree = read_tree('(ROOT (S (NP (PRP It)) (VP (VBZ works))))')
+    >>> tree.leaves()
+    ['It', 'works']
+    >>> [tree.label(node) for node in tree.children(1)]
+    ['NP', 'VP']
+
+read_trees() reads any number of trees from a string or a file (or
+another iterable of lines) one at a time."""
+
+import re
+import threading
+from array import array
+
+try:
+    string_type = basestring # Python 2.6/7
+except NameError:
+    string_type = str # Python 3
+
+# picks out preterminals (as a single token, since they make up most of
+# a tree), parentheses, and labels/words from Penn Treebank trees
+ptb_tokens_re = re.compile(r'\(\s*[^\s()]+\s+[^\s()]+\s*\)|\(|\)|[^\s()]+')
+
+# constituent labels are interned in a table shared by all trees:
+# Tree.labels holds indices into label_names
+label_names = []
+label_ids = {}
+label_lock = threading.Lock()
+
+def intern_label(label):
+    """Returns the index of label in label_names, adding it if it's
+    new."""
+    label_id = label_ids.get(label)
+    if label_id is None:
+        with label_lock:
+            label_id = label_ids.get(label)
+            if label_id is None:
+                label_id = len(label_names)
+                label_names.append(label)
+                label_ids[label] = label_id
+    return label_id
+
+class Tree(object):
+    """A Penn Treebank tree stored in flat arrays. Nodes are numbered
+    in preorder starting with the root (node 0) so each subtree is a
+    contiguous block of nodes and preterminals appear in word order.
+    Words aren't nodes: each preterminal (a node without children)
+    covers exactly one word.
+
+    For each node, labels holds an index into label_names, parents the
+    parent node (-1 for the root), and span_starts/span_ends the range
+    of words it covers. The children of a node are
+    child_ids[child_starts[node]:child_ends[node]]. Use the methods
+    rather than the arrays unless you need the speed."""
+    __slots__ = ('labels', 'parents', 'child_starts', 'child_ends',
+                 'child_ids', 'span_starts', 'span_ends', 'words')
+    def __init__(self, labels, parents, child_starts, child_ends, child_ids,
+                 span_starts, span_ends, words):
+        self.labels = labels
+        self.parents = parents
+        self.child_starts = child_starts
+        self.child_ends = child_ends
+        self.child_ids = child_ids
+        self.span_starts = span_starts
+        self.span_ends = span_ends
+        self.words = words
+    def __len__(self):
+        """Number of nodes (not counting words)."""
+        return len(self.labels)
+    def label(self, node):
+        return label_names[self.labels[node]]
+    def parent(self, node):
+        """Returns the parent of node or None for the root."""
+        parent = self.parents[node]
+        if parent < 0:
+            return None
+        return parent
+    def children(self, node):
+        """Returns a list of the children of node (empty for
+        preterminals)."""
+        return self.child_ids[self.child_starts[node]:
+                              self.child_ends[node]].tolist()
+    def is_preterminal(self, node):
+        return self.child_starts[node] == self.child_ends[node]
+    def word(self, node):
+        """Returns the word under node if it's a preterminal, otherwise
+        None."""
+        if self.child_starts[node] != self.child_ends[node]:
+            return None
+        return self.words[self.span_starts[node]]
+    def span(self, node):
+        """Returns (start, end) word offsets covered by node, so its
+        words are tree.leaves()[start:end]."""
+        return self.span_starts[node], self.span_ends[node]
+    def leaves(self):
+        """Returns a list of the words in the tree."""
+        return list(self.words)
+    def preterminals(self):
+        """Returns a list of the preterminal nodes in word order."""
+        child_starts = self.child_starts
+        child_ends = self.child_ends
+        return [node for node in range(len(self.labels))
+                if child_starts[node] == child_ends[node]]
+    def tagged_words(self):
+        """Returns a list of (word, tag) pairs."""
+        return [(self.words[self.span_starts[node]], self.label(node))
+                for node in self.preterminals()]
+    def __str__(self):
+        """Penn Treebank representation of the tree on a single line."""
+        pieces = []
+
+        def write(node):
+            label = self.label(node)
+            word = self.word(node)
+            if word is not None:
+                pieces.append('(%s %s)' % (label, word))
+                return
+            pieces.append('(' + label)
+            for child in self.children(node):
+                pieces.append(' ')
+                write(child)
+            pieces.append(')')
+        write(0)
+        return ''.join(pieces)
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, str(self))
+    def __eq__(self, other):
+        return isinstance(other, Tree) and \
+            (self.labels, self.child_ids, self.child_starts, self.words) == \
+            (other.labels, other.child_ids, other.child_starts, other.words)
+    def __ne__(self, other):
+        return not self == other
+    __hash__ = None
+
+def read_tree(ptb_tree):
+    """Returns a Tree for a string with exactly one Penn Treebank tree.
+    Raises ValueError if it's malformed."""
+    trees = list(read_trees(ptb_tree))
+    if len(trees) != 1:
+        raise ValueError('Expected a single tree, found %d' % len(trees))
+    return trees[0]
+
+def read_trees(source):
+    """Yields a Tree for each Penn Treebank tree in source, which can be
+    a string or an iterable of lines such as an open file. Trees are
+    read as they're needed so large files don't have to fit in memory.
+    Raises ValueError on malformed input."""
+    if isinstance(source, string_type):
+        tokens = ptb_tokens_re.findall(source)
+    else:
+        tokens = (token for line in source
+                  for token in ptb_tokens_re.findall(line))
+    return build_trees(tokens)
+
+def build_trees(tokens):
+    """Yields Trees from an iterable of tokens (parentheses, labels, and
+    words)."""
+    # repeated words share a single string
+    word_table = {}
+    empty_label = intern_label('')
+    new_tree = True
+    stack = [] # open nodes
+    open_children = [] # their children so far (None after a word)
+    expecting_label = False
+    for token in tokens:
+        if new_tree:
+            labels = []
+            parents = []
+            child_starts = []
+            child_ends = []
+            child_ids = []
+            span_starts = []
+            span_ends = []
+            words = []
+            new_tree = False
+        if len(token) > 1 and token[0] == '(':
+            # a whole preterminal, e.g., "(NN dog)"
+            if expecting_label:
+                labels[-1] = empty_label
+                expecting_label = False
+            tag, word = token[1:-1].split()
+            node = len(labels)
+            if stack:
+                siblings = open_children[-1]
+                if siblings is None:
+                    raise ValueError('Constituent after a word in %r' %
+                                     label_names[labels[stack[-1]]])
+                siblings.append(node)
+                parents.append(stack[-1])
+            else:
+                parents.append(-1)
+            label_id = label_ids.get(tag)
+            if label_id is None:
+                label_id = intern_label(tag)
+            labels.append(label_id)
+            child_starts.append(len(child_ids))
+            child_ends.append(len(child_ids))
+            span_starts.append(len(words))
+            words.append(word_table.setdefault(word, word))
+            span_ends.append(len(words))
+            if not stack:
+                yield Tree(array('i', labels), array('i', parents),
+                           array('i', child_starts), array('i', child_ends),
+                           array('i', child_ids), array('i', span_starts),
+                           array('i', span_ends), words)
+                new_tree = True
+        elif token == '(':
+            if expecting_label:
+                # unlabeled node, e.g., "( (S ...) )"
+                labels[-1] = empty_label
+                expecting_label = False
+            node = len(labels)
+            if stack:
+                siblings = open_children[-1]
+                if siblings is None:
+                    raise ValueError('Constituent after a word in %r' %
+                                     label_names[labels[stack[-1]]])
+                siblings.append(node)
+                parents.append(stack[-1])
+            else:
+                parents.append(-1)
+            labels.append(empty_label)
+            child_starts.append(0)
+            child_ends.append(0)
+            span_starts.append(len(words))
+            span_ends.append(0)
+            stack.append(node)
+            open_children.append([])
+            expecting_label = True
+        elif token == ')':
+            if not stack:
+                raise ValueError('Unbalanced parentheses')
+            if expecting_label:
+                raise ValueError('Empty constituent')
+            node = stack.pop()
+            node_children = open_children.pop()
+            if node_children is None:
+                child_starts[node] = child_ends[node] = len(child_ids)
+            elif not node_children:
+                raise ValueError('Constituent without children or a '
+                                 'word: %r' % label_names[labels[node]])
+            else:
+                child_starts[node] = len(child_ids)
+                child_ids.extend(node_children)
+                child_ends[node] = len(child_ids)
+            span_ends[node] = len(words)
+            if not stack:
+                yield Tree(array('i', labels), array('i', parents),
+                           array('i', child_starts), array('i', child_ends),
+                           array('i', child_ids), array('i', span_starts),
+                           array('i', span_ends), words)
+                new_tree = True
+        elif expecting_label:
+            label_id = label_ids.get(token)
+            if label_id is None:
+                label_id = intern_label(token)
+            labels[-1] = label_id
+            expecting_label = False
+        elif not stack:
+            raise ValueError('Text outside of a tree: %r' % token)
+        else:
+            if open_children[-1] != []:
+                raise ValueError('Malformed constituent: %r' %
+                                 label_names[labels[stack[-1]]])
+            words.append(word_table.setdefault(token, token))
+            open_children[-1] = None
+    if stack:
+        raise ValueError('Unbalanced parentheses')
@@ -0,0 +1,754 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Converts Penn Treebank trees to basic Stanford Dependencies without
+Java. Heads are found with the rules of CoreNLP's SemanticHeadFinder
+(and UniversalSemanticHeadFinder for Universal Dependencies) and each
+dependency is labeled by looking at the categories of the head,
+dependent, and their parent constituent.
+
+This covers the constructions in the test suite and most newswire text
+but it is an approximation of CoreNLP, not a port. Known differences:
+- only the 'basic' representation is available
+- relations which CoreNLP finds with tree surgery or long distance
+  patterns are not produced: xsubj, csubj/csubjpass, ref, iobj in
+  unusual positions, mwe, goeswith, and the 'discourse' rules beyond
+  interjections
+- questions (SQ/SBARQ) and fragments fall back to 'dep' more often
+- clause-initial participles are labeled vmod (advcl in UD)"""
+
+import re
+import time
+from .StanfordDependencies import (StanfordDependencies,
+                                   ConversionTimeoutError,
+                                   uses_conversion_cache)
+from .CoNLL import Sentence, Token
+from .PennTreebank import read_tree
+
+# bump this when conversions change so ConversionCache entries made by
+# older versions aren't reused
+CONVERTER_VERSION = 1
+
+# separates function tags and coindexation from constituent labels
+# (e.g., NP-SBJ-1 or NP=2)
+function_tags_re = re.compile(r'[-=]')
+
+# labels of nodes which wrap the actual tree
+ROOT_LABELS = ('', 'ROOT', 'S1', 'TOP')
+
+PUNCTUATION_TAGS = frozenset(("''", '``', '-LRB-', '-RRB-', '.', ':', ','))
+VERB_TAGS = frozenset(('MD', 'TO', 'VB', 'VBD', 'VBG', 'VBN', 'VBP', 'VBZ',
+                       'AUX'))
+NOUN_TAGS = frozenset(('NN', 'NNS', 'NNP', 'NNPS', 'FW'))
+ADJECTIVE_TAGS = frozenset(('JJ', 'JJR', 'JJS', 'VBN', 'VBG'))
+ADVERB_TAGS = frozenset(('RB', 'RBR', 'RBS', 'WRB'))
+
+NOMINAL_LABELS = frozenset(('NP', 'NML', 'NX', 'NAC', 'WHNP'))
+CLAUSE_LABELS = frozenset(('S', 'SQ', 'SINV', 'SBARQ'))
+ADJECTIVAL_LABELS = frozenset(('ADJP', 'JJP', 'WHADJP'))
+ADVERBIAL_LABELS = frozenset(('ADVP', 'WHADVP'))
+PREPOSITIONAL_LABELS = frozenset(('PP', 'WHPP'))
+
+AUXILIARIES = frozenset((
+    'will', 'wo', 'shall', 'sha', 'may', 'might', 'should', 'would', 'can',
+    'could', 'ca', 'must', "'ll", 'll', '-ll', 'cold', 'has', 'have', 'had',
+    'having', "'ve", 've', 'do', 'did', 'does', 'done', 'to', 'be', 'being',
+    'been', "'s", 's', 'is', 'was', 'are', 'were', "'re", 're', 'am', "'m",
+    'm', 'get', 'got', 'gets', 'getting', 'gotten', 'become', 'became',
+    'becomes', 'becoming'))
+# CoreNLP only treats forms of "be" as copulas in the basic conversion
+BE_FORMS = frozenset(('be', 'being', 'been', 'am', 'are', 'is', 'was',
+                      'were', "'m", "'re", "'s", 's', 'ai'))
+PASSIVE_AUXILIARIES = BE_FORMS | frozenset(('get', 'got', 'gets',
+                                            'getting', 'gotten'))
+NEGATIONS = frozenset(('not', "n't", 'never'))
+TEMPORAL_WORDS = frozenset((
+    'second', 'seconds', 'minute', 'minutes', 'hour', 'hours', 'day', 'days',
+    'week', 'weeks', 'weekend', 'month', 'months', 'year', 'years',
+    'quarter', 'quarters', 'decade', 'decades', 'century', 'centuries',
+    'today', 'tomorrow', 'yesterday', 'tonight', 'morning', 'afternoon',
+    'evening', 'night', 'nights', 'spring', 'summer', 'fall', 'autumn',
+    'winter', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday',
+    'saturday', 'sunday', 'january', 'february', 'march', 'april', 'june',
+    'july', 'august', 'september', 'october', 'november', 'december'))
+
+# head rules from CoreNLP's SemanticHeadFinder. Each rule is a direction
+# and a list of categories: 'left' and 'right' try each category in turn
+# and search the children in that direction, while 'leftdis' and
+# 'rightdis' search the children in that direction for any of the
+# categories.
+HEAD_RULES = {
+    'ADJP': (('left', '$'),
+             ('rightdis', 'NNS NN JJ QP VBN VBG'),
+             ('left', 'ADJP'),
+             ('rightdis', 'JJP JJR JJS DT RB RBR CD IN VBD'),
+             ('left', 'ADVP NP')),
+    'JJP': (('left', 'NNS NN $ QP JJ VBN VBG ADJP JJP JJR NP JJS DT FW RBR '
+                     'RBS SBAR RB'),),
+    'ADVP': (('left', 'ADVP IN'),
+             ('rightdis', 'RB RBR RBS JJ JJR JJS'),
+             ('rightdis', 'RP DT NN CD NP VBN NNP CC FW NNS ADJP NML')),
+    'CONJP': (('right', 'VB JJ RB IN CC'),),
+    'FRAG': (('right',),),
+    'INTJ': (('left',),),
+    'LST': (('right', 'LS :'),),
+    'NAC': (('left', 'NN NNS NML NNP NNPS NP NAC EX $ CD QP PRP VBG JJ JJS '
+                     'JJR ADJP JJP FW'),),
+    'NX': (('right', 'NP NX'),),
+    'PP': (('right', 'IN TO VBG VBN RP FW JJ SYM'),
+           ('left', 'PP')),
+    'PRN': (('left', 'VP NP PP SQ S SINV SBAR ADJP JJP ADVP INTJ WHNP NAC '
+                     'VBP JJ NN NNP'),),
+    'PRT': (('right', 'RP'),),
+    'QP': (('right', '$ NNS NN CD JJ PDT DT IN RB NCD QP JJR JJS'),),
+    'RRC': (('left', 'RRC'),
+            ('right', 'VP ADJP JJP NP PP ADVP')),
+    'S': (('left', 'TO VP S FRAG SBAR ADJP JJP UCP NP P'),),
+    'SBAR': (('left', 'S SQ SINV SBAR FRAG VP WHNP WHPP WHADVP WHADJP IN '
+                      'DT'),),
+    'SBARQ': (('left', 'SQ S SINV SBARQ FRAG SBAR'),),
+    'SINV': (('left', 'VBZ VBD VBP VB MD VBN VP S SINV ADJP JJP NP'),),
+    'SQ': (('left', 'VBZ VBD VBP VB MD AUX AUXG VP SQ'),),
+    'UCP': (('right',),),
+    'VP': (('left', 'TO VBD VBN MD VBZ VB VBG VBP VP ADJP JJP NN NNS JJ NP '
+                    'NNP'),),
+    'WHADJP': (('left', 'WRB WHADVP RB JJ ADJP JJP JJR'),),
+    'WHADVP': (('right', 'WRB WHADVP'),),
+    'WHNP': (('rightdis', 'NN NNP NNPS NNS NX NML JJR WP'),
+             ('left', 'WHNP NP'),
+             ('rightdis', '$ ADJP PRN FW'),
+             ('right', 'CD'),
+             ('rightdis', 'JJ JJS RB QP'),
+             ('left', 'WHPP WHADJP WP$ WDT')),
+    'WHPP': (('right', 'IN TO FW'),),
+    'X': (('right', 'S VP ADJP JJP NP SBAR PP X'),),
+    'NP': (('rightdis', 'NN NNP NNPS NNS NX NML JJR WP'),
+           ('left', 'NP PRP'),
+           ('rightdis', '$ ADJP JJP FW'),
+           ('right', 'CD'),
+           ('rightdis', 'JJ JJS QP DT WDT NML PRN RB RBR ADVP'),
+           ('rightdis', 'POS')),
+    'POSSP': (('right', 'POS'),),
+}
+HEAD_RULES['NML'] = HEAD_RULES['NP']
+
+# Universal Dependencies make the object of a preposition its head
+UNIVERSAL_HEAD_RULES = dict(HEAD_RULES)
+UNIVERSAL_HEAD_RULES.update({
+    'PP': (('left', 'NP NML WHNP QP'),
+           ('left', 'PP'),
+           ('left', 'S SBAR SQ SINV VP ADJP ADVP'),
+           ('right', 'IN TO VBG VBN RP FW JJ SYM')),
+    'WHPP': (('left', 'NP WHNP NML'),
+             ('right', 'IN TO FW')),
+})
+
+# basic Stanford Dependencies relations with a different name in
+# Universal Dependencies (see universal_relation() for the others)
+UNIVERSAL_RELATIONS = {
+    'nn': 'compound',
+    'number': 'compound',
+    'num': 'nummod',
+    'npadvmod': 'nmod:npmod',
+    'tmod': 'nmod:tmod',
+    'rcmod': 'acl:relcl',
+    'poss': 'nmod:poss',
+    'possessive': 'case',
+    'prt': 'compound:prt',
+    'predet': 'det:predet',
+    'preconj': 'cc:preconj',
+    'quantmod': 'advmod',
+    'acomp': 'xcomp',
+    'prep': 'nmod',
+    'pobj': 'nmod',
+    'pcomp': 'advcl',
+}
+
+class Node(object):
+    """A constituent in a Penn Treebank tree. Preterminals have a word
+    and index (counting from 1) while other nodes have children. head
+    is the preterminal which heads the node and head_child is the child
+    it comes from (see find_heads())."""
+    __slots__ = ('label', 'functions', 'children', 'parent', 'word', 'index',
+                 'head', 'head_child')
+    def __init__(self, label, children=(), word=None):
+        self.label = label
+        self.functions = ()
+        self.children = list(children)
+        self.parent = None
+        self.word = word
+        self.index = None
+        self.head = None
+        self.head_child = None
+    def is_preterminal(self):
+        return self.word is not None
+    def is_punctuation(self):
+        return self.word is not None and self.label in PUNCTUATION_TAGS
+    def __repr__(self):
+        if self.word is not None:
+            return '(%s %s)' % (self.label, self.word)
+        return '(%s %s)' % (self.label, ' '.join(map(repr, self.children)))
+
+def prepare_tree(tree, include_punct=True):
+    """Builds Nodes for a PennTreebank.Tree without empty elements (and
+    punctuation unless include_punct is True), with function tags split
+    from labels and the words numbered. Returns the node under the ROOT
+    wrapper or None if no words are left."""
+    nodes = [None] * len(tree)
+    # children come after their parents in preorder so going backwards
+    # builds every node after its children
+    for node_id in range(len(tree) - 1, -1, -1):
+        label = tree.label(node_id)
+        if tree.is_preterminal(node_id):
+            if label == '-NONE-':
+                continue
+            node = Node(label, word=tree.word(node_id))
+            if not include_punct and node.is_punctuation():
+                continue
+        else:
+            children = [nodes[child] for child in tree.children(node_id)
+                        if nodes[child] is not None]
+            if not children:
+                continue
+            node = Node(label, children)
+            for child in children:
+                child.parent = node
+            if label and not label.startswith('-'):
+                parts = function_tags_re.split(label)
+                node.label = parts[0]
+                node.functions = tuple(parts[1:])
+        nodes[node_id] = node
+
+    root = nodes[0]
+    while root is not None and root.label in ROOT_LABELS and \
+            len(root.children) == 1:
+        root = root.children[0]
+    if root is None:
+        return None
+    root.parent = None
+    for index, leaf in enumerate(iter_preterminals(root), 1):
+        leaf.index = index
+    return root
+
+def iter_preterminals(node):
+    """Yields the preterminals under node from left to right."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.word is not None:
+            yield node
+        else:
+            stack.extend(reversed(node.children))
+
+def find_heads(node, head_rules):
+    """Sets head and head_child for node and everything under it."""
+    if node.word is not None:
+        node.head = node
+        return
+    for child in node.children:
+        find_heads(child, head_rules)
+    node.head_child = find_head_child(node, head_rules)
+    node.head = node.head_child.head
+
+def find_head_child(node, head_rules):
+    children = node.children
+    if len(children) == 1:
+        return children[0]
+    if node.label in ('VP', 'SQ', 'SINV'):
+        head_child = find_verbal_head_child(node)
+        if head_child is not None:
+            return head_child
+
+    rules = head_rules.get(node.label, (('left',),))
+    head_index = None
+    for rule in rules:
+        head_index = apply_head_rule(children, rule[0], rule[1:])
+        if head_index is not None:
+            break
+    if head_index is None:
+        # nothing matched so take the first or last child, depending
+        # on the direction of the first rule
+        if rules[0][0].startswith('left'):
+            head_index = 0
+        else:
+            head_index = len(children) - 1
+    # for coordinations like "X and Y" with Y picked, use X instead
+    if head_index >= 2 and children[head_index - 1].label in ('CC', 'CONJP'):
+        new_head_index = head_index - 2
+        while new_head_index >= 0 and \
+                children[new_head_index].is_punctuation():
+            new_head_index -= 1
+        if new_head_index >= 0:
+            head_index = new_head_index
+    return children[head_index]
+
+def apply_head_rule(children, direction, categories):
+    """Returns the index of the child selected by a head rule or None
+    if none match."""
+    if not categories:
+        return None
+    categories = categories[0].split()
+    if direction == 'left':
+        indices = list(range(len(children)))
+    else:
+        indices = list(range(len(children) - 1, -1, -1))
+    if direction.endswith('dis'):
+        categories = set(categories)
+        for index in indices:
+            if children[index].label in categories:
+                return index
+    else:
+        for category in categories:
+            for index in indices:
+                if children[index].label == category:
+                    return index
+    return None
+
+def find_verbal_head_child(node):
+    """Auxiliaries and copulas don't head their phrases: returns the
+    following verb phrase or predicate, if there is one."""
+    children = node.children
+    verbs = [child for child in children
+             if child.word is not None and child.label in VERB_TAGS]
+    words = set(verb.word.lower() for verb in verbs)
+    if words & AUXILIARIES:
+        for child in children:
+            if child.label in ('VP', 'ADJP'):
+                return child
+    if words & BE_FORMS and not is_existential(node):
+        if node.label == 'SQ':
+            candidates = reversed(children)
+        else:
+            candidates = children
+        candidates = list(candidates)
+        for category in ('VP', 'ADJP', 'NP', 'WHADJP', 'WHNP'):
+            for child in candidates:
+                if child.label == category and 'TMP' not in child.functions:
+                    return child
+    return None
+
+def is_existential(node):
+    """Whether node is a clause with an expletive subject ("there is")
+    or the verb phrase of one."""
+    if node.label == 'VP' and node.parent is not None:
+        node = node.parent
+    for child in node.children:
+        if child.label == 'NP' and child.head is not None and \
+                child.head.label == 'EX':
+            return True
+    return False
+
+def has_subject(clause):
+    """Whether something nominal (or an SBAR) comes before the head of
+    clause. Preterminals (e.g., the head of a WHNP sister in an SBAR)
+    have no subject."""
+    if clause.head_child is None:
+        return False
+    head_index = clause.children.index(clause.head_child)
+    return any(child.label in NOMINAL_LABELS or child.label == 'SBAR'
+               for child in clause.children[:head_index])
+
+def is_passive(verb_phrase):
+    """Whether a verb phrase headed by an auxiliary is passive, i.e.,
+    it has a form of "be" or "get" followed by a past participle."""
+    while verb_phrase.label == 'VP' and verb_phrase.head_child is not None:
+        for child in verb_phrase.children:
+            if child.word is not None and \
+                    child.word.lower() in PASSIVE_AUXILIARIES and \
+                    is_participle_phrase(verb_phrase.head_child):
+                return True
+        verb_phrase = verb_phrase.head_child
+    return False
+
+def is_participle_phrase(verb_phrase):
+    """Whether verb_phrase is headed directly (not through another
+    auxiliary) by a past participle."""
+    while verb_phrase.label == 'VP':
+        for child in verb_phrase.children:
+            if child.word is not None and child.label in VERB_TAGS and \
+                    child is not verb_phrase.head_child:
+                return False
+        verb_phrase = verb_phrase.head_child
+    return verb_phrase.label == 'VBN'
+
+def is_temporal(node):
+    return 'TMP' in node.functions or node.head.word.lower() in TEMPORAL_WORDS
+
+def is_conjunct(parent, position, head_position):
+    """Whether the child of parent at position is coordinated with its
+    head child."""
+    children = parent.children
+    coordinators = [index for index in range(head_position + 1, position)
+                    if children[index].label in ('CC', 'CONJP')]
+    if coordinators:
+        if parent.label == 'VP':
+            # in "cooks and sells burritos" only "sells" is a conjunct
+            following = [index
+                         for index in range(coordinators[-1] + 1, position)
+                         if not children[index].is_punctuation()]
+            return not following
+        return True
+    # "X, Y and Z"
+    child = children[position]
+    if position > head_position + 1 and \
+            children[position - 1].label == ',' and \
+            child.label == children[head_position].label:
+        return any(children[index].label in ('CC', 'CONJP')
+                   for index in range(position + 1, len(children)))
+    return False
+
+def get_relation(parent, child, universal):
+    """Returns the label for the dependency between the head of child
+    (which isn't the head child of parent) and the head of parent."""
+    relation = get_basic_relation(parent, child, universal)
+    if universal:
+        relation = universal_relation(relation, parent, child)
+    return relation
+
+def universal_relation(relation, parent, child):
+    """Convert a Stanford Dependencies relation to the Universal
+    Dependencies one."""
+    if relation == 'vmod':
+        if parent.label in NOMINAL_LABELS:
+            return 'acl'
+        return 'advcl'
+    if relation == 'aux' and child.head.label == 'TO':
+        return 'mark'
+    return UNIVERSAL_RELATIONS.get(relation, relation)
+
+def get_basic_relation(parent, child, universal):
+    children = parent.children
+    position = children.index(child)
+    head_position = children.index(parent.head_child)
+    label = child.label
+    parent_label = parent.label
+    head = parent.head_child
+
+    if child.is_punctuation():
+        return 'punct'
+    if label in ('CC', 'CONJP'):
+        if position < head_position and \
+                any(other.label in ('CC', 'CONJP')
+                    for other in children[head_position + 1:]):
+            return 'preconj'
+        return 'cc'
+    if is_conjunct(parent, position, head_position):
+        return 'conj'
+
+    if child.word is not None:
+        return get_preterminal_relation(parent, child, position,
+                                        head_position, universal)
+
+    if label == 'WHNP' and parent_label in ('SBAR', 'SBARQ'):
+        if has_subject(head):
+            return 'dobj'
+        if head.head_child is not None and \
+                head.head_child.label == 'VP' and \
+                is_passive(head.head_child):
+            return 'nsubjpass'
+        return 'nsubj'
+    if label in NOMINAL_LABELS:
+        if parent_label in CLAUSE_LABELS:
+            if 'TMP' in child.functions:
+                return 'tmod'
+            if 'ADV' in child.functions:
+                return 'npadvmod'
+            if child.head.label == 'EX':
+                return 'expl'
+            if position < head_position or parent_label == 'SINV':
+                if head.label == 'VP' and is_passive(head):
+                    return 'nsubjpass'
+                return 'nsubj'
+            return 'dep'
+        if parent_label == 'VP':
+            if 'ADV' in child.functions:
+                return 'npadvmod'
+            objects = [other for other in children[head_position + 1:]
+                       if other.label in NOMINAL_LABELS]
+            objects = [other for other in objects if not is_temporal(other)]
+            if child not in objects:
+                return 'tmod'
+            if is_existential(parent):
+                return 'nsubj'
+            if len(objects) > 1 and child is objects[0]:
+                return 'iobj'
+            return 'dobj'
+        if parent_label in PREPOSITIONAL_LABELS:
+            if position < head_position:
+                return 'npadvmod'
+            if not universal and \
+                    not any(other.label in NOMINAL_LABELS
+                            for other in children[head_position + 1:position]):
+                return 'pobj'
+            if is_temporal(child):
+                return 'tmod'
+            return 'dep'
+        if parent_label in ADJECTIVAL_LABELS or \
+                parent_label in ADVERBIAL_LABELS:
+            return 'npadvmod'
+        if parent_label in NOMINAL_LABELS:
+            if position < head_position:
+                if child.children[-1].label == 'POS':
+                    return 'poss'
+                return 'nn'
+            if 'TMP' in child.functions:
+                return 'tmod'
+            if children[position - 1].label == ',' and \
+                    not any(other.label in ('CC', 'CONJP')
+                            for other in children):
+                return 'appos'
+            return 'dep'
+        if parent_label == 'QP':
+            return 'number'
+        return 'dep'
+
+    if label in PREPOSITIONAL_LABELS:
+        if universal:
+            return get_universal_prepositional_relation(parent, child)
+        if parent_label in PREPOSITIONAL_LABELS and head.word is not None:
+            return 'pcomp'
+        return 'prep'
+
+    if label == 'SBAR':
+        if parent_label in NOMINAL_LABELS:
+            return 'rcmod'
+        if parent_label in CLAUSE_LABELS:
+            return 'advcl'
+        if parent_label in PREPOSITIONAL_LABELS:
+            return 'pcomp'
+        if parent_label == 'VP' or parent_label in ADJECTIVAL_LABELS:
+            first = child.children[0]
+            if first.word is not None and first.label == 'IN' and \
+                    first.word.lower() not in ('that', 'whether', 'if'):
+                return 'advcl'
+            return 'ccomp'
+        return 'dep'
+
+    if label in CLAUSE_LABELS:
+        if parent_label == 'VP':
+            if has_subject(child):
+                return 'ccomp'
+            if any(other.label in NOMINAL_LABELS
+                   for other in children[head_position + 1:position]):
+                return 'vmod'
+            return 'xcomp'
+        if parent_label in NOMINAL_LABELS:
+            return 'vmod'
+        if parent_label in CLAUSE_LABELS:
+            if position < head_position:
+                if has_subject(child):
+                    return 'ccomp'
+                return 'vmod'
+            return 'parataxis'
+        if parent_label in PREPOSITIONAL_LABELS:
+            return 'pcomp'
+        if parent_label in ADJECTIVAL_LABELS:
+            return 'xcomp'
+        return 'dep'
+
+    if label == 'VP':
+        if parent_label in NOMINAL_LABELS:
+            return 'vmod'
+        return 'dep'
+
+    if label == 'PRN':
+        inside = child.head_child
+        if inside.label in CLAUSE_LABELS or inside.label == 'VP':
+            return 'parataxis'
+        if parent_label in NOMINAL_LABELS and inside.label == 'NP' and \
+                not any(grandchild.label in NOMINAL_LABELS
+                        for grandchild in inside.children):
+            return 'appos'
+        return 'dep'
+
+    if label in ADJECTIVAL_LABELS:
+        if parent_label in NOMINAL_LABELS:
+            return 'amod'
+        if parent_label == 'VP':
+            return 'acomp'
+        return 'dep'
+    if label in ADVERBIAL_LABELS:
+        if child.head.word.lower() in NEGATIONS:
+            return 'neg'
+        return 'advmod'
+    if label == 'QP':
+        if parent_label in NOMINAL_LABELS:
+            return 'num'
+        return 'dep'
+    if label == 'PRT':
+        return 'prt'
+    if label == 'INTJ':
+        return 'discourse'
+    return 'dep'
+
+def get_preterminal_relation(parent, child, position, head_position,
+                             universal):
+    """Relations for dependents which are single words."""
+    tag = child.label
+    word = child.word.lower()
+    parent_label = parent.label
+    head = parent.head_child
+
+    if tag in VERB_TAGS:
+        if head.label == 'VP':
+            if word in PASSIVE_AUXILIARIES and is_participle_phrase(head):
+                return 'auxpass'
+            return 'aux'
+        if word in BE_FORMS and head.word is None:
+            return 'cop'
+        if tag in ('VBN', 'VBG') and parent_label in NOMINAL_LABELS:
+            return 'amod'
+        if head.label in ADJECTIVAL_LABELS:
+            return 'aux'
+        return 'dep'
+    if parent_label in PREPOSITIONAL_LABELS and universal and \
+            position < head_position:
+        if head.label in ('S', 'SBAR', 'VP'):
+            return 'mark'
+        return 'case'
+    if parent_label == 'SBAR' and tag in ('IN', 'DT', 'WDT'):
+        return 'mark'
+    if parent_label == 'QP':
+        if tag == 'CD':
+            return 'number'
+        return 'quantmod'
+    if tag in ('DT', 'WDT', 'WP'):
+        return 'det'
+    if tag == 'PDT':
+        return 'predet'
+    if tag in ('PRP$', 'WP$'):
+        return 'poss'
+    if tag == 'POS':
+        return 'possessive'
+    if tag == 'CD':
+        return 'num'
+    if tag == 'EX':
+        return 'expl'
+    if tag == 'RP':
+        return 'prt'
+    if tag == 'UH':
+        return 'discourse'
+    if tag in ADVERB_TAGS:
+        if word in NEGATIONS:
+            return 'neg'
+        return 'advmod'
+    if tag in ADJECTIVE_TAGS:
+        if parent_label in NOMINAL_LABELS or \
+                parent_label in ADJECTIVAL_LABELS:
+            return 'amod'
+        if parent_label == 'VP':
+            return 'acomp'
+        return 'dep'
+    if tag in NOUN_TAGS or tag in ('PRP', '$', '#'):
+        if parent_label in NOMINAL_LABELS and position < head_position:
+            return 'nn'
+        if parent_label in ADJECTIVAL_LABELS or \
+                parent_label in ADVERBIAL_LABELS:
+            return 'npadvmod'
+        if parent_label == 'VP':
+            return 'dobj'
+        return 'dep'
+    return 'dep'
+
+def get_universal_prepositional_relation(parent, child):
+    """Universal Dependencies relation for a prepositional phrase
+    (which is headed by its object)."""
+    inside = child
+    while inside.label in PREPOSITIONAL_LABELS and \
+            inside.head_child is not None:
+        inside = inside.head_child
+    if inside.label in ('S', 'SBAR', 'SQ', 'SINV', 'VP'):
+        if parent.label in NOMINAL_LABELS:
+            return 'acl'
+        return 'advcl'
+    if inside.label in ADVERBIAL_LABELS or inside.label in ADVERB_TAGS:
+        return 'advmod'
+    return 'nmod'
+
+def unescape_word(word):
+    """Undo Penn Treebank escaping of slashes and asterisks."""
+    return word.replace('\\/', '/').replace('\\*', '*')
+
+class PythonBackend(StanfordDependencies):
+    """Backend which converts trees in pure Python so it doesn't need
+    Java or a CoreNLP jar file. It's much faster to start than the
+    other backends but only supports the 'basic' representation and
+    approximates CoreNLP's conversion (see the PythonBackend module for
+    the known differences). Lemmas aren't available."""
+    needs_jar = False
+    def __init__(self, jar_filename=None, download_if_missing=False,
+                 version=None, conversion_cache=None):
+        """jar_filename, download_if_missing, and version are accepted
+        (and ignored) so this can be created like other backends.
+        conversion_cache is as in StanfordDependencies.__init__()."""
+        StanfordDependencies.__init__(self, jar_filename, download_if_missing,
+                                      version, conversion_cache)
+    @uses_conversion_cache
+    def convert_trees(self, ptb_trees, representation='basic', timeout=None,
+                      **kwargs):
+        """Arguments are as in StanfordDependencies.convert_trees().
+        Conversions can't be interrupted so timeout is checked between
+        trees."""
+        if timeout is not None:
+            ptb_trees = self._iter_until_deadline(ptb_trees, timeout)
+        return StanfordDependencies.convert_trees(self, ptb_trees,
+                                                  representation, **kwargs)
+    def convert_tree(self, ptb_tree, representation='basic', universal=True,
+                     include_punct=True, include_erased=False):
+        """Arguments are as in StanfordDependencies.convert_trees() but
+        representation must be 'basic' (so there is never anything to
+        erase)."""
+        self._raise_on_bad_representation(representation)
+        if representation != 'basic':
+            raise ValueError("PythonBackend only supports the 'basic' "
+                             "representation (got %r)" % representation)
+        self._raise_on_bad_input(ptb_tree)
+        root = prepare_tree(read_tree(ptb_tree), include_punct)
+        if root is None:
+            # nothing but empty elements (or punctuation we're leaving
+            # out), which the other backends reject as well
+            raise ValueError("Invalid PTB tree: %r" % ptb_tree)
+        sentence = Sentence()
+        if universal:
+            head_rules = UNIVERSAL_HEAD_RULES
+        else:
+            head_rules = HEAD_RULES
+        find_heads(root, head_rules)
+
+        heads = {root.head.index: (0, 'root')}
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            for child in node.children:
+                if child.word is None:
+                    stack.append(child)
+                if child is not node.head_child:
+                    relation = get_relation(node, child, universal)
+                    heads[child.head.index] = (node.head.index, relation)
+        for leaf in iter_preterminals(root):
+            head, deprel = heads[leaf.index]
+            sentence.append(Token(index=leaf.index,
+                                  form=unescape_word(leaf.word), lemma=None,
+                                  cpos=leaf.label, pos=leaf.label, feats=None,
+                                  head=head, deprel=deprel, phead=None,
+                                  pdeprel=None, extra=None))
+        return sentence
+
+    def _get_conversion_identity(self):
+        return 'PythonBackend-%d' % CONVERTER_VERSION
+    @staticmethod
+    def _iter_until_deadline(ptb_trees, timeout):
+        deadline = time.time() + timeout
+        for ptb_tree in ptb_trees:
+            if time.time() > deadline:
+                raise ConversionTimeoutError(timeout)
+            yield ptb_tree
@@ -12,7 +12,11 @@
 
 from __future__ import print_function
 from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
+import functools
+import inspect
 import os.path
+import threading
 
 try:
     from urllib import FancyURLopener
@@ -26,7 +30,9 @@ except NameError:
 
 import warnings
 
-from .CoNLL import Corpus
+from collections import OrderedDict
+from .CoNLL import Corpus, Sentence
+from .JavaHelper import get_jar_identity
 
 # ideally, this will be set to the latest version of CoreNLP
 DEFAULT_CORENLP_VERSION = '3.5.2'
@@ -38,6 +44,29 @@ INSTALL_DIR = '~/.local/share/pystanforddeps'
 # (note that in the online CoreNLP demo, 'collapsed' is called 'enhanced')
 REPRESENTATIONS = ('basic', 'collapsed', 'CCprocessed', 'collapsedTree')
 
+# ways of handling trees which can't be converted in convert_trees()
+ON_ERROR_MODES = ('raise', 'isolate')
+
+# convert_trees() options which affect its output (and their defaults)
+# and are thus part of the keys in conversion caches
+CACHED_OPTIONS = dict(representation='basic', universal=True,
+                      include_punct=True, include_erased=False,
+                      add_lemmas=False)
+
+# tracks whether the current thread is already inside a convert_trees()
+# call which uses a conversion cache (e.g., when a backend falls back to
+# StanfordDependencies.convert_trees()) so nested calls don't look up
+# the same trees again
+conversion_cache_state = threading.local()
+
+# backends returned by get_instance(shared=True), keyed by their
+# configuration (see StanfordDependencies._get_shared_instance())
+shared_instances = {}
+shared_instances_lock = threading.Lock()
+# held while creating the shared backend for a key (creating one can
+# take a while and shouldn't hold up backends with other keys)
+shared_instance_creation_locks = {}
+
 class JavaRuntimeVersionError(EnvironmentError):
     """Error for when the Java runtime environment is too old to support
     the specified version of Stanford CoreNLP."""
@@ -47,6 +76,108 @@ class JavaRuntimeVersionError(EnvironmentError):
                   "version 1.3.1 or later)"
         super(JavaRuntimeVersionError, self).__init__(message)
 
+class ConversionError(ValueError):
+    """Error for a Penn Treebank tree which couldn't be converted. When
+    converting with on_error='isolate', these are returned in place of
+    the Sentence for each bad tree rather than being raised. The tree
+    is available as ptb_tree."""
+    def __init__(self, ptb_tree, reason):
+        message = "Couldn't convert %r: %s" % (ptb_tree, reason)
+        super(ConversionError, self).__init__(message)
+        self.ptb_tree = ptb_tree
+        self.reason = str(reason)
+    def __reduce__(self):
+        return (self.__class__, (self.ptb_tree, self.reason))
+
+class ConversionTimeoutError(RuntimeError):
+    """Error for when a conversion takes longer than the timeout passed
+    to convert_trees() or convert_tree(). The timeout (in seconds) is
+    available as timeout."""
+    def __init__(self, timeout):
+        message = "Conversion took longer than %s seconds" % timeout
+        super(ConversionTimeoutError, self).__init__(message)
+        self.timeout = timeout
+    def __reduce__(self):
+        return (self.__class__, (self.timeout,))
+
+def uses_conversion_cache(convert_trees):
+    """Decorator for the convert_trees() methods of backends. If the
+    backend has a conversion_cache (see ConversionCache), trees are
+    looked up in it first and only the remaining trees are passed to
+    convert_trees(). Trees which were converted successfully are then
+    added to the cache."""
+    @functools.wraps(convert_trees)
+    def convert_trees_with_cache(self, ptb_trees, *args, **kwargs):
+        if not self._should_use_conversion_cache():
+            return convert_trees(self, ptb_trees, *args, **kwargs)
+        cache = self.conversion_cache
+
+        ptb_trees = list(ptb_trees)
+        for ptb_tree in ptb_trees:
+            self._raise_on_bad_input(ptb_tree)
+        call_args = inspect.getcallargs(convert_trees, self, ptb_trees,
+                                        *args, **kwargs)
+        options = {}
+        for name, default in CACHED_OPTIONS.items():
+            options[name] = call_args.get(name, kwargs.get(name, default))
+        identity = self._get_conversion_identity()
+        keys = [cache.make_key(ptb_tree, options, identity)
+                for ptb_tree in ptb_trees]
+
+        cached = cache.get_many(keys)
+        misses = OrderedDict((key, ptb_tree)
+                             for key, ptb_tree in zip(keys, ptb_trees)
+                             if key not in cached)
+        if misses:
+            with bypassing_conversion_cache():
+                converted = convert_trees(self, list(misses.values()),
+                                          *args, **kwargs)
+            converted = dict(zip(misses.keys(), converted))
+            cache.set_many((key, sentence)
+                           for key, sentence in converted.items()
+                           if isinstance(sentence, Sentence))
+            cached.update(converted)
+        # repeated trees get a copy each so changing one of them doesn't
+        # change the others
+        sentences = Corpus()
+        seen = set()
+        for key in keys:
+            sentence = cached[key]
+            if key in seen and isinstance(sentence, Sentence):
+                sentence = Sentence(sentence)
+            seen.add(key)
+            sentences.append(sentence)
+        return sentences
+    return convert_trees_with_cache
+
+@contextmanager
+def bypassing_conversion_cache():
+    """Context manager within which convert_trees() calls in the current
+    thread don't use the conversion cache. Backends which hand off
+    conversions to other threads should use this in those threads
+    since the trees have already been looked up."""
+    previous = getattr(conversion_cache_state, 'active', False)
+    conversion_cache_state.active = True
+    try:
+        yield
+    finally:
+        conversion_cache_state.active = previous
+
+def convert_chunk(sd, ptb_trees, on_error, kwargs):
+    """Returns a list with the result of sd.convert_tree() for each tree
+    in ptb_trees, handling errors according to on_error (see
+    StanfordDependencies.convert_trees()). This is a function rather
+    than a method so that it can be sent to process pools."""
+    sentences = []
+    for ptb_tree in ptb_trees:
+        try:
+            sentences.append(sd.convert_tree(ptb_tree, **kwargs))
+        except ValueError as ve:
+            if on_error == 'raise':
+                raise
+            sentences.append(ConversionError(ptb_tree, ve))
+    return sentences
+
 class ErrorAwareURLOpener(FancyURLopener):
     def http_error_default(self, url, fp, errcode, errmsg, headers):
         raise ValueError("Error downloading %r: %s %s" %
@@ -66,17 +197,36 @@ class StanfordDependencies:
     Subclasses should (at minimum) override the convert_tree method. They
     may also want to override convert_trees if they require batch
     operation. They may also add their own custom keyword arguments to
-    __init__(), convert_tree(), and convert_trees()."""
+    __init__(), convert_tree(), and convert_trees(). Backends which
+    override convert_trees() should decorate it with
+    uses_conversion_cache."""
     __metaclass__ = ABCMeta
+    # set for instances from get_instance(shared=True)
+    shared_key = None
+    shared_references = 0
+    # False for backends which don't use a CoreNLP jar file
+    needs_jar = True
     def __init__(self, jar_filename=None, download_if_missing=False,
-                 version=None):
+                 version=None, conversion_cache=None):
         """jar_filename should be the path to a Java jar file with
         classfiles from Stanford CoreNLP or Stanford Parser.
 
         If download_if_missing is True, it will automatically download
         a jar file and store it locally. By default it will use
         DEFAULT_CORENLP_VERSION but will use the version flag if
-        that argument is specified."""
+        that argument is specified.
+
+        conversion_cache can be set to a ConversionCache.ConversionCache
+        to cache converted trees in memory and on disk. Trees are then
+        only converted if they haven't been converted with the same
+        options and jar file before.
+
+        Backends with needs_jar set to False ignore jar_filename,
+        download_if_missing, and version and set jar_filename to None."""
+        self.conversion_cache = conversion_cache
+        if not self.needs_jar:
+            self.jar_filename = None
+            return
         if not (jar_filename or version is not None or download_if_missing):
             raise ValueError("Must set either jar_filename, version, "
                              "or download_if_missing to True.")
@@ -89,8 +239,11 @@ class StanfordDependencies:
             self.jar_filename = self.setup_and_get_default_path(filename)
             if download_if_missing:
                 self.download_if_missing(version)
+    @uses_conversion_cache
     def convert_trees(self, ptb_trees, representation='basic', universal=True,
-                      include_punct=True, include_erased=False, **kwargs):
+                      include_punct=True, include_erased=False,
+                      on_error='raise', executor=None, chunksize=1,
+                      **kwargs):
         """Convert a list of Penn Treebank formatted strings (ptb_trees)
         into Stanford Dependencies. The dependencies are represented
         as a list of sentences (CoNLL.Corpus), where each sentence
@@ -107,13 +260,116 @@ class StanfordDependencies:
         (if False and your representation might erase tokens, those
         tokens will be omitted from the output).
 
+        By default, a ValueError is raised if any tree can't be
+        converted. With on_error='isolate', each bad tree is instead
+        represented by a ConversionError in place of its Sentence and
+        all other trees are converted as usual.
+
+        The included backends also accept a timeout (in seconds).
+        Conversions which take longer than that are abandoned and
+        ConversionTimeoutError is raised (regardless of on_error). What
+        the limit applies to depends on the backend: the whole batch
+        for JPypeBackend and PythonBackend (which only checks between
+        trees), each batch sent to a worker for JPypeProcessPoolBackend,
+        and each Java process for SubprocessBackend (each tree with
+        persistent=True). This implementation passes timeout on to
+        convert_tree() so it's up to the backend's convert_tree() to
+        enforce it for each tree.
+
         See documentation on your backend to see if it supports
-        further options."""
+        further options.
+
+        By default, this calls convert_tree() on each tree in turn.
+        Backends which don't override it can also convert in parallel
+        by passing a concurrent.futures executor. Trees are then sent to
+        it in chunks of chunksize trees and the results are still
+        returned in the original order. With a process pool, the backend
+        must be picklable."""
+        self._raise_on_bad_on_error(on_error)
+        kwargs.update(representation=representation, universal=universal,
+                      include_punct=include_punct,
+                      include_erased=include_erased)
+        if executor is None:
+            return Corpus(convert_chunk(self, ptb_trees, on_error, kwargs))
+
+        ptb_trees = list(ptb_trees)
+        chunksize = max(1, chunksize)
+        futures = [executor.submit(convert_chunk, self,
+                                   ptb_trees[start:start + chunksize],
+                                   on_error, kwargs)
+                   for start in range(0, len(ptb_trees), chunksize)]
+        sentences = Corpus()
+        try:
+            for future in futures:
+                sentences.extend(future.result())
+        except BaseException:
+            # the first failure in input order is raised so the rest of
+            # the work is pointless
+            for future in futures:
+                future.cancel()
+            raise
+        return sentences
+    def convert_trees_multi(self, ptb_trees, representations,
+                            universals=(True,), include_punct=True,
+                            include_erased=False, **kwargs):
+        """Convert a list of Penn Treebank formatted strings into several
+        representations at once. representations is a sequence of
+        representation names (see convert_trees()) and universals is
+        a sequence of values for the universal flag, e.g., (True, False)
+        to get both Universal and original Stanford Dependencies.
+        Returns a dictionary mapping (representation, universal) pairs
+        to a CoNLL.Corpus.
+
+        Backends which support it read each tree and build each
+        dependency structure only once for all representations. By
+        default, this calls convert_trees() for each combination."""
+        for representation in representations:
+            self._raise_on_bad_representation(representation)
+        ptb_trees = list(ptb_trees)
+        kwargs.update(include_punct=include_punct,
+                      include_erased=include_erased)
+        results = {}
+        for universal in universals:
+            for representation in representations:
+                key = (representation, universal)
+                results[key] = self.convert_trees(ptb_trees, representation,
+                                                  universal=universal,
+                                                  **kwargs)
+        return results
+    def iter_convert_trees(self, ptb_trees, representation='basic',
+                           universal=True, include_punct=True,
+                           include_erased=False, **kwargs):
+        """Generator version of convert_trees(). ptb_trees can be any
+        iterable over Penn Treebank formatted strings (including an
+        unbounded one) and each CoNLL.Sentence is yielded as soon as
+        it has been converted so the full input and output never need
+        to be in memory. Arguments are the same as convert_trees()."""
         kwargs.update(representation=representation, universal=universal,
                       include_punct=include_punct,
                       include_erased=include_erased)
-        return Corpus(self.convert_tree(ptb_tree, **kwargs)
-                      for ptb_tree in ptb_trees)
+        for ptb_tree in ptb_trees:
+            yield self.convert_tree(ptb_tree, **kwargs)
+    def aconvert_trees(self, ptb_trees, executor=None, **kwargs):
+        """asyncio version of convert_trees() (requires Python 3.5+).
+        Returns a coroutine so use it as:
+
+            sentences = await sd.aconvert_trees(ptb_trees)
+
+        Keyword arguments are the same as convert_trees(). By default,
+        convert_trees() runs in executor (the event loop's default
+        executor if None) so the event loop isn't blocked while
+        converting. Cancelling the coroutine discards the results but
+        can't interrupt a conversion which has already started.
+        Backends may convert natively in the event loop instead."""
+        from .AsyncConversion import run_in_executor
+        return run_in_executor(self.convert_trees, ptb_trees,
+                               executor=executor, **kwargs)
+    def aconvert_tree(self, ptb_tree, executor=None, **kwargs):
+        """asyncio version of convert_tree() (requires Python 3.5+).
+        See aconvert_trees() for details."""
+        from .AsyncConversion import run_in_executor
+        return run_in_executor(self.convert_tree, ptb_tree,
+                               executor=executor, **kwargs)
 
     @abstractmethod
     def convert_tree(self, ptb_tree, representation='basic', **kwargs):
@@ -122,6 +378,27 @@ class StanfordDependencies:
         slower than using convert_trees, so consider that if you're
         doing a batch conversion. See convert_trees for more details
         and a listing of possible kwargs."""
+    def close(self):
+        """Release any resources (e.g., Java processes) held by this
+        backend. By default, there's nothing to release."""
+    def release(self):
+        """Give up a reference to a backend from get_instance(shared=True).
+        Once every caller which got it has released it, it is closed and
+        the next get_instance(shared=True) call creates a new one. For
+        other backends, this is the same as close(). Backends can also
+        be used as context managers which release them on exit."""
+        with shared_instances_lock:
+            if self.shared_key is not None:
+                self.shared_references -= 1
+                if self.shared_references > 0:
+                    return
+                del shared_instances[self.shared_key]
+                self.shared_key = None
+        self.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
 
     def setup_and_get_default_path(self, jar_base_filename):
         """Determine the user-specific install path for the Stanford
@@ -153,6 +430,19 @@ class StanfordDependencies:
         opener = ErrorAwareURLOpener()
         opener.retrieve(jar_url, filename=self.jar_filename)
 
+    def _should_use_conversion_cache(self):
+        """Returns whether conversions in the current thread should be
+        looked up in (and added to) the conversion cache: only if there
+        is one and we're not already converting the misses of an
+        earlier lookup (see bypassing_conversion_cache())."""
+        return self.conversion_cache is not None and \
+            not getattr(conversion_cache_state, 'active', False)
+    def _get_conversion_identity(self):
+        """Returns a string which changes whenever this backend's
+        conversions may change, for conversion cache keys. By default,
+        this describes the jar file (see JavaHelper.get_jar_identity())."""
+        return get_jar_identity(self.jar_filename)
+
     @staticmethod
     def _raise_on_bad_representation(representation):
         """Ensure that representation is a known Stanford Dependency
@@ -163,6 +453,91 @@ class StanfordDependencies:
             raise ValueError("Unknown representation: %r (should be one "
                              "of %s)" % (representation, repr_desc))
 
+    @staticmethod
+    def _raise_on_bad_on_error(on_error):
+        """Ensure that on_error is a known way of handling conversion
+        errors (raises a ValueError if it isn't)."""
+        if on_error not in ON_ERROR_MODES:
+            modes_desc = ', '.join(map(repr, ON_ERROR_MODES))
+            raise ValueError("Unknown on_error: %r (should be one "
+                             "of %s)" % (on_error, modes_desc))
+
+    @staticmethod
+    def _split_into_shards(items, num_shards):
+        """Split a list into (at most) num_shards contiguous lists of
+        roughly equal size."""
+        shard_size = -(-len(items) // max(num_shards, 1)) or 1
+        return [items[start:start + shard_size]
+                for start in range(0, len(items), shard_size)] or [items]
+
+    @staticmethod
+    def _get_shared_instance(jar_filename, version, download_if_missing,
+                             backend, extra_args):
+        """Returns the shared backend for these get_instance() arguments,
+        creating it if there isn't one yet."""
+        StanfordDependencies._raise_on_bad_jar_filename(jar_filename)
+        # equivalent ways of choosing the jar file get the same key. If
+        # jar_filename is set, the other two are ignored.
+        if jar_filename is None:
+            jar_location = (None, version or DEFAULT_CORENLP_VERSION,
+                            bool(download_if_missing))
+        else:
+            jar_location = (os.path.abspath(jar_filename), None, None)
+        # repr() handles unhashable arguments (e.g., lists of Java
+        # arguments) and objects such as caches are compared by identity
+        shared_key = repr((jar_location, backend,
+                           sorted(extra_args.items())))
+        with shared_instances_lock:
+            creation_lock = shared_instance_creation_locks.setdefault(
+                shared_key, threading.Lock())
+        with creation_lock:
+            with shared_instances_lock:
+                sd = shared_instances.get(shared_key)
+                if sd is not None:
+                    sd.shared_references += 1
+                    return sd
+            # this may download a jar or start Java so other shared
+            # backends can be used and created in the meantime
+            sd = StanfordDependencies.get_instance(jar_filename, version,
+                                                   download_if_missing,
+                                                   backend, **extra_args)
+            with shared_instances_lock:
+                sd.shared_key = shared_key
+                sd.shared_references = 1
+                shared_instances[shared_key] = sd
+            return sd
+    @staticmethod
+    def _choose_backend(extra_args):
+        """Returns the name of the fastest backend according to
+        Calibration.choose_backend() and updates extra_args (arguments
+        for get_instance()) with its constructor arguments."""
+        from .Calibration import choose_backend, DEFAULT_BATCH_SIZE
+        from .SubprocessBackend import SubprocessBackend
+        expected_batch_size = extra_args.pop('expected_batch_size',
+                                             DEFAULT_BATCH_SIZE)
+        recalibrate = extra_args.pop('recalibrate', False)
+        # resolves (and downloads, if requested) the jar file without
+        # starting Java
+        jar_filename = SubprocessBackend(
+            jar_filename=extra_args['jar_filename'],
+            download_if_missing=extra_args['download_if_missing'],
+            version=extra_args['version']).jar_filename
+        choice = choose_backend(jar_filename, expected_batch_size,
+                                recalibrate,
+                                java_command=extra_args.get('java_command',
+                                                            'java'))
+        if choice is None:
+            warnings.warn('No backend worked during calibration, '
+                          'falling back to SubprocessBackend.')
+            return 'subprocess'
+        backend, backend_args = choice
+        extra_args.update(backend_args, jar_filename=jar_filename)
+        if backend == 'jpype':
+            # only SubprocessBackend takes a java_command (JPype uses
+            # JAVA_HOME)
+            extra_args.pop('java_command', None)
+        return backend
+
     @staticmethod
     def _raise_on_bad_input(ptb_tree):
         """Ensure that ptb_tree is a valid Penn Treebank datatype or
@@ -207,11 +582,21 @@ class StanfordDependencies:
 
     @staticmethod
     def get_instance(jar_filename=None, version=None,
-                     download_if_missing=True, backend='jpype',
+                     download_if_missing=True, backend='jpype', shared=False,
                      **extra_args):
         """This is the typical mechanism of constructing a
         StanfordDependencies instance. The backend parameter determines
-        which backend to load (currently can be 'subprocess' or 'jpype').
+        which backend to load (currently can be 'subprocess', 'jpype',
+        'jpype-pool' for JPypeProcessPoolBackend, or 'python' for
+        PythonBackend, which doesn't need Java or a jar file).
+
+        With backend='auto', each backend is timed on a few trees and
+        the one which would convert a batch of expected_batch_size trees
+        (100 by default) fastest is used. Calibration takes a minute or
+        so but its results are stored with downloaded jars and reused
+        for the same jar file and Java runtime. Pass recalibrate=True to
+        measure again. Additional keyword arguments must be accepted by
+        all backends (e.g., conversion_cache).
 
         To determine which jar file is used, you must specify
         jar_filename, download_if_missing=True, and/or version.
@@ -230,13 +615,26 @@ class StanfordDependencies:
         All remaining keyword arguments are passes on to the
         StanfordDependencies backend constructor.
 
+        If shared is True, the backend is shared with every other
+        get_instance(shared=True) call with the same arguments in this
+        process so it's only created (and set up) once. Call release()
+        on it when you're done instead of close() (or use it in a with
+        statement). close_shared_instances() closes all shared backends.
+
         If the above options are confusing, don't panic! You can leave
         them all blank -- get_instance() is designed to provide the best
         and latest available conversion settings by default."""
+        if shared:
+            return StanfordDependencies._get_shared_instance(
+                jar_filename, version, download_if_missing, backend,
+                extra_args)
         StanfordDependencies._raise_on_bad_jar_filename(jar_filename)
         extra_args.update(jar_filename=jar_filename,
                           download_if_missing=download_if_missing,
                           version=version)
+        if backend == 'auto':
+            backend = StanfordDependencies._choose_backend(extra_args)
+
         if backend == 'jpype':
             try:
                 from .JPypeBackend import JPypeBackend
@@ -257,10 +655,29 @@ class StanfordDependencies:
         if backend == 'subprocess':
             from .SubprocessBackend import SubprocessBackend
             return SubprocessBackend(**extra_args)
+        elif backend == 'jpype-pool':
+            from .JPypeProcessPoolBackend import JPypeProcessPoolBackend
+            return JPypeProcessPoolBackend(**extra_args)
+        elif backend == 'python':
+            from .PythonBackend import PythonBackend
+            return PythonBackend(**extra_args)
 
         raise ValueError("Unknown backend: %r (known backends: "
-                         "'subprocess' and 'jpype')" % backend)
+                         "'subprocess', 'jpype', 'jpype-pool', 'python', "
+                         "and 'auto')" % backend)
 
 # convenience alias so we don't need to say
 #   sd = StanfordDependencies.StanfordDependencies.get_instance()
 get_instance = StanfordDependencies.get_instance
+
+def close_shared_instances():
+    """Close all backends from get_instance(shared=True), regardless of
+    whether they've been released."""
+    with shared_instances_lock:
+        instances = list(shared_instances.values())
+        shared_instances.clear()
+        for sd in instances:
+            sd.shared_key = None
+            sd.shared_references = 0
+    for sd in instances:
+        sd.close()
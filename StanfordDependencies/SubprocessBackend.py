@@ -11,30 +11,325 @@
 # limitations under the License.
 
 from __future__ import print_function
+import hashlib
+import multiprocessing
 import os
 import subprocess
 import tempfile
+import threading
+import warnings
+from itertools import islice
+from multiprocessing.pool import ThreadPool
+try:
+    from queue import Empty, Queue
+except ImportError:
+    from Queue import Empty, Queue # Python 2
 from .StanfordDependencies import (StanfordDependencies,
-                                   JavaRuntimeVersionError)
-from .CoNLL import Corpus
+                                   JavaRuntimeVersionError, ConversionError,
+                                   ConversionTimeoutError, INSTALL_DIR,
+                                   uses_conversion_cache)
+from .CoNLL import Corpus, Sentence
+from .FileHelper import replace_file
+from .JavaHelper import (HELPER_CLASS_NAME, get_helper_classpath,
+                         get_jar_identity, get_javac_command)
 
 JAVA_CLASS_NAME = 'edu.stanford.nlp.trees.EnglishGrammaticalStructure'
 
+# JVM arguments used unless java_args is set in the constructor
+DEFAULT_JAVA_ARGS = ('-ea',)
+# ... and when class_data_sharing is enabled. These trade peak
+# performance for faster startup.
+STARTUP_JAVA_ARGS = ('-ea', '-XX:TieredStopAtLevel=1', '-XX:+UseSerialGC')
+
+# tree used to exercise the converter when creating class data
+# sharing archives
+TRAINING_TREE = '(S1 (S (NP (DT The) (NN cow)) (VP (VBD jumped) (PP ' \
+                '(IN over) (NP (DT the) (NN moon)))) (. .)))'
+
+class InvalidTreeError(ValueError):
+    """Raised when a batch failed because of one of its trees (as
+    opposed to, e.g., Java failing to start) so on_error='isolate' knows
+    that bisecting the batch will find the trees responsible."""
+
+class Watchdog:
+    """Kills a process if it's still running after timeout seconds
+    (unless timeout is None). Use it as a context manager around code
+    which waits for the process. Afterwards, fired is True if the
+    process had to be killed (and not if the process exited or the
+    with block finished just before the timer went off)."""
+    def __init__(self, process, timeout):
+        self.process = process
+        self.timeout = timeout
+        self.fired = False
+        self.finished = False
+        self.timer = None
+        self.lock = threading.Lock()
+    def __enter__(self):
+        if self.timeout is not None:
+            self.timer = threading.Timer(self.timeout, self._kill)
+            self.timer.daemon = True
+            self.timer.start()
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self.lock:
+            self.finished = True
+        if self.timer is not None:
+            self.timer.cancel()
+    def _kill(self):
+        with self.lock:
+            if self.finished or self.process.poll() is not None:
+                # we got there in time
+                return
+            self.fired = True
+            try:
+                self.process.kill()
+            except EnvironmentError:
+                # it exited on its own in the meantime
+                pass
+
+class PersistentWorker:
+    """A long-lived Java process which converts trees one at a time
+    (see java/PyStanfordDependenciesHelper.java for the protocol).
+    If the process dies, it is restarted on the next request."""
+    def __init__(self, command, debug=False):
+        """command is the full java command line to run the helper."""
+        self.command = command
+        self.debug = debug
+        self.process = None
+        self.stderr_file = None
+        self.lock = threading.Lock()
+    def start(self):
+        """Start (or restart) the Java process."""
+        self.close()
+        if self.debug:
+            print('Command:', ' '.join(self.command))
+        # stderr goes to a file since it's only used to explain why
+        # the process died (and it can't fill up a pipe that way)
+        self.stderr_file = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=self.stderr_file)
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+    def close(self):
+        """Stop the Java process if it's running."""
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+            except EnvironmentError:
+                pass
+            if self.process.poll() is None:
+                self.process.terminate()
+            self.process.wait()
+            self.process.stdout.close()
+            self.process = None
+        if self.stderr_file is not None:
+            self.stderr_file.close()
+            self.stderr_file = None
+    def convert(self, ptb_tree, representation, universal, include_punct,
+                timeout=None):
+        """Convert a single Penn Treebank tree. Returns a list of lines in
+        Stanford Dependencies text format. Raises ValueError if the tree
+        couldn't be converted. If Java takes more than timeout seconds,
+        it's killed (and restarted on the next request) and
+        ConversionTimeoutError is raised."""
+        return self.convert_multi(ptb_tree, (representation,), (universal,),
+                                  include_punct, timeout)[0]
+    def convert_multi(self, ptb_tree, representations, universals,
+                      include_punct, timeout=None):
+        """Convert a single Penn Treebank tree to several representations
+        at once. Java reads the tree once and builds one structure for
+        each value in universals. Returns a list of lists of lines (as
+        in convert()) for each universal value and each representation
+        (in that order)."""
+        request = self._make_request(ptb_tree, representations, universals,
+                                     include_punct)
+        num_blocks = len(representations) * len(universals)
+        with self.lock:
+            # if the process dies in the middle of a request, restart it
+            # and try once more before giving up
+            for attempt in range(2):
+                if not self.is_alive():
+                    self.start()
+                watchdog = Watchdog(self.process, timeout)
+                try:
+                    with watchdog:
+                        self._send_request(request)
+                        response = self._read_response(num_blocks)
+                except EnvironmentError:
+                    response = None
+                if watchdog.fired:
+                    self.close()
+                    raise ConversionTimeoutError(timeout)
+                if response is not None:
+                    break
+            else:
+                self._raise_on_death()
+        return self._check_response(ptb_tree, request, response)
+    def convert_stream(self, ptb_trees, representation, universal,
+                       include_punct, max_pending=100):
+        """Generator version of convert(). ptb_trees can be any iterable.
+        Trees are written to Java from a separate thread while we read
+        the results so at most max_pending trees are held in memory at
+        once. Yields (ptb_tree, lines) pairs in order. Unlike convert(),
+        the stream is not retried if the Java process dies.
+
+        The worker is busy until the generator finishes (other requests
+        wait for it) so streams should use a worker of their own."""
+        done = object()
+        pending = Queue(max_pending)
+        stopped = threading.Event()
+
+        def write_requests():
+            try:
+                for ptb_tree in ptb_trees:
+                    request = self._make_request(ptb_tree, (representation,),
+                                                 (universal,), include_punct)
+                    pending.put((ptb_tree, request))
+                    if stopped.is_set():
+                        return
+                    self._send_request(request)
+                pending.put((done, None))
+            except EnvironmentError:
+                # the reader will notice that the process died
+                pending.put((done, None))
+            except Exception as exc:
+                pending.put((done, exc))
+
+        with self.lock:
+            if not self.is_alive():
+                self.start()
+            writer = threading.Thread(target=write_requests)
+            writer.daemon = True
+            writer.start()
+            finished = False
+            try:
+                while 1:
+                    ptb_tree, request = pending.get()
+                    if ptb_tree is done:
+                        # request is set to the exception if the writer
+                        # failed
+                        if request is not None:
+                            raise request
+                        break
+                    response = self._read_response(1)
+                    if response is None:
+                        self._raise_on_death()
+                    yield ptb_tree, self._check_response(ptb_tree, request,
+                                                         response)[0]
+                finished = True
+            finally:
+                if not finished:
+                    # we stopped early so Java may still be working on
+                    # trees we'll never read: restart it next time
+                    stopped.set()
+                    self.close()
+                    while writer.is_alive():
+                        try:
+                            pending.get_nowait()
+                        except Empty:
+                            pass
+                        writer.join(0.01)
+
+    def _make_request(self, ptb_tree, representations, universals,
+                      include_punct):
+        # requests must fit on a single line (and whitespace isn't
+        # significant in Penn Treebank trees)
+        return '\t'.join((','.join(representations),
+                          ','.join(str(int(universal))
+                                   for universal in universals),
+                          str(int(include_punct)),
+                          ' '.join(ptb_tree.split())))
+    def _send_request(self, request):
+        self.process.stdin.write((request + '\n').encode('utf-8'))
+        self.process.stdin.flush()
+    def _check_response(self, ptb_tree, request, response):
+        """Raises ValueError if Java reported an error for this tree,
+        otherwise returns the response."""
+        if self.debug:
+            print('Request:', request)
+            print('Response: {%s}' % '\n\n'.join('\n'.join(block)
+                                                 for block in response))
+        if response[0] and response[0][0].startswith('!'):
+            raise ValueError("Error converting %r: %s" %
+                             (ptb_tree, response[0][0][1:]))
+        return response
+    def _read_response(self, num_blocks):
+        """Read num_blocks groups of lines, each ending in a blank line.
+        Returns a list of blocks (each a list of lines) or None if the
+        process exits first. Errors are reported in a single block."""
+        blocks = []
+        lines = []
+        while len(blocks) < num_blocks:
+            line = self.process.stdout.readline()
+            if not line:
+                return None
+            line = line.decode('utf-8').rstrip('\r\n')
+            if line:
+                lines.append(line)
+                continue
+            blocks.append(lines)
+            if lines and lines[0].startswith('!'):
+                break
+            lines = []
+        return blocks
+    def _raise_on_death(self):
+        return_code = self.process.wait()
+        self.stderr_file.seek(0)
+        stderr = self.stderr_file.read().decode('utf-8', 'replace')
+        if self.debug:
+            print("stderr: {%s}" % stderr)
+            print('Exit code:', return_code)
+        SubprocessBackend._raise_on_bad_exit_or_output(return_code or 1,
+                                                       stderr)
+
 class SubprocessBackend(StanfordDependencies):
     """Interface to Stanford Dependencies via subprocesses. This means
     that each call opens a pipe to Java. It has the advantage that it
     should work out of the box if you have Java but it is slower than
     other backends. As such, convert_trees() will be more efficient than
-    convert_tree() for this backend."""
+    convert_tree() for this backend, unless persistent=True is set in
+    the constructor."""
     def __init__(self, jar_filename=None, download_if_missing=False,
-                 version=None, java_command='java'):
-        """java_command is the path to a java binary."""
+                 version=None, java_command='java', persistent=False,
+                 java_args=None, class_data_sharing=False,
+                 conversion_cache=None):
+        """java_command is the path to a java binary. If persistent is
+        True, trees are converted by a single long-lived Java process
+        instead of starting Java on each call. This avoids the JVM's
+        startup costs but requires javac (from a JDK) the first time
+        since it uses a small helper class which is compiled against
+        your jar file. Call close() to stop the Java process when you're
+        done converting.
+
+        java_args is a list of arguments for the JVM (defaults to
+        DEFAULT_JAVA_ARGS). If class_data_sharing is True, the first
+        run creates a class data sharing archive for your jar file
+        (stored with downloaded jars) which later runs load instead of
+        the classes in the jar. This makes startup considerably faster
+        but requires Java 13 or later. In this mode, java_args defaults
+        to STARTUP_JAVA_ARGS."""
         StanfordDependencies.__init__(self, jar_filename, download_if_missing,
-                                      version)
+                                      version, conversion_cache)
         self.java_command = java_command
+        self.persistent = persistent
+        if java_args is None:
+            if class_data_sharing:
+                java_args = STARTUP_JAVA_ARGS
+            else:
+                java_args = DEFAULT_JAVA_ARGS
+        self.java_args = list(java_args)
+        self.class_data_sharing = class_data_sharing
+        self.class_data_lock = threading.Lock()
+        self.workers = []
+        self.workers_lock = threading.Lock()
+        # why the Java helper couldn't be compiled (so we only try once)
+        self.helper_error = None
+    @uses_conversion_cache
     def convert_trees(self, ptb_trees, representation='basic',
                       include_punct=True, include_erased=False, universal=True,
-                      debug=False):
+                      debug=False, workers=None, on_error='raise',
+                      timeout=None):
         """Convert a list of Penn Treebank formatted trees (ptb_trees)
         into Stanford Dependencies. The dependencies are represented
         as a list of sentences, where each sentence is itself a list of
@@ -45,76 +340,461 @@ class SubprocessBackend(StanfordDependencies):
         in the CoreNLP command line tools. (note that in the online
         CoreNLP demo, 'collapsed' is called 'enhanced')
 
+        workers is the number of Java processes to convert with in
+        parallel. The trees are split into that many contiguous shards
+        and the results are returned in the original order. By default
+        (workers=None), one Java process per CPU is used. If one shard
+        fails, the others are allowed to finish before the error is
+        raised so no Java processes are left running.
+
+        If on_error='isolate', trees which can't be converted are
+        represented by ConversionError objects in place of their
+        Sentence instead of failing the whole batch. Bad trees are found
+        by repeatedly splitting failed batches in half so only a few
+        extra Java runs are needed when most trees are fine.
+
+        If timeout is set, each Java process is killed if it takes more
+        than timeout seconds for its shard (or with persistent=True, for
+        any one tree) and ConversionTimeoutError is raised.
+
         Setting debug=True will cause debugging information (including
         the java command run to be printed."""
         self._raise_on_bad_representation(representation)
-        input_file = tempfile.NamedTemporaryFile(delete=False)
+        self._raise_on_bad_on_error(on_error)
+        ptb_trees = list(ptb_trees)
+        for ptb_tree in ptb_trees:
+            self._raise_on_bad_input(ptb_tree)
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        workers = max(1, min(workers, len(ptb_trees)))
+
+        def convert_shard(worker_index_and_shard):
+            worker_index, shard = worker_index_and_shard
+            if self.persistent:
+                return self._convert_trees_persistent(shard, representation,
+                                                      include_punct,
+                                                      include_erased,
+                                                      universal, debug,
+                                                      worker_index, on_error,
+                                                      timeout)
+            elif on_error == 'isolate':
+                return self._convert_batch_isolating(shard, representation,
+                                                     include_punct,
+                                                     include_erased,
+                                                     universal, debug,
+                                                     timeout)
+            else:
+                return self._convert_batch(shard, representation,
+                                           include_punct, include_erased,
+                                           universal, debug, timeout=timeout)
+
+        shards = self._split_into_shards(ptb_trees, workers)
+        if len(shards) == 1:
+            return convert_shard((0, ptb_trees))
+        # the real work happens in Java processes so threads are enough
+        pool = ThreadPool(len(shards))
+        try:
+            results = [pool.apply_async(convert_shard, (shard,))
+                       for shard in enumerate(shards)]
+            # wait for every shard, even if one failed, so no Java
+            # processes outlive this call
+            for result in results:
+                result.wait()
+            sentences = Corpus()
+            for result in results:
+                sentences.extend(result.get())
+        finally:
+            pool.terminate()
+        return sentences
+    def convert_tree(self, ptb_tree, **kwargs):
+        """Converts a single Penn Treebank formatted tree (a string)
+        to Stanford Dependencies. See convert_trees for more details."""
+        return self.convert_trees([ptb_tree], **kwargs)[0]
+    def iter_convert_trees(self, ptb_trees, representation='basic',
+                           include_punct=True, include_erased=False,
+                           universal=True, debug=False, batch_size=1000):
+        """Generator version of convert_trees(). ptb_trees can be any
+        iterable of trees (including an unbounded one) and Sentence
+        objects are yielded as soon as Java converts them. Trees are
+        streamed to a Java process of their own (even with
+        persistent=True, so other conversions can run while iterating)
+        which is stopped once the iterator is exhausted or closed.
+        Memory use is bounded and no temporary files are needed.
+
+        If the Java helper can't be compiled (see the persistent option
+        in the constructor), this falls back to running the CoreNLP
+        command line tools on batch_size trees at a time."""
+        self._raise_on_bad_representation(representation)
+        worker = self._get_helper_worker(debug, dedicated=True)
+        if worker is None:
+            ptb_trees = iter(ptb_trees)
+            while 1:
+                batch = list(self._checked_trees(islice(ptb_trees,
+                                                        batch_size)))
+                if not batch:
+                    return
+                for sentence in self._convert_batch(batch, representation,
+                                                    include_punct,
+                                                    include_erased,
+                                                    universal, debug):
+                    yield sentence
+
+        try:
+            for ptb_tree, lines in worker.convert_stream(
+                    self._checked_trees(ptb_trees), representation,
+                    universal, include_punct or include_erased):
+                yield self._make_sentence(lines, ptb_tree, include_punct,
+                                          include_erased)
+        finally:
+            worker.close()
+    def convert_trees_multi(self, ptb_trees, representations,
+                            universals=(True,), include_punct=True,
+                            include_erased=False, debug=False):
+        """Convert a list of trees into several representations at once
+        (see StanfordDependencies.convert_trees_multi()). Each tree is
+        sent to a persistent Java process (a temporary one unless
+        persistent=True was set in the constructor) which reads it once
+        and builds one structure per universal setting. If the Java
+        helper can't be compiled, this falls back to running the CoreNLP
+        command line tools once for each combination."""
+        for representation in representations:
+            self._raise_on_bad_representation(representation)
+        ptb_trees = list(self._checked_trees(ptb_trees))
+        worker = self._get_helper_worker(debug)
+        if worker is None:
+            return StanfordDependencies.convert_trees_multi(
+                self, ptb_trees, representations, universals,
+                include_punct, include_erased, debug=debug)
+
+        keys = [(representation, universal) for universal in universals
+                for representation in representations]
+        results = dict((key, Corpus()) for key in keys)
         try:
             for ptb_tree in ptb_trees:
-                self._raise_on_bad_input(ptb_tree)
-                tree_with_line_break = ptb_tree + "\n"
-                input_file.write(tree_with_line_break.encode("utf-8"))
-            input_file.flush()
-            input_file.close()
+                blocks = worker.convert_multi(ptb_tree, representations,
+                                              universals,
+                                              include_punct or include_erased)
+                for key, lines in zip(keys, blocks):
+                    sentence = self._make_sentence(lines, ptb_tree,
+                                                   include_punct,
+                                                   include_erased)
+                    results[key].append(sentence)
+        finally:
+            if not self.persistent:
+                worker.close()
+        return results
+    def aconvert_trees(self, ptb_trees, representation='basic',
+                       include_punct=True, include_erased=False,
+                       universal=True, debug=False, workers=None,
+                       on_error='raise', timeout=None, executor=None):
+        """asyncio version of convert_trees() (requires Python 3.5+, see
+        StanfordDependencies.aconvert_trees()). Java is run as an asyncio
+        subprocess (one per worker) whose output is read without
+        blocking the event loop, and cancelling the coroutine kills it.
 
-            command = [self.java_command,
-                       '-ea',
-                       '-cp', self.jar_filename,
-                       JAVA_CLASS_NAME,
-                       '-' + representation,
-                       '-treeFile', input_file.name]
-            # if we're including erased, we want to include punctuation
-            # since otherwise we won't know what SD considers punctuation
-            if include_punct or include_erased:
-                command.append('-keepPunct')
-            if not universal:
-                command.append('-originalDependencies')
-            if debug:
-                print('Command:', ' '.join(command))
+        With persistent=True, on_error='isolate', or a conversion_cache,
+        convert_trees() is run in executor instead."""
+        if self.persistent or on_error != 'raise' or \
+           self.conversion_cache is not None:
+            return StanfordDependencies.aconvert_trees(
+                self, ptb_trees, executor=executor,
+                representation=representation, include_punct=include_punct,
+                include_erased=include_erased, universal=universal,
+                debug=debug, workers=workers, on_error=on_error,
+                timeout=timeout)
+        from .AsyncConversion import subprocess_convert_trees
+        return subprocess_convert_trees(self, ptb_trees, representation,
+                                        include_punct, include_erased,
+                                        universal, debug, workers, timeout)
+    def aconvert_tree(self, ptb_tree, **kwargs):
+        """asyncio version of convert_tree(). See aconvert_trees() for
+        details."""
+        from .AsyncConversion import first_sentence
+        return first_sentence(self.aconvert_trees([ptb_tree], **kwargs))
+    def close(self):
+        """Stops any persistent Java processes. They will be restarted if
+        you convert more trees afterwards."""
+        with self.workers_lock:
+            workers = self.workers
+            self.workers = []
+        for worker in workers:
+            worker.close()
+
+    def _convert_batch(self, ptb_trees, representation, include_punct,
+                       include_erased, universal, debug, verbose=True,
+                       timeout=None):
+        """Convert a list of trees with a single run of the CoreNLP
+        command line tools. If verbose is True, Java's output is printed
+        when the conversion fails. If Java runs for more than timeout
+        seconds, it's killed and ConversionTimeoutError is raised."""
+        tree_filename = self._write_tree_file(ptb_trees)
+        try:
+            command = self._get_batch_command(tree_filename, representation,
+                                              include_punct, include_erased,
+                                              universal, debug)
             sd_process = subprocess.Popen(command, stdout=subprocess.PIPE,
                                           stderr=subprocess.PIPE,
                                           universal_newlines=True)
-            return_code = sd_process.wait()
-            stderr = sd_process.stderr.read()
-            stdout = sd_process.stdout.read()
-
-            if debug:
-                print("stdout: {%s}" % stdout)
-                print("stderr: {%s}" % stderr)
-                print('Exit code:', return_code)
-
-            self._raise_on_bad_exit_or_output(return_code, stderr)
+            # communicate() rather than wait() since large batches can
+            # fill up the pipes
+            with Watchdog(sd_process, timeout) as watchdog:
+                stdout, stderr = sd_process.communicate()
         finally:
-            os.remove(input_file.name)
+            os.remove(tree_filename)
+        if watchdog.fired:
+            raise ConversionTimeoutError(timeout)
+        return self._read_batch_output(stdout, stderr, sd_process.returncode,
+                                       ptb_trees, include_punct,
+                                       include_erased, debug, verbose)
+    def _write_tree_file(self, ptb_trees):
+        """Write trees to a temporary file (one per line) for the CoreNLP
+        command line tools. Returns its filename. The caller is
+        responsible for removing it."""
+        input_file = tempfile.NamedTemporaryFile(delete=False)
+        try:
+            for ptb_tree in ptb_trees:
+                tree_with_line_break = ptb_tree + "\n"
+                input_file.write(tree_with_line_break.encode("utf-8"))
+        finally:
+            input_file.close()
+        return input_file.name
+    def _get_batch_command(self, tree_filename, representation,
+                           include_punct, include_erased, universal,
+                           debug=False):
+        """Returns the command line (as a list) to convert the trees in
+        tree_filename with the CoreNLP command line tools."""
+        command = self._get_java_command(self.jar_filename, JAVA_CLASS_NAME,
+                                         debug)
+        command += ['-' + representation, '-treeFile', tree_filename]
+        # if we're including erased, we want to include punctuation
+        # since otherwise we won't know what SD considers punctuation
+        if include_punct or include_erased:
+            command.append('-keepPunct')
+        if not universal:
+            command.append('-originalDependencies')
+        if debug:
+            print('Command:', ' '.join(command))
+        return command
+    def _read_batch_output(self, stdout, stderr, return_code, ptb_trees,
+                           include_punct, include_erased, debug,
+                           verbose=True):
+        """Check the output of a run of the CoreNLP command line tools
+        on ptb_trees and build a Corpus from it."""
+        if debug:
+            print("stdout: {%s}" % stdout)
+            print("stderr: {%s}" % stderr)
+            print('Exit code:', return_code)
 
+        self._raise_on_bad_exit_or_output(return_code, stderr)
         try:
-            sentences = Corpus.from_stanford_dependencies(stdout.splitlines(),
-                                                          ptb_trees,
-                                                          include_erased,
-                                                          include_punct)
+            try:
+                sentences = Corpus.from_stanford_dependencies(
+                    stdout.splitlines(), ptb_trees, include_erased,
+                    include_punct)
+            except (AssertionError, IndexError) as error:
+                # bad trees can cause the output to be misaligned with
+                # the input
+                raise InvalidTreeError("Couldn't match output to trees "
+                                       "(%s)" % error)
             for sentence, ptb_tree in zip(sentences, ptb_trees):
                 if len(sentence) == 0:
-                    raise ValueError("Invalid PTB tree: %r" % ptb_tree)
+                    raise InvalidTreeError("Invalid PTB tree: %r" % ptb_tree)
+            if len(sentences) != len(ptb_trees):
+                raise InvalidTreeError("Only got %d sentences from Stanford "
+                                       "Dependencies when given %d trees." %
+                                       (len(sentences), len(ptb_trees)))
         except:
-            print("Error during conversion")
-            if not debug:
+            if verbose:
+                print("Error during conversion")
+            if verbose and not debug:
                 print("stdout: {%s}" % stdout)
                 print("stderr: {%s}" % stderr)
             raise
-
-        assert len(sentences) == len(ptb_trees), \
-            "Only got %d sentences from Stanford Dependencies when " \
-            "given %d trees." % (len(sentences), len(ptb_trees))
         return sentences
-    def convert_tree(self, ptb_tree, **kwargs):
-        """Converts a single Penn Treebank formatted tree (a string)
-        to Stanford Dependencies. See convert_trees for more details."""
-        return self.convert_trees([ptb_tree], **kwargs)[0]
+    def _convert_batch_isolating(self, ptb_trees, representation,
+                                 include_punct, include_erased, universal,
+                                 debug, timeout=None):
+        """Version of _convert_batch() which bisects failed batches to
+        find the trees responsible. These are replaced by ConversionError
+        objects in the results."""
+        try:
+            return self._convert_batch(ptb_trees, representation,
+                                       include_punct, include_erased,
+                                       universal, debug, verbose=False,
+                                       timeout=timeout)
+        # anything else (Java not starting, timeouts, etc.) would fail
+        # for every half as well
+        except InvalidTreeError as error:
+            if len(ptb_trees) == 1:
+                return Corpus([ConversionError(ptb_trees[0], error)])
+        middle = len(ptb_trees) // 2
+        sentences = Corpus()
+        for half in (ptb_trees[:middle], ptb_trees[middle:]):
+            sentences.extend(self._convert_batch_isolating(half,
+                                                           representation,
+                                                           include_punct,
+                                                           include_erased,
+                                                           universal, debug,
+                                                           timeout))
+        return sentences
+    def _convert_trees_persistent(self, ptb_trees, representation,
+                                  include_punct, include_erased, universal,
+                                  debug, worker_index=0, on_error='raise',
+                                  timeout=None):
+        """Version of _convert_batch() which uses a PersistentWorker."""
+        worker = self._get_worker(debug, worker_index)
+        sentences = Corpus()
+        for ptb_tree in ptb_trees:
+            try:
+                lines = worker.convert(ptb_tree, representation, universal,
+                                       include_punct or include_erased,
+                                       timeout)
+                sentence = self._make_sentence(lines, ptb_tree,
+                                               include_punct, include_erased)
+            except ValueError as ve:
+                if on_error == 'raise':
+                    raise
+                sentence = ConversionError(ptb_tree, ve)
+            sentences.append(sentence)
+        return sentences
+    def _get_worker(self, debug=False, worker_index=0):
+        """Returns the worker_index-th PersistentWorker, creating it (and
+        any before it) if necessary. Safe to call from several threads
+        at once."""
+        with self.workers_lock:
+            while len(self.workers) <= worker_index:
+                self.workers.append(self._make_worker(debug))
+            worker = self.workers[worker_index]
+        worker.debug = debug
+        return worker
+    def _make_worker(self, debug=False):
+        """Create a new PersistentWorker (the Java process is started
+        when it's first used)."""
+        javac_command = get_javac_command(self.java_command)
+        helper_classpath = get_helper_classpath(self.jar_filename,
+                                                javac_command, debug)
+        classpath = self.jar_filename + os.pathsep + helper_classpath
+        command = self._get_java_command(classpath, HELPER_CLASS_NAME, debug)
+        return PersistentWorker(command, debug)
+    def _get_java_command(self, classpath, main_class, debug=False):
+        """Returns the command line (as a list) to run main_class with
+        our JVM arguments (and class data sharing archive, if enabled).
+        Arguments for main_class can be appended to it."""
+        command = [self.java_command] + self.java_args
+        if self.class_data_sharing:
+            # only create each archive once when running several workers
+            with self.class_data_lock:
+                archive = self._get_class_data_archive(classpath, main_class,
+                                                       debug)
+            if archive:
+                command += ['-XX:SharedArchiveFile=' + archive]
+        return command + ['-cp', classpath, main_class]
+    def _get_class_data_archive(self, classpath, main_class, debug=False):
+        """Returns the path to a class data sharing archive for running
+        main_class with classpath, creating it if necessary by converting
+        TRAINING_TREE. If the archive can't be created (usually because
+        Java is older than 13 or the classpath includes a directory),
+        warns, disables class data sharing, and returns None."""
+        digest = hashlib.sha1()
+        for part in [get_jar_identity(self.jar_filename), classpath,
+                     main_class, self.java_command] + self.java_args:
+            digest.update(part.encode('utf-8'))
+        install_dir = os.path.expanduser(INSTALL_DIR)
+        archive = os.path.join(install_dir, 'cds-%s.jsa' % digest.hexdigest())
+        if os.path.exists(archive):
+            return archive
+
+        # the JVM writes the archive when it exits so we write it to
+        # a scratch file and only move it into place if that worked
+        if not os.path.exists(install_dir):
+            os.makedirs(install_dir)
+        handle, scratch_archive = tempfile.mkstemp(suffix='.jsa',
+                                                   dir=install_dir)
+        os.close(handle)
+        os.remove(scratch_archive)
+        input_file = tempfile.NamedTemporaryFile(delete=False)
+        try:
+            if main_class == HELPER_CLASS_NAME:
+                args = []
+                input_file.write(('basic,CCprocessed\t1,0\t1\t%s\n' %
+                                  TRAINING_TREE).encode('utf-8'))
+            else:
+                args = ['-basic', '-keepPunct', '-treeFile', input_file.name]
+                input_file.write((TRAINING_TREE + '\n').encode('utf-8'))
+            input_file.close()
+
+            command = [self.java_command] + self.java_args + \
+                      ['-XX:ArchiveClassesAtExit=' + scratch_archive,
+                       '-cp', classpath, main_class] + args
+            if debug:
+                print('Command:', ' '.join(command))
+            with open(input_file.name, 'rb') as stdin:
+                training_process = subprocess.Popen(command, stdin=stdin,
+                                                    stdout=subprocess.PIPE,
+                                                    stderr=subprocess.STDOUT,
+                                                    universal_newlines=True)
+                output = training_process.communicate()[0]
+            if debug:
+                print("output: {%s}" % output)
+                print('Exit code:', training_process.returncode)
+
+            if training_process.returncode or \
+               not os.path.exists(scratch_archive):
+                warnings.warn("Couldn't create a class data sharing archive "
+                              "(this requires Java 13 or later and a "
+                              "classpath of jar files), disabling class "
+                              "data sharing")
+                self.class_data_sharing = False
+                return None
+            replace_file(scratch_archive, archive)
+            return archive
+        finally:
+            os.remove(input_file.name)
+            if os.path.exists(scratch_archive):
+                os.remove(scratch_archive)
+    def _get_helper_worker(self, debug=False, dedicated=False):
+        """Returns a PersistentWorker for conversions which need the Java
+        helper: the shared one if persistent=True (and dedicated is
+        False), otherwise a new one which the caller must close. If the
+        helper can't be compiled, returns None. This only warns if
+        persistent=True since otherwise the helper is just an
+        optimization (without a JDK, the command line tools work just
+        as well)."""
+        if self.helper_error is not None:
+            return None
+        try:
+            if self.persistent and not dedicated:
+                return self._get_worker(debug)
+            else:
+                return self._make_worker(debug)
+        except EnvironmentError as ee:
+            self.helper_error = ee
+            if self.persistent:
+                warnings.warn("Couldn't start a persistent Java process "
+                              "(%s), falling back to the command line "
+                              "tools" % ee)
+            return None
+    def _checked_trees(self, ptb_trees):
+        """Yields ptb_trees, raising TypeError on any invalid ones."""
+        for ptb_tree in ptb_trees:
+            self._raise_on_bad_input(ptb_tree)
+            yield ptb_tree
+
+    @staticmethod
+    def _make_sentence(lines, ptb_tree, include_punct, include_erased):
+        """Build a Sentence from the dependencies for a single tree."""
+        sentence = Sentence.from_stanford_dependencies(lines, ptb_tree,
+                                                       include_erased,
+                                                       include_punct)
+        if len(sentence) == 0:
+            raise InvalidTreeError("Invalid PTB tree: %r" % ptb_tree)
+        return sentence
 
     @staticmethod
     def _raise_on_bad_exit_or_output(return_code, stderr):
         if 'PennTreeReader: warning:' in stderr:
-            raise ValueError("Tree(s) not in valid Penn Treebank format")
+            raise InvalidTreeError("Tree(s) not in valid Penn Treebank "
+                                   "format")
 
         if return_code:
             if 'Unsupported major.minor version' in stderr:
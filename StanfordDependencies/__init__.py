@@ -30,7 +30,8 @@ Start by getting a ``StanfordDependencies`` instance with
     >>> sd = StanfordDependencies.get_instance(backend='subprocess')
 
 ``get_instance()`` takes several options. ``backend`` can currently
-be ``subprocess`` or ``jpype`` (see below). If you have an existing
+be ``subprocess``, ``jpype``, ``jpype-pool``, or ``python`` (see
+below). If you have an existing
 `Stanford CoreNLP <http://nlp.stanford.edu/software/corenlp.shtml>`_ or
 `Stanford Parser <http://nlp.stanford.edu/software/lex-parser.shtml>`_
 jar file, use the ``jar_filename`` parameter to point to the full path of
@@ -55,7 +56,31 @@ This tells you that ``moose`` is the head of the sentence and is
 modified by ``some`` (with a ``det`` = determiner relation) and ``blue``
 (with an ``amod`` = adjective modifier relation). Fields on ``Token``
 objects are readable as attributes. See docs for additional options in
-``convert_tree()`` and ``convert_trees()``.
+``convert_tree()`` and ``convert_trees()``. To convert very large (or
+unbounded) collections of trees without holding them all in memory,
+use ``iter_convert_trees()`` which yields each sentence as soon as it
+has been converted. In ``asyncio`` code (Python 3.5+), ``await
+sd.aconvert_trees(...)`` or ``await sd.aconvert_tree(...)`` to convert
+without blocking the event loop. If you convert the same trees repeatedly,
+pass ``conversion_cache=StanfordDependencies.ConversionCache()`` to
+``get_instance()`` to keep converted sentences in memory and on disk so
+only new trees (or new options) need Java.
+Libraries which convert trees independently can share a single backend
+(and its Java setup) via ``get_instance(shared=True)``, calling
+``release()`` when done.
+``Corpus.from_conll()`` reads CoNLL-X files (a filename or lines) and
+``iter_conll()`` reads them one sentence at a time in constant memory.
+For random access to files larger than memory, ``MappedCorpus(filename)``
+memory-maps a CoNLL-X file and parses sentences only when they're
+accessed (the sentence offsets are saved in an index file next to it).
+To keep many sentences in memory, ``compact()`` on a sentence or corpus
+(or ``Corpus.from_conll(..., compact=True)``) switches to
+``CompactToken`` objects, which have the same fields and methods as
+``Token`` but share their strings and take much less memory.
+For corpus-wide statistics, ``corpus.as_columnar()`` (which needs
+``numpy``) stores every field in a NumPy array, e.g., to count labels
+with ``counts('deprel')`` or select sentences with ``filter()``, and
+``to_corpus()`` converts back.
 
 Visualization
 -------------
@@ -102,18 +127,29 @@ See the docs for additional options.
 
 Backends
 --------
-Currently PyStanfordDependencies includes two backends:
+Currently PyStanfordDependencies includes four backends:
 
 - ``subprocess`` (works anywhere with a ``java`` binary, but more
   overhead so batched conversions with ``convert_trees()`` are
-  recommended)
+  recommended, or pass ``persistent=True`` to keep a single Java
+  process running between calls if you have a JDK)
 - ``jpype`` (requires `jpype1 <https://pypi.python.org/pypi/JPype1>`_,
   faster than the subprocess backend, also includes access to the Stanford
   CoreNLP lemmatizer)
+- ``jpype-pool`` (runs a ``jpype`` backend in each of several worker
+  processes to use multiple cores for large ``convert_trees()`` calls,
+  call ``close()`` when you're done to stop the workers)
+- ``python`` (converts in pure Python so it needs neither Java nor a
+  jar file and starts instantly, but only supports the ``basic``
+  representation and approximates CoreNLP's output -- see the
+  ``PythonBackend`` module for constructions it doesn't handle)
 
 By default, PyStanfordDependencies will attempt to use the ``jpype``
 backend. If ``jpype`` isn't available or crashes on startup,
 PyStanfordDependencies will fallback to ``subprocess`` with a warning.
+With ``backend='auto'``, each backend is timed on a few trees the first
+time and the fastest one for your batch size (``expected_batch_size``)
+is used. Measurements are stored with downloaded jar files.
 
 Universal Dependencies status
 -----------------------------
@@ -164,10 +200,26 @@ Release summaries
 """
 
 from .StanfordDependencies import (StanfordDependencies, get_instance,
-                                   JavaRuntimeVersionError)
-from .CoNLL import Corpus, Sentence, Token
-__all__ = (StanfordDependencies, get_instance, JavaRuntimeVersionError,
-           Corpus, Sentence, Token)
+                                   close_shared_instances,
+                                   JavaRuntimeVersionError, ConversionError,
+                                   ConversionTimeoutError)
+from .CoNLL import Corpus, Sentence, Token, CompactToken, iter_conll
+from .LemmaCache import LemmaCache
+__all__ = (StanfordDependencies, get_instance, close_shared_instances,
+           JavaRuntimeVersionError, ConversionError, ConversionTimeoutError,
+           Corpus, Sentence, Token, CompactToken, iter_conll, LemmaCache)
+
+# these need sqlite3 and mmap which some Pythons (e.g., Jython) lack
+try:
+    from .ConversionCache import ConversionCache
+    __all__ += (ConversionCache,)
+except ImportError:
+    pass
+try:
+    from .MappedCorpus import MappedCorpus
+    __all__ += (MappedCorpus,)
+except ImportError:
+    pass
 
 __authors__ = 'David McClosky'
 __license__ = 'Apache 2.0'
@@ -0,0 +1,285 @@
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+// http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+import java.io.BufferedOutputStream;
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.Constructor;
+import java.lang.reflect.Method;
+import java.util.ArrayList;
+import java.util.Collection;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+
+import edu.stanford.nlp.ling.TaggedWord;
+import edu.stanford.nlp.ling.WordTag;
+import edu.stanford.nlp.process.Morphology;
+import edu.stanford.nlp.trees.EnglishGrammaticalStructure;
+import edu.stanford.nlp.trees.GrammaticalStructure;
+import edu.stanford.nlp.trees.Tree;
+import edu.stanford.nlp.trees.Trees;
+import edu.stanford.nlp.trees.TypedDependency;
+import edu.stanford.nlp.util.Filters;
+
+/**
+ * Java side of PyStanfordDependencies. Compiled on demand against the
+ * CoreNLP jar in use (see JavaHelper.py).
+ *
+ * When run as a program, this is a long-lived conversion worker. Each
+ * line on stdin is a request:
+ *
+ *     representations TAB universals TAB includePunct TAB tree
+ *
+ * where representations is a comma separated list of representation
+ * names, universals is a comma separated list of 0s and 1s,
+ * includePunct is 0 or 1, and tree is a Penn Treebank tree on a single
+ * line. The tree is read once and then for each universal setting (in
+ * order) and each representation (in order), we print one line per
+ * dependency in the same format as the CoreNLP command line tools
+ * followed by a blank line. If the tree can't be converted, a single
+ * line starting with '!' and describing the error is printed (followed
+ * by a blank line) instead.
+ *
+ * JPypeBackend calls convertBatch() and lemmatizeMany() directly
+ * instead so that a whole batch only crosses between Python and Java
+ * once.
+ */
+public class PyStanfordDependenciesHelper {
+    private static final String UNIVERSAL_CLASS_NAME =
+        "edu.stanford.nlp.trees.UniversalEnglishGrammaticalStructure";
+    private static final String TREE_WARNING = "PennTreeReader: warning:";
+
+    public static void main(String[] args) throws Exception {
+        // anything CoreNLP prints to stderr while converting a tree is
+        // captured so that we can report tree reading warnings
+        ByteArrayOutputStream errBuffer = new ByteArrayOutputStream();
+        System.setErr(new PrintStream(errBuffer, true, "UTF-8"));
+
+        BufferedReader in = new BufferedReader(
+            new InputStreamReader(System.in, "UTF-8"));
+        PrintStream out = new PrintStream(new BufferedOutputStream(
+            new FileOutputStream(FileDescriptor.out)), false, "UTF-8");
+
+        String line;
+        while ((line = in.readLine()) != null) {
+            errBuffer.reset();
+            String[] fields = line.split("\t", 4);
+            try {
+                if (fields.length != 4) {
+                    throw new IllegalArgumentException("Malformed request");
+                }
+                String[] representations = fields[0].split(",");
+                String[] universals = fields[1].split(",");
+                List<Collection<TypedDependency>> results =
+                    new ArrayList<Collection<TypedDependency>>();
+                Tree tree = readTree(fields[3]);
+                for (int i = 0; i < universals.length; i++) {
+                    // structures may modify their tree so each one gets
+                    // its own copy if there's more than one
+                    Tree input = universals.length == 1 ? tree
+                                                        : tree.deepCopy();
+                    GrammaticalStructure structure =
+                        newStructure(input,
+                                     universals[i].equals("1"),
+                                     fields[2].equals("1"));
+                    for (String representation : representations) {
+                        results.add(getDependencies(structure,
+                                                    representation));
+                    }
+                }
+                if (errBuffer.toString("UTF-8").contains(TREE_WARNING)) {
+                    throw new IllegalArgumentException(
+                        "Tree not in valid Penn Treebank format");
+                }
+                for (int i = 0; i < results.size(); i++) {
+                    if (i > 0) {
+                        out.println();
+                    }
+                    for (TypedDependency dep : results.get(i)) {
+                        out.println(dep.toString());
+                    }
+                }
+            } catch (Throwable t) {
+                out.println("!" + String.valueOf(t).replace('\n', ' '));
+            }
+            out.println();
+            out.flush();
+        }
+    }
+
+    /**
+     * Results of convertBatch() as flat arrays (so they can be copied
+     * to Python in bulk).
+     */
+    public static class ConvertedBatch {
+        /** Number of words and dependencies for each tree (2 per tree). */
+        public int[] sizes;
+        /** Error message for each tree (null if it was converted). */
+        public String[] errors;
+        /** Form and tag of each word of each converted tree. */
+        public String[] forms;
+        public String[] tags;
+        /**
+         * Dependent index, governor index, relation ID, dependent copy
+         * count, and governor copy count for each dependency (5 per
+         * dependency).
+         */
+        public int[] dependencies;
+        /** Relation names (indexed by relation ID). */
+        public String[] relations;
+    }
+
+    public static ConvertedBatch convertBatch(String[] ptbTrees,
+            String representation, boolean universal, boolean includePunct) {
+        int[] sizes = new int[ptbTrees.length * 2];
+        String[] errors = new String[ptbTrees.length];
+        List<String> forms = new ArrayList<String>();
+        List<String> tags = new ArrayList<String>();
+        List<Integer> dependencies = new ArrayList<Integer>();
+        List<String> relations = new ArrayList<String>();
+        Map<String, Integer> relationIds = new HashMap<String, Integer>();
+        for (int i = 0; i < ptbTrees.length; i++) {
+            List<TaggedWord> words;
+            Collection<TypedDependency> deps;
+            try {
+                Tree tree = readTree(ptbTrees[i]);
+                words = tree.taggedYield();
+                GrammaticalStructure structure =
+                    newStructure(tree, universal, includePunct);
+                deps = getDependencies(structure, representation);
+            } catch (Exception e) {
+                errors[i] = String.valueOf(e);
+                continue;
+            }
+            sizes[i * 2] = words.size();
+            sizes[i * 2 + 1] = deps.size();
+            for (TaggedWord word : words) {
+                forms.add(word.value());
+                tags.add(word.tag());
+            }
+            for (TypedDependency dep : deps) {
+                String relation = dep.reln().toString();
+                Integer relationId = relationIds.get(relation);
+                if (relationId == null) {
+                    relationId = relations.size();
+                    relationIds.put(relation, relationId);
+                    relations.add(relation);
+                }
+                dependencies.add(dep.dep().index());
+                dependencies.add(dep.gov().index());
+                dependencies.add(relationId);
+                dependencies.add(dep.dep().copyCount());
+                dependencies.add(dep.gov().copyCount());
+            }
+        }
+
+        ConvertedBatch batch = new ConvertedBatch();
+        batch.sizes = sizes;
+        batch.errors = errors;
+        batch.forms = forms.toArray(new String[forms.size()]);
+        batch.tags = tags.toArray(new String[tags.size()]);
+        batch.dependencies = new int[dependencies.size()];
+        for (int i = 0; i < batch.dependencies.length; i++) {
+            batch.dependencies[i] = dependencies.get(i);
+        }
+        batch.relations = relations.toArray(new String[relations.size()]);
+        return batch;
+    }
+
+    /**
+     * Lemmatize each word given its form and part of speech tag with the
+     * same static stemmer as JPypeBackend.stem().
+     */
+    public static String[] lemmatizeMany(String[] forms, String[] tags)
+            throws Exception {
+        Method stemmer = getStemmer();
+        String[] lemmas = new String[forms.length];
+        for (int i = 0; i < forms.length; i++) {
+            lemmas[i] = ((WordTag) stemmer.invoke(null, forms[i],
+                                                  tags[i])).word();
+        }
+        return lemmas;
+    }
+
+    private static Method getStemmer() throws NoSuchMethodException {
+        // stemStaticSynchronized was renamed to stemStatic in CoreNLP 3.6.0
+        try {
+            return Morphology.class.getMethod("stemStaticSynchronized",
+                                              String.class, String.class);
+        } catch (NoSuchMethodException e) {
+            return Morphology.class.getMethod("stemStatic",
+                                              String.class, String.class);
+        }
+    }
+
+    private static Tree readTree(String ptbTree) {
+        Tree tree = Trees.readTree(ptbTree);
+        if (tree == null) {
+            throw new IllegalArgumentException(
+                "Invalid Penn Treebank tree");
+        }
+        return tree;
+    }
+
+    private static Collection<TypedDependency> getDependencies(
+            GrammaticalStructure structure, String representation) {
+        if (representation.equals("basic")) {
+            return structure.typedDependencies();
+        } else if (representation.equals("collapsed")) {
+            return structure.typedDependenciesCollapsed(true);
+        } else if (representation.equals("CCprocessed")) {
+            return structure.typedDependenciesCCprocessed(true);
+        } else if (representation.equals("collapsedTree")) {
+            return structure.typedDependenciesCollapsedTree();
+        }
+        throw new IllegalArgumentException(
+            "Unknown representation: " + representation);
+    }
+
+    private static Class<?> getConverterClass(boolean universal) {
+        if (universal) {
+            try {
+                return Class.forName(UNIVERSAL_CLASS_NAME);
+            } catch (ClassNotFoundException e) {
+                // older jars only have the original converter
+            }
+        }
+        return EnglishGrammaticalStructure.class;
+    }
+
+    private static GrammaticalStructure newStructure(Tree tree,
+            boolean universal, boolean includePunct) throws Exception {
+        Class<?> converterClass = getConverterClass(universal);
+        if (!includePunct) {
+            return (GrammaticalStructure)
+                converterClass.getConstructor(Tree.class).newInstance(tree);
+        }
+        // the type of acceptFilter() changed from Filter to Predicate
+        // in CoreNLP 3.5.0 so we look for the constructor reflectively
+        Object acceptFilter = Filters.acceptFilter();
+        for (Constructor<?> constructor : converterClass.getConstructors()) {
+            Class<?>[] types = constructor.getParameterTypes();
+            if (types.length == 2 && types[0] == Tree.class &&
+                    types[1].isInstance(acceptFilter)) {
+                return (GrammaticalStructure)
+                    constructor.newInstance(tree, acceptFilter);
+            }
+        }
+        throw new IllegalStateException("Couldn't find a constructor for " +
+                                        converterClass.getName());
+    }
+}
@@ -58,8 +58,10 @@ setup(name='PyStanfordDependencies',
       license='Apache 2.0',
       platforms=['POSIX'],
       packages=['StanfordDependencies'],
+      package_data={'StanfordDependencies': ['java/*.java']},
       extras_require={
           'JPype': ['JPype1'],
+          'numpy': ['numpy'],
           'visualization': ['asciitree', 'graphviz'],
       },
       cmdclass={'test': Test})
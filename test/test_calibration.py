@@ -0,0 +1,76 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import sys
+import tempfile
+from StanfordDependencies.Calibration import pick_fastest
+
+measurements = [
+    dict(backend='jpype', backend_args={}, startup=2.0, overhead=0.001,
+         per_tree=0.004),
+    dict(backend='subprocess', backend_args={}, startup=1.0, overhead=1.0,
+         per_tree=0.001),
+    dict(backend='subprocess', backend_args=dict(persistent=True),
+         error='OSError: no javac'),
+]
+
+def test_pick_fastest():
+    assert pick_fastest(measurements, 10) == ('jpype', {})
+    assert pick_fastest(measurements, 1000) == ('subprocess', {})
+
+def test_pick_fastest_tie_and_errors():
+    # startup time only breaks ties
+    tied = [dict(measurements[1], startup=3.0),
+            dict(measurements[1], backend_args=dict(class_data_sharing=True))]
+    assert pick_fastest(tied, 10) == ('subprocess',
+                                      dict(class_data_sharing=True))
+    assert pick_fastest(measurements[2:], 10) is None
+    assert pick_fastest([], 10) is None
+
+def test_get_measurements_cache():
+    from StanfordDependencies import Calibration
+    # (StanfordDependencies.StanfordDependencies is the class)
+    module = sys.modules['StanfordDependencies.StanfordDependencies']
+    original_run_candidate = Calibration.run_candidate
+    original_install_dir = module.INSTALL_DIR
+    directory = tempfile.mkdtemp()
+    runs = []
+
+    def run_candidate(jar_filename, backend, backend_args, debug,
+                      java_command):
+        runs.append(java_command)
+        return dict(measurements[0], backend=backend,
+                    backend_args=backend_args)
+
+    Calibration.run_candidate = run_candidate
+    module.INSTALL_DIR = directory
+    try:
+        jar_filename = os.path.join(directory, 'corenlp.jar')
+        open(jar_filename, 'wb').close()
+        first = Calibration.get_measurements(jar_filename)
+        assert len(first) == len(Calibration.CANDIDATES)
+        assert Calibration.get_measurements(jar_filename) == first
+        assert len(runs) == len(Calibration.CANDIDATES)
+        # a different Java is measured separately
+        Calibration.get_measurements(jar_filename,
+                                     java_command='/opt/java/bin/java')
+        assert runs[-1] == '/opt/java/bin/java'
+        assert len(runs) == 2 * len(Calibration.CANDIDATES)
+        # no scratch files are left behind
+        assert sorted(os.listdir(directory)) == \
+            sorted(['corenlp.jar', Calibration.CALIBRATION_FILENAME])
+    finally:
+        Calibration.run_candidate = original_run_candidate
+        module.INSTALL_DIR = original_install_dir
+        shutil.rmtree(directory)
@@ -0,0 +1,115 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from StanfordDependencies.CoNLL import Corpus, Sentence, Token
+from .test_conll import conll_example, conll_example2
+
+try:
+    import numpy
+except ImportError:
+    raise unittest.SkipTest('ColumnarCorpus requires numpy')
+
+def make_corpus():
+    lines = conll_example.splitlines() + [''] + conll_example2.splitlines()
+    corpus = Corpus.from_conll(lines)
+    copy_token = Token(3, 'rice', None, 'NN', 'NN', None, 1, 'conj_and',
+                       None, None, dict(gov_is_copy=1))
+    corpus.append(Sentence([copy_token]))
+    return corpus
+
+def test_columnar_round_trip():
+    corpus = make_corpus()
+    columnar = corpus.as_columnar()
+    assert len(columnar) == 3
+    assert columnar.token_count() == 14
+    assert columnar.sentence_lengths().tolist() == [6, 7, 1]
+    assert columnar.sentence_ids().tolist() == [0] * 6 + [1] * 7 + [2]
+    assert columnar.to_corpus() == corpus
+    assert columnar == corpus
+    assert columnar.to_corpus().as_conll() == corpus.as_conll()
+    assert columnar[2][0].extra == dict(gov_is_copy=1)
+    assert columnar.columns['head'].dtype == numpy.int32
+    # cpos and pos share a vocabulary
+    assert columnar.columns['cpos'].tolist() == \
+        columnar.columns['pos'].tolist()
+
+def test_columnar_projective_heads():
+    # phead is kept as is rather than converted to a number
+    tokens = [Token(1, 'Hi', None, 'UH', 'UH', None, 0, 'root', '0', 'ROOT',
+                    None),
+              Token(2, 'there', None, 'RB', 'RB', None, 1, 'advmod', 'x',
+                    None, None)]
+    corpus = Corpus([Sentence(tokens)])
+    columnar = corpus.as_columnar()
+    assert columnar.to_corpus() == corpus
+    assert columnar[0][0].phead == '0'
+    assert columnar.counts('phead') == {'0': 1, 'x': 1}
+    lines = corpus.as_conll().splitlines()
+    assert Corpus.from_conll(lines).as_columnar().to_corpus() == corpus
+
+def test_columnar_sentence_views():
+    corpus = make_corpus()
+    columnar = corpus.as_columnar()
+    view = columnar[1]
+    assert len(view) == 7
+    assert view == corpus[1]
+    assert view[0] == corpus[1][0]
+    assert view[-1] == corpus[1][-1]
+    assert view.as_conll() == conll_example2.strip()
+    # views share the corpus's arrays
+    assert numpy.shares_memory(view.columns['head'],
+                               columnar.columns['head'])
+    assert view.columns['index'].tolist() == list(range(1, 8))
+    assert columnar[-1] == corpus[-1]
+    try:
+        columnar[3]
+    except IndexError:
+        pass
+    else:
+        assert False, 'expected IndexError'
+
+def test_columnar_slicing_and_filtering():
+    corpus = make_corpus()
+    columnar = corpus.as_columnar()
+    tail = columnar[1:]
+    assert len(tail) == 2
+    assert tail.offsets.tolist() == [0, 7, 8]
+    assert tail.to_corpus() == corpus[1:]
+    assert numpy.shares_memory(tail.columns['form'],
+                               columnar.columns['form'])
+    assert columnar[::2].to_corpus() == corpus[::2]
+    assert len(columnar[5:]) == 0
+
+    short = columnar.filter(columnar.sentence_lengths() < 7)
+    assert short.to_corpus() == [corpus[0], corpus[2]]
+    assert columnar.filter([2, 0]).to_corpus() == [corpus[2], corpus[0]]
+    assert len(columnar.filter([])) == 0
+
+def test_columnar_vectorized_queries():
+    columnar = make_corpus().as_columnar()
+    counts = columnar.counts('deprel')
+    assert counts['ROOT'] == 2
+    assert counts['punct'] == 2
+    assert sum(counts.values()) == 14
+    assert columnar.counts('head')[2] == 4
+    assert columnar.counts('extra') == {(('gov_is_copy', 1),): 1}
+
+    deprels = columnar.columns['deprel']
+    assert (deprels == columnar.get_id('deprel', 'ROOT')).sum() == 2
+    assert columnar.get_id('deprel', 'nonexistent') == -1
+    assert columnar.get_id('extra', dict(gov_is_copy=1)) == 0
+
+    index = columnar.columns['index']
+    head = columnar.columns['head']
+    distances = (head - index)[head > 0]
+    assert distances.tolist()[:5] == [1, -1, 1, -3, -1]
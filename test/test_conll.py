@@ -10,8 +10,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
+import os
 import sys
-from StanfordDependencies.CoNLL import Corpus, Sentence
+import tempfile
+from StanfordDependencies.CoNLL import (Corpus, Sentence, Token,
+                                        CompactToken, iter_conll)
 from .data import trees_sd
 from .test_stanforddependencies import stringify_sentence
 
@@ -434,3 +438,109 @@ punct(cooks-2, .-11)
     assert len(corpus) == 2
     assert stringify_sentence(corpus[0]) == trees_sd.tree4_out_CCprocessed
     assert stringify_sentence(corpus[1]) == trees_sd.tree5_out_CCprocessed
+
+def test_compact_tokens():
+    corpus = Corpus.from_conll(conll_example.splitlines() + [''] +
+                               conll_example2.splitlines(), compact=True)
+    assert all(isinstance(token, CompactToken)
+               for sentence in corpus for token in sentence)
+    assert corpus.as_conll() == conll_example.strip() + '\n\n' + \
+                                conll_example2.strip() + '\n'
+    assert corpus == Corpus.from_conll(conll_example.splitlines() + [''] +
+                                       conll_example2.splitlines())
+    token = corpus[0][0]
+    assert (token.index, token.form, token.feats, token.head) == \
+        (1, 'Cathy', ('eigen', 'ev', 'neut'), 2)
+    # strings are shared between tokens
+    assert corpus[0][5].cpos is corpus[1][6].cpos
+
+def test_compact_tokens_extra():
+    token = Token(3, 'rice', None, 'NN', 'NN', None, 1, 'conj_and', None,
+                  None, dict(gov_is_copy=1, dep_is_copy=2))
+    compact = token.compact()
+    assert compact.extra == dict(gov_is_copy=1, dep_is_copy=2)
+    assert compact == token and token == compact
+    assert compact.cpos == 'NN'
+    assert compact.as_token() == token
+    assert repr(compact) == repr(token).replace('Token', 'CompactToken', 1)
+    moved = compact._replace(index=4, extra=None)
+    assert isinstance(moved, CompactToken)
+    assert moved.index == 4 and moved.extra is None
+    assert moved < compact.compact()._replace(index=5)
+    assert hash(moved) == hash(moved.as_token())
+    # CompactTokens and Tokens can be ordered against each other
+    assert moved < token._replace(index=5) and token < moved
+    assert not moved < moved.as_token()
+    sorted([token, moved, moved.as_token()])
+    assert hash(compact) == hash(compact.compact())
+
+def test_compact_tokens_hash():
+    # equal Tokens and CompactTokens hash the same, including when rare
+    # fields are set
+    for token in (Token(1, 'Hi', None, 'UH', 'UH', None, 0, 'root', None,
+                        None, None),
+                  Token(1, 'Hi', None, 'INTJ', 'UH', None, 0, 'root', None,
+                        None, None),
+                  Token(1, 'Hi', None, 'UH', 'UH', 'a|b', 0, 'root', '0',
+                        'ROOT', None)):
+        compact = token.compact()
+        assert compact == token
+        assert hash(compact) == hash(token)
+        assert len(set([token, compact])) == 1
+
+def test_compact_sentence_renumber():
+    lines = conll_example.splitlines()[2:]
+    sentence = Sentence.from_conll(lines, compact=True)
+    sentence.renumber()
+    expected = Sentence.from_conll(lines)
+    expected.renumber()
+    assert sentence == expected
+    assert sentence == expected.compact()
+    assert [token.index for token in sentence] == [1, 2, 3, 4, 5]
+
+def test_iter_conll():
+    lines = ['', ''] + conll_example.splitlines() + ['', ''] + \
+        conll_example2.splitlines()
+    sentences = iter_conll(iter(lines))
+    first = next(sentences)
+    assert isinstance(first, Sentence)
+    assert first.as_conll() == conll_example.strip()
+    assert [sentence.as_conll() for sentence in sentences] == \
+        [conll_example2.strip()]
+    assert list(iter_conll([])) == []
+
+    compact = list(iter_conll(lines, compact=True))
+    assert isinstance(compact[1][0], CompactToken)
+    assert Corpus(compact) == Corpus.from_conll(lines)
+
+def test_iter_conll_file():
+    handle, filename = tempfile.mkstemp(suffix='.conll')
+    os.close(handle)
+    try:
+        with io.open(filename, 'w', encoding='utf-8') as conll_file:
+            conll_file.write(u'\r\n'.join(conll_example2.splitlines()))
+        sentences = list(iter_conll(filename))
+        assert len(sentences) == 1
+        assert sentences[0].as_conll() == conll_example2.strip()
+        assert Corpus.from_conll(filename) == sentences
+    finally:
+        os.remove(filename)
+
+def test_iter_conll_malformed():
+    bad_line = '1\tCathy\tCathy\tN\tN\teigen|ev|neut\t2\tsu'
+    try:
+        list(iter_conll([bad_line]))
+    except ValueError as exc:
+        assert 'Expected 10 fields' in str(exc)
+    else:
+        assert False, 'expected ValueError'
+
+def test_conll_trailing_whitespace():
+    line = '1\tCathy\tCathy\tN\tN\teigen|ev|neut\t2\tsu\t_\t_'
+    expected = Token.from_conll(line)
+    for padded in (line + '\t', line + ' \t\r\n', ' ' + line):
+        assert Token.from_conll(padded) == expected
+        assert CompactToken.from_conll(padded) == expected
+    lines = [padded_line + '\t' for padded_line in conll_example.splitlines()]
+    assert Corpus.from_conll(lines) == \
+        Corpus.from_conll(conll_example.splitlines())
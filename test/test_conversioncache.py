@@ -0,0 +1,68 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+from StanfordDependencies.ConversionCache import ConversionCache
+from StanfordDependencies.CoNLL import Sentence, Token
+
+sentence1 = Sentence([Token(index=1, form=u'caf\xe9', lemma=None, cpos='NN',
+                            pos='NN', feats=None, head=0, deprel='root',
+                            phead=None, pdeprel=None, extra=None)])
+sentence2 = Sentence([Token(index=1, form='Moose', lemma='moose', cpos='NN',
+                            pos='NN', feats=None, head=0, deprel='root',
+                            phead=None, pdeprel=None,
+                            extra={'dep_is_copy': 1})])
+
+def test_conversioncache_make_key():
+    options = dict(representation='basic', universal=True)
+    key = ConversionCache.make_key('(S (NN moose))', options, 'jar')
+    assert key == ConversionCache.make_key('(S (NN moose))', dict(options),
+                                           'jar')
+    assert key != ConversionCache.make_key('(S (NN goose))', options, 'jar')
+    assert key != ConversionCache.make_key('(S (NN moose))', options, 'jar2')
+    assert key != ConversionCache.make_key('(S (NN moose))',
+                                           dict(options, universal=False),
+                                           'jar')
+
+def test_conversioncache_memory():
+    cache = ConversionCache(max_size=1, persistent=False)
+    assert cache.get('key1') is None
+    cache['key1'] = sentence1
+    assert cache.get('key1') == sentence1
+    cache['key2'] = sentence2
+    assert len(cache) == 1
+    assert cache.get_many(['key1', 'key2', 'key2']) == {'key2': sentence2}
+    assert cache.stats() == dict(hits=2, misses=2, hit_rate=0.5, size=1)
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()['hit_rate'] is None
+
+def test_conversioncache_persistent():
+    handle, filename = tempfile.mkstemp()
+    os.close(handle)
+    try:
+        cache = ConversionCache(max_size=1, filename=filename)
+        cache.set_many([('key1', sentence1), ('key2', sentence2)])
+        assert len(cache) == 2
+        # evicted from memory but still on disk
+        assert cache.get('key1') == sentence1
+        cache.close()
+        reopened = ConversionCache(filename=filename)
+        assert reopened.get_many(['key1', 'key2', 'key3']) == \
+            {'key1': sentence1, 'key2': sentence2}
+        assert reopened.get('key2')[0].extra == {'dep_is_copy': 1}
+        reopened.clear()
+        assert len(reopened) == 0
+        reopened.close()
+    finally:
+        os.remove(filename)
@@ -0,0 +1,75 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+from StanfordDependencies.LemmaCache import LemmaCache
+
+def test_lemmacache_get_and_stats():
+    cache = LemmaCache()
+    assert cache.get(('ran', 'VBD')) is None
+    cache[('ran', 'VBD')] = 'run'
+    assert cache.get(('ran', 'VBD')) == 'run'
+    assert ('ran', 'VBD') in cache
+    assert len(cache) == 1
+    assert cache.stats() == dict(hits=1, misses=1, hit_rate=0.5, size=1,
+                                 preloaded=0)
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()['hit_rate'] is None
+
+def test_lemmacache_eviction():
+    cache = LemmaCache(max_size=2)
+    cache[('ran', 'VBD')] = 'run'
+    cache[('geese', 'NNS')] = 'goose'
+    # makes 'ran' the most recently used
+    assert cache.get(('ran', 'VBD')) == 'run'
+    cache[('mice', 'NNS')] = 'mouse'
+    assert len(cache) == 2
+    assert ('geese', 'NNS') not in cache
+    assert cache.get(('ran', 'VBD')) == 'run'
+    assert cache.get(('mice', 'NNS')) == 'mouse'
+
+def test_lemmacache_save_and_load():
+    cache = LemmaCache()
+    cache[('ran', 'VBD')] = 'run'
+    cache[(u'caf\xe9s', 'NNS')] = u'caf\xe9'
+    handle, filename = tempfile.mkstemp()
+    os.close(handle)
+    try:
+        cache.save(filename)
+        loaded = LemmaCache(max_size=1, filename=filename)
+    finally:
+        os.remove(filename)
+    assert loaded.stats()['preloaded'] == 2
+    assert loaded.get(('ran', 'VBD')) == 'run'
+    assert loaded.get((u'caf\xe9s', 'NNS')) == u'caf\xe9'
+    # preloaded lemmas are never evicted or overwritten
+    loaded[('ran', 'VBD')] = 'bogus'
+    loaded[('geese', 'NNS')] = 'goose'
+    loaded[('mice', 'NNS')] = 'mouse'
+    assert len(loaded) == 3
+    assert loaded.get(('ran', 'VBD')) == 'run'
+    assert loaded.get((u'caf\xe9s', 'NNS')) == u'caf\xe9'
+
+def test_lemmacache_dict_interface():
+    cache = LemmaCache()
+    cache[('ran', 'VBD')] = 'run'
+    assert cache[('ran', 'VBD')] == 'run'
+    try:
+        cache[('geese', 'NNS')]
+    except KeyError:
+        pass
+    else:
+        assert False, 'expected KeyError'
+    assert list(cache) == cache.keys() == [('ran', 'VBD')]
+    assert dict(cache.items()) == {('ran', 'VBD'): 'run'}
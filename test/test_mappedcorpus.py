@@ -0,0 +1,100 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import shutil
+import tempfile
+from StanfordDependencies.CoNLL import Corpus, CompactToken
+from StanfordDependencies.MappedCorpus import (MappedCorpus, INDEX_SUFFIX,
+                                               find_sentence_offsets)
+from .test_conll import conll_example, conll_example2
+
+def write_conll(filename, text):
+    with io.open(filename, 'w', encoding='utf-8') as conll_file:
+        conll_file.write(text)
+
+def test_mappedcorpus_access():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'corpus.conll')
+        text = '\n' + conll_example + '\n' + conll_example2 * 3
+        write_conll(filename, text)
+        corpus = Corpus.from_conll(filename)
+        with MappedCorpus(filename) as mapped:
+            assert len(mapped) == 4
+            assert mapped[0] == corpus[0]
+            assert mapped[-1] == corpus[-1]
+            assert mapped[1:3] == corpus[1:3]
+            assert mapped[::2] == corpus[::2]
+            assert list(mapped) == corpus
+            try:
+                mapped[4]
+            except IndexError:
+                pass
+            else:
+                assert False, 'expected IndexError'
+        assert os.path.exists(filename + INDEX_SUFFIX)
+
+        with MappedCorpus(filename, compact=True) as mapped:
+            assert isinstance(mapped[2][0], CompactToken)
+            assert mapped[2] == corpus[2]
+    finally:
+        shutil.rmtree(directory)
+
+def test_mappedcorpus_index_reuse():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'corpus.conll')
+        index_filename = os.path.join(directory, 'corpus.idx')
+        write_conll(filename, conll_example + '\n' + conll_example2)
+        MappedCorpus(filename, index_filename=index_filename).close()
+        assert os.path.exists(index_filename)
+
+        # a valid index is used as is
+        index_stat = os.stat(index_filename)
+        with MappedCorpus(filename, index_filename=index_filename) as mapped:
+            assert len(mapped) == 2
+        assert os.stat(index_filename).st_mtime == index_stat.st_mtime
+
+        # changing the file invalidates the index
+        write_conll(filename, conll_example2)
+        with MappedCorpus(filename, index_filename=index_filename) as mapped:
+            assert len(mapped) == 1
+            assert mapped[0].as_conll() == conll_example2.strip()
+
+        # as does corrupting the index
+        with open(index_filename, 'r+b') as index_file:
+            index_file.truncate(30)
+        with MappedCorpus(filename, index_filename=index_filename) as mapped:
+            assert len(mapped) == 1
+    finally:
+        shutil.rmtree(directory)
+
+def test_mappedcorpus_empty():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'empty.conll')
+        write_conll(filename, u'')
+        with MappedCorpus(filename) as mapped:
+            assert len(mapped) == 0
+            assert list(mapped) == []
+    finally:
+        shutil.rmtree(directory)
+
+def test_find_sentence_offsets():
+    assert list(find_sentence_offsets(b'')) == [0]
+    assert list(find_sentence_offsets(b'\n \n')) == [3]
+    assert list(find_sentence_offsets(b'1\ta')) == [0, 3]
+    assert list(find_sentence_offsets(b'\n1\ta\n\n \n2\tb\n3\tc\n\n')) == \
+        [1, 8, 17]
+    assert list(find_sentence_offsets(b'1\ta\r\n\r\n2\tb\r\n')) == [0, 7, 12]
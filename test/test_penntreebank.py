@@ -0,0 +1,92 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+from StanfordDependencies.PennTreebank import read_tree, read_trees
+from .data import trees_sd
+
+def test_read_tree_structure():
+    tree = read_tree('(ROOT (S (NP-SBJ (DT The) (NN dog)) '
+                     '(VP (VBZ barks)) (. .)))')
+    assert len(tree) == 8
+    assert [tree.label(node) for node in range(len(tree))] == \
+        ['ROOT', 'S', 'NP-SBJ', 'DT', 'NN', 'VP', 'VBZ', '.']
+    assert tree.parent(0) is None
+    assert tree.children(0) == [1]
+    assert tree.children(1) == [2, 5, 7]
+    assert tree.children(3) == []
+    assert [tree.parent(node) for node in (2, 3, 6)] == [1, 2, 5]
+    assert tree.is_preterminal(3)
+    assert not tree.is_preterminal(2)
+    assert tree.word(4) == 'dog'
+    assert tree.word(2) is None
+
+def test_read_tree_leaves_and_spans():
+    tree = read_tree('(ROOT (S (NP-SBJ (DT The) (NN dog)) '
+                     '(VP (VBZ barks)) (. .)))')
+    assert tree.leaves() == ['The', 'dog', 'barks', '.']
+    assert tree.preterminals() == [3, 4, 6, 7]
+    assert tree.tagged_words() == [('The', 'DT'), ('dog', 'NN'),
+                                   ('barks', 'VBZ'), ('.', '.')]
+    assert tree.span(0) == (0, 4)
+    assert tree.span(2) == (0, 2)
+    assert tree.span(5) == (2, 3)
+    assert tree.span(7) == (3, 4)
+
+def test_read_tree_formatting():
+    # unlabeled roots, extra whitespace, and newlines are all fine
+    tree = read_tree('( (S\n  (NP ( PRP It ))\n  (VP (VBZ works) ) ) )')
+    assert tree.label(0) == ''
+    assert str(tree) == '( (S (NP (PRP It)) (VP (VBZ works))))'
+    assert read_tree(str(tree)) == tree
+    assert read_tree('(NN dog)').leaves() == ['dog']
+
+def test_read_tree_fixtures():
+    for name in ('tree1', 'tree2', 'tree4', 'tree5', 'tree9'):
+        ptb_tree = getattr(trees_sd, name)
+        tree = read_tree(ptb_tree)
+        assert str(tree) == ' '.join(ptb_tree.split())
+        assert tree.span(0) == (0, len(tree.leaves()))
+
+def test_read_tree_errors():
+    for bad_tree, message in (('', 'Expected a single tree'),
+                              ('(A (B c)) (D e)', 'Expected a single tree'),
+                              ('(S (NP a)', 'Unbalanced parentheses'),
+                              (')', 'Unbalanced parentheses'),
+                              ('(A b) c', 'Text outside of a tree'),
+                              ('(A b c)', 'Malformed constituent'),
+                              ('(A (B c) d)', 'Malformed constituent'),
+                              ('(A b (C d))', 'Constituent after a word'),
+                              ('(A ())', 'Empty constituent'),
+                              ('(A)', 'without children')):
+        try:
+            read_tree(bad_tree)
+        except ValueError as exc:
+            assert message in str(exc)
+        else:
+            assert False, 'expected ValueError for %r' % bad_tree
+
+def test_read_trees_streaming():
+    stream = io.StringIO(u'(A (B c))\n(D\n (E f)\n (G h)) (I j)\n')
+    trees = read_trees(stream)
+    first = next(trees)
+    assert first.leaves() == ['c']
+    # the rest of the stream hasn't been read yet
+    assert stream.tell() < len(stream.getvalue())
+    assert [tree.leaves() for tree in trees] == [['f', 'h'], ['j']]
+    assert [str(tree) for tree in read_trees('(A b)(C (D e))')] == \
+        ['(A b)', '(C (D e))']
+
+def test_read_trees_interning():
+    first, second = read_trees('(NP (DT the) (NN dog)) (NP (DT the) (NN cat))')
+    assert first.labels[0] == second.labels[0]
+    assert first.words[0] is second.words[0]
@@ -11,14 +11,48 @@
 # limitations under the License.
 
 from __future__ import print_function
+import os
+import sys
+import tempfile
+import time
 import unittest
 from StanfordDependencies import (StanfordDependencies, get_instance,
-                                  JavaRuntimeVersionError)
-from StanfordDependencies.SubprocessBackend import SubprocessBackend
+                                  close_shared_instances,
+                                  JavaRuntimeVersionError, ConversionError,
+                                  ConversionTimeoutError, ConversionCache)
+from StanfordDependencies.SubprocessBackend import (SubprocessBackend,
+                                                    InvalidTreeError)
 from StanfordDependencies.JPypeBackend import JPypeBackend
 from StanfordDependencies.CoNLL import Corpus, Sentence, Token
 from .data import trees_sd, trees_ud
 
+def run_coroutines(*coroutines, **kwargs):
+    """Run coroutines concurrently in a new event loop and return their
+    results. If cancel_after is set, they're cancelled after that many
+    seconds."""
+    import asyncio
+    loop = asyncio.new_event_loop()
+    # needed for subprocesses in older versions of Python
+    asyncio.set_event_loop(loop)
+    try:
+        tasks = [loop.create_task(coroutine) for coroutine in coroutines]
+        gathered = asyncio.gather(*tasks)
+        if kwargs.get('cancel_after') is not None:
+            loop.call_later(kwargs['cancel_after'], gathered.cancel)
+        try:
+            return loop.run_until_complete(gathered)
+        finally:
+            # let the others clean up if one of them failed
+            loop.run_until_complete(asyncio.wait(tasks))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+needs_asyncio = unittest.skipIf(sys.version_info < (3, 5),
+                                'asyncio API requires Python 3.5+')
+needs_futures = unittest.skipIf(sys.version_info < (3, 2),
+                                'concurrent.futures requires Python 3.2+')
+
 def stringify_sentence(tokens):
     """Helper utility which standardizes stringification for testing."""
     from StanfordDependencies import CoNLL
@@ -59,6 +93,44 @@ class BackendCreation(unittest.TestCase):
                                                download_if_missing=True)
         assert isinstance(sd, JPypeBackend), \
                "Fell back to another backend due to a JPype error"
+    def test_auto_backend_creation(self):
+        sd = get_instance(backend='auto', version='3.5.2',
+                          download_if_missing=True, expected_batch_size=1)
+        assert isinstance(sd, (SubprocessBackend, JPypeBackend))
+        sd.close()
+    def test_shared_instances(self):
+        handle, jar_filename = tempfile.mkstemp(suffix='.jar')
+        os.close(handle)
+        try:
+            sd = get_instance(jar_filename, backend='subprocess', shared=True)
+            assert isinstance(sd, SubprocessBackend)
+            assert get_instance(jar_filename, backend='subprocess',
+                                shared=True) is sd
+            assert get_instance(jar_filename, backend='subprocess') is not sd
+            assert get_instance(jar_filename, backend='subprocess',
+                                shared=True, persistent=True) is not sd
+            # equivalent arguments share a backend
+            relative_jar_filename = os.path.relpath(jar_filename)
+            assert get_instance(relative_jar_filename, version='3.5.2',
+                                backend='subprocess', shared=True) is sd
+            sd.release()
+            with get_instance(jar_filename, backend='subprocess',
+                              shared=True) as sd2:
+                assert sd2 is sd
+            sd.release()
+            assert get_instance(jar_filename, backend='subprocess',
+                                shared=True) is sd
+            sd.release()
+            sd.release()
+            sd2 = get_instance(jar_filename, backend='subprocess',
+                               shared=True)
+            assert sd2 is not sd
+            close_shared_instances()
+            assert get_instance(jar_filename, backend='subprocess',
+                                shared=True) is not sd2
+            close_shared_instances()
+        finally:
+            os.remove(jar_filename)
     def test_backend_bad_jar_filename(self):
         self.assertRaises(ValueError,
                           StanfordDependencies.get_instance,
@@ -75,8 +147,61 @@ class BackendCreation(unittest.TestCase):
         self.assertRaises(TypeError, StanfordDependencies.get_instance, open)
         self.assertRaises(TypeError, StanfordDependencies.get_instance, len)
 
+class WordsBackend(StanfordDependencies):
+    """Backend which doesn't need Java: "trees" are whitespace separated
+    words which all depend on the first word. Trees containing 'bogus'
+    can't be converted."""
+    def convert_tree(self, ptb_tree, representation='basic', **kwargs):
+        self._raise_on_bad_representation(representation)
+        if 'bogus' in ptb_tree:
+            raise ValueError('bogus tree')
+        return Sentence(Token(index + 1, word, None, 'NN', 'NN', None,
+                              min(index, 1), 'dep' if index else 'root',
+                              None, None, None)
+                        for index, word in enumerate(ptb_tree.split()))
+
+class ExecutorConversionTest(unittest.TestCase):
+    trees = ['the blue moose', 'moose', 'some blue moose sleep', 'a b c']
+
+    def setUp(self):
+        self.sd = WordsBackend(version='3.5.2')
+    @needs_futures
+    def test_executor(self):
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        expected = self.sd.convert_trees(self.trees)
+        assert len(expected) == 4
+        assert expected[2][3].form == 'sleep'
+        for executor_class in (ThreadPoolExecutor, ProcessPoolExecutor):
+            executor = executor_class(2)
+            try:
+                for chunksize in (1, 3, 10):
+                    sentences = self.sd.convert_trees(self.trees * 3,
+                                                      executor=executor,
+                                                      chunksize=chunksize)
+                    assert isinstance(sentences, Corpus)
+                    assert sentences == expected * 3
+            finally:
+                executor.shutdown()
+    @needs_futures
+    def test_executor_errors(self):
+        from concurrent.futures import ThreadPoolExecutor
+        trees = self.trees + ['bogus tree'] + self.trees
+        executor = ThreadPoolExecutor(2)
+        try:
+            self.assertRaises(ValueError, self.sd.convert_trees, trees,
+                              executor=executor)
+            sentences = self.sd.convert_trees(trees, executor=executor,
+                                              chunksize=2, on_error='isolate')
+        finally:
+            executor.shutdown()
+        assert sentences[:4] == sentences[5:] == \
+            self.sd.convert_trees(self.trees)
+        assert isinstance(sentences[4], ConversionError)
+        assert sentences[4].ptb_tree == 'bogus tree'
+
 class DefaultBackendTest(unittest.TestCase):
     backend = None
+    backend_args = {}
     version = '3.5.2'
     universal = False
 
@@ -86,7 +211,8 @@ class DefaultBackendTest(unittest.TestCase):
         else:
             self.trees = trees_sd
 
-        kwargs = dict(version=self.version, download_if_missing=True)
+        kwargs = dict(version=self.version, download_if_missing=True,
+                      **self.backend_args)
         if self.backend is not None:
             kwargs['backend'] = self.backend
         self.sd = StanfordDependencies.get_instance(**kwargs)
@@ -102,11 +228,70 @@ class DefaultBackendTest(unittest.TestCase):
         assert isinstance(sentences[0][0], Token)
         for tree, tokens, expected in zip(trees, sentences, expected_outputs):
             self.assertTokensMatch(tree, tokens, expected)
+    def test_basic_iter(self):
+        trees, expected_outputs = zip(*self.trees.get_basic_test_trees())
+        sentences = self.sd.iter_convert_trees(iter(trees),
+                                               universal=self.universal)
+        assert not isinstance(sentences, list)
+        sentences = list(sentences)
+        assert len(sentences) == len(expected_outputs)
+        assert isinstance(sentences[0], Sentence)
+        for tree, tokens, expected in zip(trees, sentences, expected_outputs):
+            self.assertTokensMatch(tree, tokens, expected)
+    def test_iter_bogus_input(self):
+        sentences = self.sd.iter_convert_trees([self.trees.tree1, 3])
+        self.assertRaises(TypeError, list, sentences)
+        sentences = self.sd.iter_convert_trees([self.trees.tree1, '(S'])
+        self.assertRaises(ValueError, list, sentences)
+    @needs_asyncio
+    def test_basic_async(self):
+        trees, expected_outputs = zip(*self.trees.get_basic_test_trees())
+        sentences, sentence = run_coroutines(
+            self.sd.aconvert_trees(trees, universal=self.universal),
+            self.sd.aconvert_tree(trees[0], universal=self.universal))
+        assert len(sentences) == len(expected_outputs)
+        assert isinstance(sentences, Corpus)
+        for tree, tokens, expected in zip(trees, sentences, expected_outputs):
+            self.assertTokensMatch(tree, tokens, expected)
+        self.assertTokensMatch(trees[0], sentence, expected_outputs[0])
+    @needs_asyncio
+    def test_async_bogus_input(self):
+        self.assertRaises(TypeError, run_coroutines,
+                          self.sd.aconvert_trees([self.trees.tree1, 3]))
+        self.assertRaises(ValueError, run_coroutines,
+                          self.sd.aconvert_tree('(S'))
     def test_reprs(self):
         for tree, reprs in self.trees.get_repr_test_trees():
             for representation, expected in sorted(reprs.items()):
                 self.assertConverts(tree, expected,
                                     representation=representation)
+    def test_reprs_multi(self):
+        trees, reprs = zip(*self.trees.get_repr_test_trees())
+        representations = ('basic', 'collapsed', 'CCprocessed',
+                           'collapsedTree')
+        results = self.sd.convert_trees_multi(trees, representations,
+                                              universals=(self.universal,))
+        assert sorted(results) == sorted((representation, self.universal)
+                                         for representation in
+                                         representations)
+        for index, (tree, expected_reprs) in enumerate(zip(trees, reprs)):
+            for representation, expected in sorted(expected_reprs.items()):
+                sentences = results[representation, self.universal]
+                assert isinstance(sentences, Corpus)
+                assert len(sentences) == len(trees)
+                self.assertTokensMatch(tree, sentences[index], expected)
+    def test_basic_multi_universals(self):
+        trees, sd_outputs = zip(*trees_sd.get_basic_test_trees())
+        trees, ud_outputs = zip(*trees_ud.get_basic_test_trees())
+        results = self.sd.convert_trees_multi(trees, ('basic',),
+                                              universals=(True, False))
+        assert len(results) == 2
+        for universal, expected_outputs in ((True, ud_outputs),
+                                            (False, sd_outputs)):
+            sentences = results['basic', universal]
+            for tree, tokens, expected in zip(trees, sentences,
+                                              expected_outputs):
+                self.assertTokensMatch(tree, tokens, expected)
     def test_punct_and_erased(self):
         self.assertConverts(self.trees.tree5,
                             self.trees.tree5_out_collapsedTree_no_punct,
@@ -144,6 +329,58 @@ class DefaultBackendTest(unittest.TestCase):
         self.assertRaises(ValueError, self.sd.convert_tree, 'bogus')
         self.assertRaises(ValueError, self.sd.convert_tree, 'bogus)')
         self.assertRaises(ValueError, self.sd.convert_tree, 'bogus))')
+    def test_isolate_errors(self):
+        trees = [self.trees.tree1, '(S', self.trees.tree3, '((Hi there)',
+                 self.trees.tree1]
+        sentences = self.sd.convert_trees(trees, universal=self.universal,
+                                          on_error='isolate')
+        assert isinstance(sentences, Corpus)
+        assert len(sentences) == len(trees)
+        for index in (1, 3):
+            assert isinstance(sentences[index], ConversionError)
+            assert sentences[index].ptb_tree == trees[index]
+        self.assertTokensMatch(trees[0], sentences[0], self.trees.tree1_out)
+        self.assertTokensMatch(trees[2], sentences[2], self.trees.tree3_out)
+        self.assertTokensMatch(trees[4], sentences[4], self.trees.tree1_out)
+        self.assertRaises(ValueError, self.sd.convert_trees, trees,
+                          universal=self.universal)
+    def test_bogus_on_error(self):
+        self.assertRaises(ValueError, self.sd.convert_trees,
+                          [self.trees.tree1], on_error='bogus')
+    def test_timeout(self):
+        trees, expected_outputs = zip(*self.trees.get_basic_test_trees())
+        sentences = self.sd.convert_trees(trees, universal=self.universal,
+                                          timeout=600)
+        for tree, tokens, expected in zip(trees, sentences, expected_outputs):
+            self.assertTokensMatch(tree, tokens, expected)
+        self.assertRaises(ConversionTimeoutError, self.sd.convert_trees,
+                          list(trees) * 500, universal=self.universal,
+                          timeout=0.001)
+    def test_conversion_cache(self):
+        trees, expected_outputs = zip(*self.trees.get_basic_test_trees())
+        self.sd.conversion_cache = ConversionCache(persistent=False)
+        sentences = self.sd.convert_trees(trees, universal=self.universal)
+        assert self.sd.conversion_cache.stats()['hits'] == 0
+        cached = self.sd.convert_trees(trees[::-1], universal=self.universal)
+        assert self.sd.conversion_cache.stats()['hits'] == len(set(trees))
+        assert isinstance(cached, Corpus)
+        assert cached == sentences[::-1]
+        for tree, tokens, expected in zip(trees, sentences, expected_outputs):
+            self.assertTokensMatch(tree, tokens, expected)
+        self.assertConverts(self.trees.tree1, self.trees.tree1_out)
+
+        # repeated trees are only converted once but each gets its own
+        # Sentence
+        self.sd.conversion_cache = ConversionCache(persistent=False)
+        for attempt in range(2):
+            repeated = self.sd.convert_trees([self.trees.tree1] * 3,
+                                             universal=self.universal)
+            assert repeated[0] == repeated[1] == repeated[2]
+            assert repeated[0] is not repeated[1]
+            assert repeated[1] is not repeated[2]
+        stats = self.sd.conversion_cache.stats()
+        assert (stats['hits'], stats['misses']) == (1, 1)
+        self.sd.conversion_cache = None
     def test_bogus_representation(self):
         self.assertRaises(ValueError, self.sd.convert_tree, self.trees.tree1,
                           representation='bogus')
@@ -220,13 +457,147 @@ class SubprocessBackendTest(DefaultBackendTest):
                           self.sd._raise_on_bad_exit_or_output, -7,
                           'JVMCFRE003 bad major version')
         self.sd._raise_on_bad_exit_or_output(0, '') # shouldn't raise anything
+        self.assertRaises(InvalidTreeError,
+                          self.sd._raise_on_bad_exit_or_output, 0,
+                          'PennTreeReader: warning: file has extra ")"')
+    def test_isolate_only_bad_trees(self):
+        # errors which aren't caused by a tree (here, a bad exit code
+        # with no output) aren't bisected
+        sd = SubprocessBackend(jar_filename=self.sd.jar_filename,
+                               java_command='false')
+        trees = [self.trees.tree1] * 4
+        self.assertRaises(ValueError, sd.convert_trees, trees,
+                          on_error='isolate')
 
     def test_convert_debug(self):
         self.assertConverts(self.trees.tree1, self.trees.tree1_out, debug=True)
+    def test_basic_multiple_workers(self):
+        trees, expected_outputs = zip(*self.trees.get_basic_test_trees())
+        for workers in (2, 3, None):
+            sentences = self.sd.convert_trees(trees, universal=self.universal,
+                                              workers=workers)
+            assert isinstance(sentences, Corpus)
+            assert len(sentences) == len(expected_outputs)
+            for tree, tokens, expected in zip(trees, sentences,
+                                              expected_outputs):
+                self.assertTokensMatch(tree, tokens, expected)
+    def test_split_into_shards(self):
+        split = self.sd._split_into_shards
+        assert split([], 4) == [[]]
+        assert split([1, 2, 3], 1) == [[1, 2, 3]]
+        assert split([1, 2, 3], 2) == [[1, 2], [3]]
+        assert split([1, 2, 3, 4, 5, 6], 3) == [[1, 2], [3, 4], [5, 6]]
+        assert split([1, 2, 3], 8) == [[1], [2], [3]]
+    @needs_asyncio
+    def test_async_cancel(self):
+        from asyncio import CancelledError
+        trees = [self.trees.tree1] * 1000
+        self.assertRaises(CancelledError, run_coroutines,
+                          self.sd.aconvert_trees(trees, workers=2),
+                          cancel_after=0.1)
+        # the event loop is still usable afterwards
+        sentences = run_coroutines(self.sd.aconvert_trees(trees[:2]))[0]
+        assert len(sentences) == 2
+
+    def test_failed_shard_waits_for_others(self):
+        finished = []
+        class SlowBackend(SubprocessBackend):
+            def _convert_batch(self, ptb_trees, *args, **kwargs):
+                if ptb_trees[0] == 'bogus':
+                    raise ValueError('bogus tree')
+                time.sleep(0.2)
+                finished.append(ptb_trees)
+                return Corpus(Sentence() for ptb_tree in ptb_trees)
+        sd = SlowBackend(jar_filename=self.sd.jar_filename)
+        self.assertRaises(ValueError, sd.convert_trees,
+                          ['bogus', self.trees.tree1], workers=2)
+        assert finished == [[self.trees.tree1]]
+    def test_watchdog(self):
+        import subprocess
+        from StanfordDependencies.SubprocessBackend import Watchdog
+        sleeper = [sys.executable, '-c', 'import time; time.sleep(10)']
+        process = subprocess.Popen(sleeper)
+        with Watchdog(process, 0.1) as watchdog:
+            process.wait()
+        assert watchdog.fired
+        # the timer going off after the process exited (or after we
+        # stopped waiting) isn't a timeout
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        watchdog = Watchdog(process, 10)
+        watchdog._kill()
+        assert not watchdog.fired
+        process = subprocess.Popen(sleeper)
+        try:
+            with Watchdog(process, 10) as watchdog:
+                pass
+            watchdog._kill()
+            assert not watchdog.fired
+            assert process.poll() is None
+        finally:
+            process.kill()
+            process.wait()
+    def test_helper_fallback(self):
+        import warnings
+        sd = SubprocessBackend(jar_filename=self.sd.jar_filename,
+                               java_command='/nonexistent/java')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            assert sd._get_helper_worker() is None
+            assert sd._get_helper_worker() is None
+        # the helper is optional without persistent=True
+        assert not caught
+        assert isinstance(sd.helper_error, EnvironmentError)
+        sd = SubprocessBackend(jar_filename=self.sd.jar_filename,
+                               java_command='/nonexistent/java',
+                               persistent=True)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            assert sd._get_helper_worker() is None
+            assert sd._get_helper_worker() is None
+        assert len(caught) == 1
+    def test_java_command(self):
+        sd = SubprocessBackend(jar_filename=self.sd.jar_filename,
+                               java_command='/opt/java', java_args=['-Xmx1g'])
+        assert sd._get_java_command('a.jar', 'Main') == \
+            ['/opt/java', '-Xmx1g', '-cp', 'a.jar', 'Main']
+        sd = SubprocessBackend(jar_filename=self.sd.jar_filename)
+        assert sd._get_java_command('a.jar', 'Main') == \
+            ['java', '-ea', '-cp', 'a.jar', 'Main']
 
 class UDSubprocessBackendTest(SubprocessBackendTest):
     universal = True
 
+class ClassDataSharingSubprocessBackendTest(SubprocessBackendTest):
+    backend_args = dict(class_data_sharing=True)
+
+class PersistentSubprocessBackendTest(SubprocessBackendTest):
+    backend_args = dict(persistent=True)
+
+    def tearDown(self):
+        self.sd.close()
+    def test_worker_restarts(self):
+        self.assertConverts(self.trees.tree1, self.trees.tree1_out)
+        self.sd.workers[0].process.kill()
+        self.sd.workers[0].process.wait()
+        self.assertConverts(self.trees.tree1, self.trees.tree1_out)
+        self.sd.close()
+        assert not self.sd.workers
+        self.assertConverts(self.trees.tree1, self.trees.tree1_out)
+    def test_convert_while_iterating(self):
+        trees = [self.trees.tree1, self.trees.tree1]
+        first = self.sd.iter_convert_trees(trees, universal=self.universal)
+        second = self.sd.iter_convert_trees(trees, universal=self.universal)
+        for tokens in first:
+            self.assertTokensMatch(self.trees.tree1, tokens,
+                                   self.trees.tree1_out)
+            self.assertConverts(self.trees.tree1, self.trees.tree1_out)
+            self.assertTokensMatch(self.trees.tree1, next(second),
+                                   self.trees.tree1_out)
+
+class UDPersistentSubprocessBackendTest(PersistentSubprocessBackendTest):
+    universal = True
+
 class JPypeBackendTest(DefaultBackendTest):
     backend = 'jpype'
 
@@ -234,9 +605,119 @@ class JPypeBackendTest(DefaultBackendTest):
         self.assertConverts(self.trees.tree5,
                             self.trees.tree5_out_basic_lemmas,
                             add_lemmas=True)
+    def test_lemmatize_many(self):
+        pairs = [('ran', 'VBD'), ('geese', 'NNS'), ('ran', 'VBD')]
+        assert self.sd.lemmatize_many(pairs) == ['run', 'goose', 'run']
+        assert self.sd.lemmatize_many([]) == []
+        assert self.sd.stem('mice', 'NNS') == \
+            self.sd.lemmatize_many([('mice', 'NNS')])[0]
+    def test_lazy_and_warmup(self):
+        for kwargs in (dict(lazy=True), dict(warmup=True)):
+            sd = JPypeBackend(jar_filename=self.sd.jar_filename, **kwargs)
+            if 'lazy' in kwargs:
+                assert not sd.initialized
+            sd.ready()
+            assert sd.initialized
+            self.assertTokensMatch(self.trees.tree1, sd.convert_tree(
+                self.trees.tree1, universal=self.universal),
+                self.trees.tree1_out)
     def test_report_version_error(self):
         self.assertRaises(JavaRuntimeVersionError,
                           self.sd._report_version_error, '1.6')
+    def test_basic_multiple_threads(self):
+        trees, expected_outputs = zip(*self.trees.get_basic_test_trees())
+        for threads in (2, 3, None):
+            sentences = self.sd.convert_trees(trees, universal=self.universal,
+                                              threads=threads)
+            assert isinstance(sentences, Corpus)
+            assert len(sentences) == len(expected_outputs)
+            for tree, tokens, expected in zip(trees, sentences,
+                                              expected_outputs):
+                self.assertTokensMatch(tree, tokens, expected)
+    def test_basic_without_helper(self):
+        assert self.sd.convert_batch is not None
+        trees, expected_outputs = zip(*self.trees.get_basic_test_trees())
+        batched = self.sd.convert_trees(trees, universal=self.universal)
+        batched_single = self.sd.convert_tree(self.trees.tree5,
+                                              representation='collapsed',
+                                              include_erased=True)
+        self.sd.convert_batch = None
+        unbatched = self.sd.convert_trees(trees, universal=self.universal)
+        for tree, tokens, expected in zip(trees, unbatched, expected_outputs):
+            self.assertTokensMatch(tree, tokens, expected)
+        assert batched == unbatched
+        assert batched_single == self.sd.convert_tree(
+            self.trees.tree5, representation='collapsed', include_erased=True)
+    def test_timeout_needs_recycling(self):
+        assert not self.sd.needs_recycling
+        self.assertRaises(ConversionTimeoutError, self.sd.convert_trees,
+                          [self.trees.tree5] * 5000, timeout=0.001)
+        assert self.sd.needs_recycling
 
 class UDJPypeBackendTest(JPypeBackendTest):
     universal = True
+
+class JPypeProcessPoolBackendTest(DefaultBackendTest):
+    backend = 'jpype-pool'
+    backend_args = dict(processes=2, batch_size=2)
+
+    def tearDown(self):
+        self.sd.close()
+    def test_add_lemmas(self):
+        self.assertConverts(self.trees.tree5,
+                            self.trees.tree5_out_basic_lemmas,
+                            add_lemmas=True)
+    def test_worker_restarts(self):
+        self.assertConverts(self.trees.tree1, self.trees.tree1_out)
+        for worker in self.sd.workers:
+            worker.process.terminate()
+            worker.process.join()
+        self.test_basic_multiple()
+        self.sd.close()
+        self.assertConverts(self.trees.tree1, self.trees.tree1_out)
+
+class UDJPypeProcessPoolBackendTest(JPypeProcessPoolBackendTest):
+    universal = True
+
+class PythonBackendTest(DefaultBackendTest):
+    backend = 'python'
+
+    def test_reprs(self):
+        for representation in ('collapsed', 'CCprocessed', 'collapsedTree'):
+            self.assertRaises(ValueError, self.sd.convert_tree,
+                              self.trees.tree1, representation=representation)
+    def test_reprs_multi(self):
+        self.assertRaises(ValueError, self.sd.convert_trees_multi,
+                          [self.trees.tree1], ('basic', 'collapsed'))
+    def test_punct_and_erased(self):
+        expected = self.trees.tree5_out_basic.rsplit('\n', 1)[0]
+        self.assertConverts(self.trees.tree5, expected, include_punct=False)
+        self.assertConverts(self.trees.tree5, self.trees.tree5_out_basic,
+                            include_erased=True)
+    def test_insufficient_jar_info(self):
+        sd = StanfordDependencies.get_instance(backend=self.backend,
+                                               jar_filename=None,
+                                               download_if_missing=False,
+                                               version=None)
+        assert sd.jar_filename is None
+        assert sd.conversion_cache is None
+        self.assertConverts(self.trees.tree1, self.trees.tree1_out)
+    def test_only_empty_elements(self):
+        tree = '(ROOT (S (NP (-NONE- *T*-1)) (VP (-NONE- *))))'
+        self.assertRaises(ValueError, self.sd.convert_tree, tree)
+        self.assertRaises(ValueError, self.sd.convert_tree, '(ROOT (. .))',
+                          include_punct=False)
+        sentences = self.sd.convert_trees([self.trees.tree1, tree],
+                                          on_error='isolate')
+        assert isinstance(sentences[1], ConversionError)
+    def test_wh_clause(self):
+        from StanfordDependencies.PythonBackend import Node, has_subject
+        assert not has_subject(Node('VBD', word='happened'))
+        tree = '(SBAR (WHNP (WP what)) (S (VP (VBD happened))))'
+        sentence = self.sd.convert_tree(tree)
+        self.assertEqual([(token.form, token.head, token.deprel)
+                          for token in sentence],
+                         [('what', 2, 'nsubj'), ('happened', 0, 'root')])
+
+class UDPythonBackendTest(PythonBackendTest):
+    universal = True